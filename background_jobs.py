@@ -0,0 +1,59 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from event_stream import EventLog
+
+FINISHED_STATUSES = ('done', 'failed')
+
+
+class BackgroundJob:
+    """State every background job shares: an id, a status ('pending' until it
+    runs, 'done' or 'failed' once finished), an error message and the EventLog
+    its progress is published on."""
+
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self.status = 'pending'
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.events = EventLog()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+
+class JobRunner:
+    """Runs jobs on a thread pool and keeps them in memory until `retain`
+    seconds after they finish. Subclasses add jobs with `_add`, which also
+    forgets expired ones, and run them with `self.executor`."""
+
+    def __init__(self, max_workers: int, retain: float, thread_name_prefix: str):
+        self.retain = retain
+        self.jobs: Dict[str, BackgroundJob] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+    def get(self, job_id: str):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _add(self, job: BackgroundJob):
+        with self.lock:
+            self._prune(time.time())
+            self.jobs[job.id] = job
+
+    def _set_status(self, job: BackgroundJob, status: str):
+        job.status = status
+        job.updated_at = time.time()
+
+    def _prune(self, now: float):
+        """Forget jobs that finished more than `retain` seconds ago; the caller holds the lock."""
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished and job.updated_at < now - self.retain]
+        for job_id in expired:
+            del self.jobs[job_id]
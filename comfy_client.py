@@ -0,0 +1,230 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from urllib.parse import urlencode
+
+import requests
+from websockets.exceptions import WebSocketException
+
+
+def queue_prompt(base_url: str, workflow: dict, client_id: str) -> str:
+    """Queue a workflow on a ComfyUI server and return its prompt_id."""
+    headers = {'Content-Type': 'application/json'}
+    data = json.dumps({"prompt": workflow, "client_id": client_id}).encode('utf-8')
+    response = requests.post(f"{base_url}/prompt", data=data, headers=headers)
+    response.raise_for_status()
+    return response.json()['prompt_id']
+
+
+def ws_url(base_url: str, client_id: str) -> str:
+    """WebSocket URL on which ComfyUI reports progress for `client_id`."""
+    return f"ws://{base_url.split('//')[1]}/ws?clientId={client_id}"
+
+
+def view_params(image: dict) -> str:
+    """Query string identifying an output image, as returned in an `executed` event."""
+    return urlencode({"filename": image['filename'], "subfolder": image['subfolder'], "type": image['type']})
+
+
+def view_url(base_url: str, image: dict) -> str:
+    return f"{base_url}/view?{view_params(image)}"
+
+
+def parse_message(raw) -> dict | None:
+    """Decode a ComfyUI websocket frame; binary preview frames are ignored."""
+    if not isinstance(raw, str):
+        return None
+    return json.loads(raw)
+
+
+def executed_images(message: dict) -> list:
+    """Images produced by an `executed` event (empty for non-image output nodes)."""
+    return (message.get('data', {}).get('output') or {}).get('images') or []
+
+
+def is_unreachable(error: Exception) -> bool:
+    """Whether `error` means a ComfyUI server couldn't be reached, rather than
+    that it answered with an error (a rejected prompt says nothing about its health)."""
+    if isinstance(error, requests.exceptions.HTTPError):
+        return False
+    return isinstance(error, (OSError, WebSocketException))
+
+
+class NoBackendAvailable(Exception):
+    pass
+
+
+class ComfyBackend:
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        # stable across restarts and reordering, so it can be put in URLs handed to clients
+        self.id = hashlib.sha1(self.url.encode('utf-8')).hexdigest()[:12]
+        self.healthy = True
+        self.queue_depth = 0
+        self.assigned = 0  # prompts routed here since the last queue probe
+        self.models = None  # None until the checkpoint list has been fetched
+        self.checked_at = 0.0
+        self.models_checked_at = 0.0
+        self.error = None
+
+    def load(self) -> int:
+        return self.queue_depth + self.assigned
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "url": self.url,
+            "healthy": self.healthy,
+            "queue_depth": self.queue_depth,
+            "assigned": self.assigned,
+            "models": sorted(self.models) if self.models is not None else None,
+            "error": self.error,
+        }
+
+
+class ComfyPool:
+    """A set of ComfyUI servers that prompts are spread across.
+
+    Backends are probed lazily: `select` refreshes any backend whose health
+    data is older than `health_ttl` (queue depth from `/queue`) and whose model
+    list is older than `models_ttl` (from `/models/checkpoints`), then routes
+    to the healthy backend with the shortest queue that has the requested
+    checkpoint. A single-backend pool is never probed. `submit` queues a
+    prompt and fails over once when a backend can't be reached, reporting it
+    with `mark_unhealthy`, which takes it out of rotation until its next probe. The owning backend of each prompt_id is
+    remembered so outputs can be fetched from the right host.
+    """
+
+    def __init__(self, urls: list, health_ttl: float = 5.0, models_ttl: float = 60.0, timeout: float = 3.0, max_tracked: int = 10000):
+        if not urls:
+            raise ValueError("at least one ComfyUI backend url is required")
+        self.backends = [ComfyBackend(url) for url in urls]
+        self.health_ttl = health_ttl
+        self.models_ttl = models_ttl
+        self.timeout = timeout
+        self.max_tracked = max_tracked
+        self.owners: "OrderedDict[str, ComfyBackend]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def primary(self) -> ComfyBackend:
+        return self.backends[0]
+
+    def _probe(self, backend: ComfyBackend):
+        now = time.monotonic()
+        try:
+            response = requests.get(f"{backend.url}/queue", timeout=self.timeout)
+            response.raise_for_status()
+            queue = response.json()
+            depth = len(queue.get('queue_running', [])) + len(queue.get('queue_pending', []))
+            models = backend.models
+            if models is None or now - backend.models_checked_at >= self.models_ttl:
+                models_response = requests.get(f"{backend.url}/models/checkpoints", timeout=self.timeout)
+                models_response.raise_for_status()
+                models = set(models_response.json())
+                backend.models_checked_at = now
+            with self.lock:
+                backend.queue_depth = depth
+                backend.assigned = 0
+                backend.models = models
+                backend.healthy = True
+                backend.error = None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            with self.lock:
+                backend.healthy = False
+                backend.error = str(e)
+        backend.checked_at = now
+
+    def refresh(self, force: bool = False):
+        now = time.monotonic()
+        stale = [b for b in self.backends if force or now - b.checked_at >= self.health_ttl]
+        if not stale:
+            return
+        with ThreadPoolExecutor(max_workers=len(stale)) as pool:
+            list(pool.map(self._probe, stale))
+
+    def select(self, model: str | None = None, exclude=()) -> ComfyBackend:
+        """Least loaded healthy backend with `model`, other than those in `exclude`."""
+        if len(self.backends) == 1:
+            if self.primary in exclude:
+                raise NoBackendAvailable("no other ComfyUI backend")
+            return self.primary
+        self.refresh()
+        with self.lock:
+            healthy = [b for b in self.backends if b.healthy and b not in exclude]
+            candidates = [b for b in healthy if model is None or b.models is None or model in b.models]
+            if not candidates:
+                if healthy:
+                    raise NoBackendAvailable(f"no healthy ComfyUI backend has model '{model}'")
+                raise NoBackendAvailable("no healthy ComfyUI backend")
+            backend = min(candidates, key=lambda b: b.load())
+            backend.assigned += 1
+            return backend
+
+    def mark_unhealthy(self, backend: ComfyBackend, error: str):
+        with self.lock:
+            backend.healthy = False
+            backend.error = error
+            backend.checked_at = time.monotonic()
+
+    def submit(self, workflow: dict, client_id: str, model: str | None = None, backend: ComfyBackend | None = None,
+               connect: Callable[[ComfyBackend], None] | None = None,
+               disconnect: Callable[[ComfyBackend], None] | None = None) -> tuple:
+        """Queue `workflow` on `backend`, or the backend `select` picks for `model`.
+
+        `connect(backend)` is called first so the caller is listening before
+        anything is queued, and `disconnect(backend)` if queueing then fails.
+        A backend that can't be reached is marked unhealthy and the prompt is
+        retried once on another backend; if there is none, the original error
+        is raised. Returns (backend, prompt_id).
+        """
+        tried = []
+        last_error = None
+        while True:
+            if backend is None:
+                try:
+                    backend = self.select(model, tried)
+                except NoBackendAvailable:
+                    if last_error is not None:
+                        raise last_error
+                    raise
+            try:
+                if connect:
+                    connect(backend)
+                prompt_id = queue_prompt(backend.url, workflow, client_id)
+            except Exception as e:
+                if disconnect:
+                    disconnect(backend)
+                if not is_unreachable(e):
+                    raise
+                self.mark_unhealthy(backend, str(e))
+                tried.append(backend)
+                if len(tried) > 1:
+                    raise
+                last_error, backend = e, None
+                continue
+            self.assign(prompt_id, backend)
+            return backend, prompt_id
+
+    def assign(self, prompt_id: str, backend: ComfyBackend):
+        with self.lock:
+            self.owners[prompt_id] = backend
+            self.owners.move_to_end(prompt_id)
+            while len(self.owners) > self.max_tracked:
+                self.owners.popitem(last=False)
+
+    def by_id(self, backend_id: str | None) -> ComfyBackend | None:
+        for backend in self.backends:
+            if backend.id == backend_id:
+                return backend
+        return None
+
+    def backend_for(self, prompt_id: str | None) -> ComfyBackend | None:
+        if not prompt_id:
+            return None
+        with self.lock:
+            return self.owners.get(prompt_id)
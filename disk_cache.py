@@ -0,0 +1,181 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator
+
+
+class CacheEntry:
+    def __init__(self, key: str, path: str, size: int, content_type: str, meta: dict | None = None):
+        self.key = key
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+        self.meta = meta or {}
+
+
+class DiskCache:
+    """Key -> bytes cache on local disk, bounded by total size with LRU eviction.
+
+    Each entry is stored as `<key>.data` plus a `<key>.json` sidecar holding the
+    content type and caller metadata. Other files named `<key>.*` (derivatives)
+    are removed together with the entry. Recency is kept in memory and mirrored
+    to the data file's mtime so the LRU order survives restarts. `on_commit`
+    is called with each newly stored entry.
+    """
+
+    def __init__(self, root: str, max_bytes: int, on_commit: Callable[[CacheEntry], None] | None = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.on_commit = on_commit
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.total_bytes = 0
+        os.makedirs(self.root, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def key_for(*parts) -> str:
+        """Stable content hash of the given parts (str, bytes or JSON-serialisable)."""
+        h = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, bytes):
+                data = part
+            elif isinstance(part, str):
+                data = part.encode('utf-8')
+            else:
+                data = json.dumps(part, sort_keys=True, separators=(',', ':')).encode('utf-8')
+            h.update(len(data).to_bytes(8, 'big'))
+            h.update(data)
+        return h.hexdigest()
+
+    def path_for(self, key: str, suffix: str = 'data') -> str:
+        return os.path.join(self.root, f"{key}.{suffix}")
+
+    def _load_index(self):
+        found = []
+        for sidecar in glob.glob(os.path.join(self.root, '*.json')):
+            key = os.path.basename(sidecar)[:-len('.json')]
+            path = self.path_for(key)
+            try:
+                with open(sidecar, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
+                st = os.stat(path)
+            except (OSError, ValueError):
+                self._remove_files(key)
+                continue
+            found.append((st.st_mtime, CacheEntry(key, path, st.st_size, info.get('content_type', 'application/octet-stream'), info.get('meta'))))
+        for _, entry in sorted(found, key=lambda item: item[0]):
+            self.entries[entry.key] = entry
+            self.total_bytes += entry.size
+        self._evict()
+
+    def get(self, key: str) -> CacheEntry | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if not os.path.exists(entry.path):
+                self._drop(key)
+                return None
+            self.entries.move_to_end(key)
+        try:
+            os.utime(entry.path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, data: bytes, content_type: str, meta: dict | None = None) -> CacheEntry | None:
+        tmp_path = self.path_for(key, f"{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        return self._commit(key, tmp_path, len(data), content_type, meta)
+
+    def tee(self, key: str, chunks: Iterable[bytes], content_type: str, meta: dict | None = None) -> Iterator[bytes]:
+        """Yield `chunks` unchanged while writing them to the cache.
+
+        The entry is only committed once the source is exhausted; an error or an
+        abandoned consumer leaves nothing behind.
+        """
+        tmp_path = self.path_for(key, f"{uuid.uuid4().hex}.tmp")
+        size = 0
+        completed = False
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            completed = True
+        finally:
+            if completed:
+                self._commit(key, tmp_path, size, content_type, meta)
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    async def atee(self, key: str, chunks: AsyncIterable[bytes], content_type: str, meta: dict | None = None) -> AsyncIterator[bytes]:
+        """Async counterpart of `tee` for streamed upstream bodies."""
+        tmp_path = self.path_for(key, f"{uuid.uuid4().hex}.tmp")
+        size = 0
+        completed = False
+        try:
+            with open(tmp_path, 'wb') as f:
+                async for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            completed = True
+        finally:
+            if completed:
+                self._commit(key, tmp_path, size, content_type, meta)
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def delete(self, key: str) -> bool:
+        with self.lock:
+            if key not in self.entries:
+                return False
+            self._drop(key)
+            return True
+
+    def _commit(self, key: str, tmp_path: str, size: int, content_type: str, meta: dict | None) -> CacheEntry | None:
+        if size > self.max_bytes:
+            os.remove(tmp_path)
+            return None
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            path = self.path_for(key)
+            os.replace(tmp_path, path)
+            with open(self.path_for(key, 'json'), 'w', encoding='utf-8') as f:
+                json.dump({"content_type": content_type, "meta": meta or {}}, f)
+            entry = CacheEntry(key, path, size, content_type, meta)
+            self.entries[key] = entry
+            self.total_bytes += size
+            self._evict()
+        if self.on_commit:
+            self.on_commit(entry)
+        return entry
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            oldest = next(iter(self.entries))
+            self._drop(oldest)
+
+    def _drop(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+        self._remove_files(key)
+
+    def _remove_files(self, key: str):
+        for path in glob.glob(os.path.join(glob.escape(self.root), f"{glob.escape(key)}.*")):
+            if path.endswith('.tmp'):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
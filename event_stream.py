@@ -0,0 +1,83 @@
+import asyncio
+import json
+import threading
+
+
+class EventLog:
+    """Append-only list of events that readers can follow from any thread.
+
+    Writers are background workers. Threads follow the log with `wait`; SSE
+    handlers use `wait_async`, which parks an asyncio.Event that writers set
+    through the reader's loop, so an idle subscriber holds no thread.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.closed = False
+        self.cond = threading.Condition()
+        self.waiters = set()  # (loop, asyncio.Event) of async readers
+
+    def append(self, event: str, data: dict):
+        with self.cond:
+            self.events.append((event, data))
+            self.cond.notify_all()
+            self._wake_async()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+            self._wake_async()
+
+    def wait(self, cursor: int, timeout: float):
+        """Return (events after `cursor`, closed) once there is something new or on timeout."""
+        with self.cond:
+            self.cond.wait_for(lambda: len(self.events) > cursor or self.closed, timeout=timeout)
+            return self.events[cursor:], self.closed
+
+    async def wait_async(self, cursor: int, timeout: float):
+        """Awaitable `wait` for readers on an event loop."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self.cond:
+            if len(self.events) > cursor or self.closed:
+                return self.events[cursor:], self.closed
+            self.waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self.cond:
+                self.waiters.discard(waiter)
+        with self.cond:
+            return self.events[cursor:], self.closed
+
+    def _wake_async(self):
+        for loop, wakeup in self.waiters:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # the reader's loop has been closed
+                pass
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def sse_events(log: EventLog, keepalive: float = 15.0):
+    """Async generator of SSE frames for `log`, ending when the log is closed.
+
+    A comment frame is sent every `keepalive` seconds of silence so proxies
+    don't drop idle connections.
+    """
+    cursor = 0
+    while True:
+        events, closed = await log.wait_async(cursor, keepalive)
+        for event, data in events:
+            yield format_sse(event, data)
+        cursor += len(events)
+        if closed and not events:
+            return
+        if not events:
+            yield ": keepalive\n\n"
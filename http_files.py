@@ -0,0 +1,138 @@
+import hashlib
+import os
+from email.utils import parsedate_to_datetime
+
+import httpx
+from fastapi import Request, UploadFile
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+# Large reads keep per-chunk overhead negligible for multi-megabyte media.
+PROXY_CHUNK_SIZE = 256 * 1024
+
+FORWARDED_REQUEST_HEADERS = ("range", "if-range", "if-none-match", "if-modified-since")
+FORWARDED_RESPONSE_HEADERS = (
+    "content-type", "content-length", "content-range", "content-encoding",
+    "accept-ranges", "etag", "last-modified", "cache-control",
+)
+
+_client: httpx.AsyncClient | None = None
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int, url: str):
+        super().__init__(f"upstream returned {status_code} for {url}")
+        self.status_code = status_code
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"upload exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+def async_client() -> httpx.AsyncClient:
+    """Process-wide pooled async HTTP client for talking to upstream services."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+    return _client
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def is_not_modified(request: Request, etag: str, mtime: float | None = None) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against a resource."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and mtime is not None:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def serve_file(request: Request, path: str, media_type: str, etag: str | None = None,
+               cache_control: str | None = None, filename: str | None = None) -> Response:
+    """Serve a local file with ETag/Last-Modified, 304 handling and byte ranges."""
+    stat_result = os.stat(path)
+    etag = etag or file_etag(stat_result)
+    headers = {"etag": etag, "accept-ranges": "bytes"}
+    if cache_control:
+        headers["cache-control"] = cache_control
+    if is_not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result, filename=filename)
+
+
+async def open_stream(url: str, headers: dict | None = None) -> httpx.Response:
+    """Start a streamed GET; the caller must `aclose()` the returned response."""
+    client = async_client()
+    upstream = await client.send(client.build_request("GET", url, headers=headers or {}), stream=True)
+    if upstream.status_code >= 400 and upstream.status_code != 416:
+        await upstream.aclose()
+        raise UpstreamError(upstream.status_code, url)
+    return upstream
+
+
+async def proxy(url: str, request: Request | None = None, extra_headers: dict | None = None) -> StreamingResponse:
+    """Relay an upstream resource without buffering it.
+
+    Range and conditional request headers are forwarded, and the upstream
+    status (200/206/304/416) and entity headers are passed back, so clients can
+    resume and revalidate. Raw bytes are relayed in large chunks as received.
+    """
+    headers = {}
+    if request is not None:
+        headers = {name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers}
+    upstream = await open_stream(url, headers)
+    response_headers = {name: upstream.headers[name] for name in FORWARDED_RESPONSE_HEADERS if name in upstream.headers}
+    response_headers.update(extra_headers or {})
+    return StreamingResponse(
+        upstream.aiter_raw(PROXY_CHUNK_SIZE),
+        status_code=upstream.status_code,
+        headers=response_headers,
+        background=BackgroundTask(upstream.aclose),
+    )
+
+
+async def digest_upload(upload: UploadFile, max_bytes: int) -> tuple:
+    """Return (sha256 hex, size) of an uploaded file, read in bounded chunks.
+
+    Raises UploadTooLarge past `max_bytes`. The file is rewound afterwards so it
+    can be streamed on.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+    digest = hashlib.sha256()
+    size = 0
+    await upload.seek(0)
+    while chunk := await upload.read(PROXY_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        digest.update(chunk)
+    await upload.seek(0)
+    return digest.hexdigest(), size
+
+
+def digest_file(path: str) -> tuple:
+    """sha256 hex digest and size of a file on disk."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while chunk := f.read(PROXY_CHUNK_SIZE):
+            size += len(chunk)
+            digest.update(chunk)
+    return digest.hexdigest(), size
@@ -0,0 +1,189 @@
+import json
+import os
+import time
+import uuid
+
+import requests
+import websockets
+from websockets.sync.client import connect as ws_connect
+
+import comfy_client
+from background_jobs import FINISHED_STATUSES, BackgroundJob, JobRunner
+from disk_cache import DiskCache
+
+
+class ImageJob(BackgroundJob):
+    def __init__(self, workflow: dict, cache_key: str, params: dict | None = None):
+        super().__init__()
+        self.workflow = workflow
+        self.cache_key = cache_key
+        self.params = params or {}
+        # status: pending, queued, running, done, failed
+        self.prompt_id = None
+        self.backend = None
+        self.progress = None
+        self.content_type = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "prompt_id": self.prompt_id,
+            "image_key": self.cache_key,
+            "backend": self.backend,
+            "progress": self.progress,
+            "content_type": self.content_type,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    def _record(self):
+        return {**self.to_dict(), "cache_key": self.cache_key}
+
+
+class ImageJobQueue(JobRunner):
+    """Runs ComfyUI generations in the background, independent of HTTP requests.
+
+    Each job is routed to a backend of the ComfyPool and gets its own ComfyUI
+    client id, so its websocket only carries that job's `progress`/`executed`
+    events, which are relayed into the job's
+    EventLog. Job records are persisted to `<root>/jobs.json` and finished images
+    live in the image cache under the job's `cache_key`, so results outlive the
+    request and the process. Finished jobs are forgotten after `retain` seconds.
+    """
+
+    def __init__(self, root: str, pool: comfy_client.ComfyPool, image_cache: DiskCache, max_workers: int = 4,
+                 ws_timeout: float = 600.0, retain: float = 3600.0):
+        super().__init__(max_workers, retain, 'image-job')
+        self.root = root
+        self.pool = pool
+        self.image_cache = image_cache
+        self.ws_timeout = ws_timeout
+        self.index_path = os.path.join(self.root, 'jobs.json')
+        os.makedirs(self.root, exist_ok=True)
+        self._load()
+
+    def submit(self, workflow: dict, cache_key: str, params: dict | None = None) -> ImageJob:
+        job = ImageJob(workflow, cache_key, params)
+        self._add(job)
+        cached = self.image_cache.get(cache_key)
+        if cached:
+            self._finish(job, cached.content_type)
+        else:
+            self._persist()
+            self.executor.submit(self._run, job)
+        return job
+
+    def result(self, job: ImageJob):
+        """Cache entry holding a finished job's image, or None if it has been evicted."""
+        return self.image_cache.get(job.cache_key) if job.status == 'done' else None
+
+    def _run(self, job: ImageJob):
+        client_id = str(uuid.uuid4())
+        backend = None
+        connections = {}
+
+        def connect(backend):
+            connections[backend.url] = ws_connect(comfy_client.ws_url(backend.url, client_id))
+
+        def disconnect(backend):
+            connection = connections.pop(backend.url, None)
+            if connection is not None:
+                connection.close()
+
+        try:
+            backend, job.prompt_id = self.pool.submit(job.workflow, client_id, job.params.get('checkpoint'),
+                                                      connect=connect, disconnect=disconnect)
+            job.backend = backend.url
+            with connections[backend.url] as websocket:
+                self._set_status(job, 'queued')
+                while True:
+                    message = comfy_client.parse_message(websocket.recv(timeout=self.ws_timeout))
+                    if not message:
+                        continue
+                    data = message.get('data', {})
+                    if data.get('prompt_id', job.prompt_id) != job.prompt_id:
+                        continue
+                    if message['type'] == 'execution_start':
+                        self._set_status(job, 'running')
+                    elif message['type'] == 'progress':
+                        job.progress = {"value": data.get('value'), "max": data.get('max')}
+                        job.events.append('progress', {"node": data.get('node'), **job.progress})
+                    elif message['type'] == 'execution_error':
+                        raise RuntimeError(data.get('exception_message', 'Execution failed'))
+                    elif message['type'] == 'executed':
+                        images = comfy_client.executed_images(message)
+                        job.events.append('executed', {"node": data.get('node'), "images": images})
+                        if images:
+                            self._store_result(job, backend, images[0])
+                            return
+        except Exception as e:
+            if backend is not None and isinstance(e, websockets.exceptions.ConnectionClosedError):
+                self.pool.mark_unhealthy(backend, str(e))
+            job.error = str(e)
+            job.events.append('failed', {"error": job.error})
+            self._set_status(job, 'failed')
+            job.events.close()
+
+    def _store_result(self, job: ImageJob, backend: comfy_client.ComfyBackend, image: dict):
+        image_response = requests.get(comfy_client.view_url(backend.url, image), stream=True)
+        image_response.raise_for_status()
+        content_type = image_response.headers.get('Content-Type', 'image/png')
+        for _ in self.image_cache.tee(job.cache_key, image_response.iter_content(64 * 1024), content_type):
+            pass
+        if self.image_cache.get(job.cache_key) is None:
+            raise RuntimeError('generated image could not be stored')
+        self._finish(job, content_type)
+
+    def _finish(self, job: ImageJob, content_type: str):
+        job.content_type = content_type
+        job.events.append('done', {"job_id": job.id, "result_url": f"/api/image-jobs/{job.id}/result"})
+        self._set_status(job, 'done')
+        job.events.close()
+
+    def _set_status(self, job: ImageJob, status: str):
+        job.updated_at = time.time()
+        if status not in FINISHED_STATUSES:
+            job.events.append('status', {"status": status, "prompt_id": job.prompt_id})
+        # written to disk before it is visible, so a status seen by a client survives a restart
+        self._persist({job.id: status})
+        job.status = status
+
+    def _persist(self, statuses: dict | None = None):
+        with self.lock:
+            records = {job_id: job._record() for job_id, job in self.jobs.items()}
+            for job_id, status in (statuses or {}).items():
+                records[job_id]['status'] = status
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(records, f)
+            os.replace(tmp_path, self.index_path)
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        for job_id, record in records.items():
+            job = ImageJob({}, record.get('cache_key'), record.get('params'))
+            job.id = job_id
+            job.prompt_id = record.get('prompt_id')
+            job.backend = record.get('backend')
+            job.progress = record.get('progress')
+            job.content_type = record.get('content_type')
+            job.error = record.get('error')
+            job.created_at = record.get('created_at', job.created_at)
+            job.updated_at = record.get('updated_at', job.updated_at)
+            job.status = record.get('status', 'failed')
+            if job.status == 'done' and self.image_cache.get(job.cache_key) is None:
+                job.status, job.error = 'failed', 'result file missing'
+            elif not job.finished:
+                # the worker that owned this job died with the previous process
+                job.status, job.error = 'failed', 'interrupted by server restart'
+            job.events.append(job.status, {"job_id": job.id, "error": job.error} if job.status == 'failed'
+                              else {"job_id": job.id, "result_url": f"/api/image-jobs/{job.id}/result"})
+            job.events.close()
+            self.jobs[job_id] = job
+        self._prune(time.time())
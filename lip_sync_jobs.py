@@ -0,0 +1,80 @@
+from typing import Callable
+
+from background_jobs import BackgroundJob, JobRunner
+
+STAGES = ('synthesizing', 'uploading', 'lip_sync')
+
+
+class LipSyncJob(BackgroundJob):
+    def __init__(self, source_video_id: int, text: str, voice_id: str, model_id: str | None = None):
+        super().__init__()
+        self.source_video_id = source_video_id
+        self.text = text
+        self.voice_id = voice_id
+        self.model_id = model_id
+        # status: pending, one of STAGES, done, failed
+        self.media_id = None
+        self.video_id = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "source_video_id": self.source_video_id,
+            "voice_id": self.voice_id,
+            "model_id": self.model_id,
+            "media_id": self.media_id,
+            "video_id": self.video_id,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class LipSyncPipeline(JobRunner):
+    """Runs speech-to-lip-sync jobs server-side: ElevenLabs TTS, PixVerse media
+    upload and the PixVerse lip-sync request, one after the other.
+
+    The stages are injected as blocking callables so the audio goes from the
+    TTS provider to PixVerse without passing through the browser:
+    `synthesize(text, voice_id, model_id)` returns a local audio file path,
+    `upload_media(path)` returns a PixVerse media_id and
+    `start_lip_sync(source_video_id, media_id)` returns the new video_id.
+    Each stage is published as a `stage` event on the job's EventLog, followed
+    by `done` or `failed`. Finished jobs are forgotten after `retain` seconds;
+    the resulting video lives on in the PixVerse job registry.
+    """
+
+    def __init__(self, synthesize: Callable[[str, str, str | None], str], upload_media: Callable[[str], int],
+                 start_lip_sync: Callable[[int, int], object], max_workers: int = 2, retain: float = 3600.0):
+        super().__init__(max_workers, retain, 'lip-sync')
+        self.synthesize = synthesize
+        self.upload_media = upload_media
+        self.start_lip_sync = start_lip_sync
+
+    def submit(self, source_video_id: int, text: str, voice_id: str, model_id: str | None = None) -> LipSyncJob:
+        job = LipSyncJob(source_video_id, text, voice_id, model_id)
+        self._add(job)
+        self.executor.submit(self._run, job)
+        return job
+
+    def _run(self, job: LipSyncJob):
+        try:
+            self._set_stage(job, 'synthesizing')
+            audio_path = self.synthesize(job.text, job.voice_id, job.model_id)
+            self._set_stage(job, 'uploading')
+            job.media_id = self.upload_media(audio_path)
+            self._set_stage(job, 'lip_sync', media_id=job.media_id)
+            job.video_id = self.start_lip_sync(job.source_video_id, job.media_id)
+        except Exception as e:
+            job.error = str(e)
+            job.events.append('failed', {"job_id": job.id, "stage": job.status, "error": job.error})
+            self._set_status(job, 'failed')
+        else:
+            job.events.append('done', {"job_id": job.id, "media_id": job.media_id, "video_id": job.video_id})
+            self._set_status(job, 'done')
+        job.events.close()
+
+    def _set_stage(self, job: LipSyncJob, stage: str, **data):
+        job.events.append('stage', {"stage": stage, "index": STAGES.index(stage), "total": len(STAGES), **data})
+        self._set_status(job, stage)
@@ -1,7 +1,7 @@
 import os
 import chromadb
 from chromadb.types import Metadata
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.responses import HTMLResponse, StreamingResponse
 from sentence_transformers import SentenceTransformer
 import logging
@@ -10,16 +10,35 @@ import json
 import uuid
 import websockets
 import asyncio
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, FileResponse, RedirectResponse
 from dotenv import load_dotenv
 from elevenlabs import Voice
 from elevenlabs.client import ElevenLabs
 import base64
+import mimetypes
 from pydantic import BaseModel
 import shutil
-from thread_store import ThreadStore
+from thread_store import SqliteThreadStore, ThreadStore
 from asset_manager import save_base64_image
 from export_queue import ExportQueue
+from workflow_registry import WorkflowRegistry, DEFAULT_WORKFLOW_PARAMS
+import comfy_client
+from disk_cache import DiskCache
+from image_jobs import ImageJobQueue
+from event_stream import sse_events
+import http_files
+from thumbnails import DerivativePipeline
+import tts_pipeline
+from pixverse_tracker import PixverseTracker, STATUS_SUCCESSFUL
+from pixverse_store import PixverseJobStore, PixverseUploadCache
+from media_mirror import MediaMirror
+from pixverse_client import PixverseClient, PixverseError, PixverseUnavailable
+from lip_sync_jobs import LipSyncPipeline
+from pixverse_credits import CreditLedger, InsufficientCredits, estimate_cost
+from remote_images import RemoteImageError, RemoteImageFetcher, RemoteImageTooLarge
+from vision_images import VisionImageNormalizer, decode_base64_image
+import httpx
+from starlette.background import BackgroundTask
 
 # --- 1. Application Setup ---
 
@@ -28,7 +47,13 @@ load_dotenv()
 
 # ComfyUI server details
 COMFYUI_URL = "http://192.168.0.45:8188"
-COMFYUI_CLIENT_ID = str(uuid.uuid4())
+# Comma-separated list of ComfyUI servers to spread work across (defaults to COMFYUI_URL)
+COMFYUI_URLS = [u.strip() for u in os.getenv("COMFYUI_URLS", COMFYUI_URL).split(",") if u.strip()]
+comfy_pool = comfy_client.ComfyPool(COMFYUI_URLS)
+
+# ComfyUI workflow templates, parsed once and reloaded only when the file changes
+workflow_registry = WorkflowRegistry()
+workflow_registry.register("default", "comfy_workflow.json", DEFAULT_WORKFLOW_PARAMS)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -42,6 +67,59 @@ DB_PATH = "db"
 if not os.path.exists(DB_PATH):
     os.makedirs(DB_PATH)
 
+# Downscaled WebP/JPEG derivatives of stored and generated images, built in the background
+derivative_pipeline = DerivativePipeline()
+
+# Content-addressed cache of generated images, keyed by the hash of the resolved workflow
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(1024 ** 3)))
+image_cache = DiskCache(
+    os.path.join(DB_PATH, "image_cache"),
+    IMAGE_CACHE_MAX_BYTES,
+    on_commit=lambda entry: derivative_pipeline.enqueue(entry.path)
+)
+
+
+def serve_image(request: Request, path: str, media_type: str, size: int | None, etag: str | None = None, cache_control: str | None = None):
+    """Serve an image, or its derivative for `size` once the pipeline has produced it."""
+    if size is not None:
+        if size not in derivative_pipeline.sizes:
+            raise HTTPException(status_code=400, detail=f"Unsupported size {size}; use one of {list(derivative_pipeline.sizes)}")
+        derivative = derivative_pipeline.get(path, size)
+        if derivative:
+            derivative_etag = f'{etag[:-1]}-{size}"' if etag else None
+            return http_files.serve_file(request, derivative, derivative_pipeline.media_type,
+                                         etag=derivative_etag, cache_control=cache_control)
+    return http_files.serve_file(request, path, media_type, etag=etag, cache_control=cache_control)
+
+
+# Images already on the server are referenced by asset id instead of being sent
+# back inline: "image:<key>" for a generated image (its X-Image-Key) and
+# "thread:<thread_id>/<filename>" for an image saved with a thread message.
+THREAD_ASSETS_PATH = os.path.join(DB_PATH, "thread_assets")
+
+
+def thread_asset_id(file_path: str) -> str:
+    return f"thread:{os.path.basename(os.path.dirname(file_path))}/{os.path.basename(file_path)}"
+
+
+def resolve_image_asset(asset_id: str) -> tuple | None:
+    """(path, content type) of the file behind an image asset id, or None if there is none."""
+    kind, _, ref = asset_id.partition(":")
+    if kind == "image":
+        cached = image_cache.get(ref)
+        return (cached.path, cached.content_type) if cached else None
+    if kind == "thread":
+        thread_id, _, filename = ref.partition("/")
+        if not thread_id or any(c in thread_id for c in './\\') or not thread_store.has_thread(thread_id):
+            return None
+        assets_root = os.path.realpath(THREAD_ASSETS_PATH)
+        assets_dir = os.path.realpath(os.path.join(assets_root, thread_id))
+        path = os.path.realpath(os.path.join(assets_dir, filename))
+        if (os.path.dirname(assets_dir) == assets_root and os.path.dirname(path) == assets_dir
+                and '.thumb-' not in filename and os.path.isfile(path)):
+            return path, mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    return None
+
 # Load the embedding model (this can take a moment)
 logger.info("Loading sentence transformer model...")
 try:
@@ -204,68 +282,165 @@ async def get_ollama_models():
 @app.get("/api/comfyui/models")
 def get_comfyui_models():
     """
-    Fetches the list of available checkpoint models from ComfyUI server.
+    Fetches the list of available checkpoint models from the ComfyUI server(s).
     """
-    try:
-        response = requests.get(f"{COMFYUI_URL}/models/checkpoints")
-        response.raise_for_status()
-        models = response.json()
-        return {"models": models}
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Could not fetch models from ComfyUI: {e}")
+    models = []
+    errors = []
+    for backend in comfy_pool.backends:
+        try:
+            response = requests.get(f"{backend.url}/models/checkpoints")
+            response.raise_for_status()
+            models.extend(m for m in response.json() if m not in models)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Could not fetch models from ComfyUI at {backend.url}: {e}")
+            errors.append(e)
+        except Exception as e:
+            logger.error(f"Error fetching ComfyUI models: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to fetch models: {e}")
+    if errors and len(errors) == len(comfy_pool.backends):
         raise HTTPException(status_code=503, detail="Could not fetch models from ComfyUI server.")
-    except Exception as e:
-        logger.error(f"Error fetching ComfyUI models: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to fetch models: {e}")
+    return {"models": models}
 
 
-@app.post("/api/generate-image")
-async def generate_image(prompt: str = Form(...), model: str = Form(...)):
+@app.get("/api/comfyui/backends")
+def get_comfyui_backends():
     """
-    Generates an image using ComfyUI based on a prompt and a selected model.
+    Reports health, queue depth and available checkpoints of each ComfyUI backend.
     """
-    try:
-        # 1. Load the base workflow
-        with open("comfy_workflow.json", "r") as f:
-            workflow = json.load(f)
+    comfy_pool.refresh(force=True)
+    return {"backends": [backend.to_dict() for backend in comfy_pool.backends]}
 
-        # 2. Modify the workflow with the user's prompt and model choice
-        workflow["6"]["inputs"]["text"] = prompt
-        workflow["4"]["inputs"]["ckpt_name"] = model
 
-        # Log the workflow being sent
-        logger.info(f"Sending the following workflow to ComfyUI:\n{json.dumps(workflow, indent=2)}")
+@app.get("/api/comfyui/workflows")
+def get_comfyui_workflows():
+    """
+    Lists the registered ComfyUI workflow templates and their named parameters.
+    """
+    workflows = []
+    for name in workflow_registry.names():
+        template = workflow_registry.get(name)
+        workflows.append({"name": name, "params": sorted(template.params.keys())})
+    return {"workflows": workflows}
 
-        # 3. Queue the prompt with ComfyUI
-        headers = {'Content-Type': 'application/json'}
-        data = json.dumps({"prompt": workflow, "client_id": COMFYUI_CLIENT_ID}).encode('utf-8')
-        response = requests.post(f"{COMFYUI_URL}/prompt", data=data, headers=headers)
-        response.raise_for_status()
-        prompt_id = response.json()['prompt_id']
-        
-        # 4. Wait for the image to be generated via WebSocket
-        async with websockets.connect(f"ws://{COMFYUI_URL.split('//')[1]}/ws?clientId={COMFYUI_CLIENT_ID}") as websocket:
+
+async def queue_on_comfy(workflow: dict, model: str, client_id: str, websockets_by_url: dict,
+                         backend: comfy_client.ComfyBackend | None = None):
+    """
+    Queues `workflow` on a ComfyUI backend (`backend`, or one picked for
+    `model`) with `ComfyPool.submit`, listening on its websocket under
+    `client_id` first so no event is missed. Opened websockets are added to
+    `websockets_by_url` for the caller to read and close.
+    Returns (backend, prompt_id).
+    """
+    loop = asyncio.get_running_loop()
+
+    # submit runs in a worker thread; the websockets belong to the event loop
+    def connect(backend):
+        if backend.url not in websockets_by_url:
+            url = comfy_client.ws_url(backend.url, client_id)
+            websockets_by_url[backend.url] = asyncio.run_coroutine_threadsafe(websockets.connect(url), loop).result()
+
+    def disconnect(backend):
+        websocket = websockets_by_url.pop(backend.url, None)
+        if websocket is not None:
+            asyncio.run_coroutine_threadsafe(websocket.close(), loop).result()
+
+    return await asyncio.to_thread(comfy_pool.submit, workflow, client_id, model, backend,
+                                   connect=connect, disconnect=disconnect)
+
+
+@app.post("/api/generate-image")
+async def generate_image(
+    request: Request,
+    prompt: str = Form(...),
+    model: str = Form(...),
+    workflow_name: str = Form("default", alias="workflow"),
+    seed: int = Form(None),
+    steps: int = Form(None),
+    width: int = Form(None),
+    height: int = Form(None)
+):
+    """
+    Generates an image using ComfyUI based on a prompt and a selected model.
+    """
+    try:
+        # 1. Render the workflow template with the user's prompt and model choice
+        try:
+            workflow = workflow_registry.render(
+                workflow_name,
+                prompt=prompt,
+                checkpoint=model,
+                seed=seed,
+                steps=steps,
+                width=width,
+                height=height
+            )
+        except KeyError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid workflow request: {e}")
+
+        # A fully resolved workflow (fixed seed included) always yields the same image
+        cache_key = DiskCache.key_for(workflow)
+        cached = image_cache.get(cache_key)
+        if cached:
+            logger.info(f"Serving generated image {cache_key[:12]} from cache")
+            response = http_files.serve_file(request, cached.path, cached.content_type, etag=f'"{cache_key}"')
+            response.headers.update({"X-Image-Key": cache_key, "X-Cache": "hit"})
+            return response
+
+        logger.info(f"Queueing ComfyUI workflow '{workflow_name}' with model '{model}'")
+
+        # 2. Queue the prompt on the least busy ComfyUI backend, listening before queueing so no event is missed
+        # ComfyUI keeps one socket per client id, so every request listens under its own
+        client_id = str(uuid.uuid4())
+        websockets_by_url = {}
+        try:
+            backend, prompt_id = await queue_on_comfy(workflow, model, client_id, websockets_by_url)
+        except Exception:
+            for ws in websockets_by_url.values():
+                await ws.close()
+            raise
+        websocket = websockets_by_url[backend.url]
+        try:
+            # 3. Wait for the image to be generated via WebSocket
             while True:
-                out = await websocket.recv()
-                if isinstance(out, str):
-                    message = json.loads(out)
-                    if message['type'] == 'executed' and message['data']['prompt_id'] == prompt_id:
-                        # We have our image details
-                        data = message['data']['output']['images'][0]
-                        image_path = f"{data['subfolder']}/{data['filename']}"
-                        
-                        # 5. Fetch the generated image from the ComfyUI output directory
-                        image_url = f"{COMFYUI_URL}/view?filename={data['filename']}&subfolder={data['subfolder']}&type={data['type']}"
-                        image_response = requests.get(image_url, stream=True)
-                        image_response.raise_for_status()
-                        
-                        # 6. Stream the image back to the client
-                        return StreamingResponse(image_response.iter_content(1024), media_type=image_response.headers['Content-Type'])
+                try:
+                    message = comfy_client.parse_message(await websocket.recv())
+                except websockets.exceptions.ConnectionClosedError as e:
+                    comfy_pool.mark_unhealthy(backend, str(e))
+                    raise
+                if not message or message['type'] != 'executed' or message['data']['prompt_id'] != prompt_id:
+                    continue
+                images = comfy_client.executed_images(message)
+                if not images:
+                    continue
+
+                # 4. Fetch the generated image from the ComfyUI output directory
+                upstream = await http_files.open_stream(comfy_client.view_url(backend.url, images[0]))
+
+                # 5. Stream the image back to the client, keeping a copy in the cache
+                content_type = upstream.headers.get('Content-Type', 'image/png')
+                headers = {"X-Image-Key": cache_key, "X-Cache": "miss", "ETag": f'"{cache_key}"'}
+                if 'Content-Length' in upstream.headers and 'Content-Encoding' not in upstream.headers:
+                    headers['Content-Length'] = upstream.headers['Content-Length']
+                return StreamingResponse(
+                    image_cache.atee(cache_key, upstream.aiter_bytes(http_files.PROXY_CHUNK_SIZE), content_type),
+                    media_type=content_type,
+                    headers=headers,
+                    background=BackgroundTask(upstream.aclose)
+                )
+        finally:
+            await websocket.close()
 
+    except HTTPException:
+        raise
+    except comfy_client.NoBackendAvailable as e:
+        logger.error(f"No ComfyUI backend available: {e}")
+        raise HTTPException(status_code=503, detail=f"No image generation server available: {e}")
     except websockets.exceptions.ConnectionClosed as e:
         logger.error(f"WebSocket connection to ComfyUI closed unexpectedly: {e}")
         raise HTTPException(status_code=503, detail="Lost connection to image generation server.")
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, httpx.HTTPError, http_files.UpstreamError,
+            OSError, websockets.exceptions.WebSocketException) as e:
         logger.error(f"Could not connect to ComfyUI API for image generation: {e}")
         raise HTTPException(status_code=503, detail="Could not connect to ComfyUI API.")
     except Exception as e:
@@ -273,10 +448,274 @@ async def generate_image(prompt: str = Form(...), model: str = Form(...)):
         raise HTTPException(status_code=500, detail=f"Failed to generate image: {e}")
 
 
+MAX_IMAGE_BATCH = 32
+# A batch gives up on its remaining images after this long without any message from ComfyUI
+IMAGE_BATCH_IDLE_TIMEOUT = float(os.getenv("IMAGE_BATCH_IDLE_TIMEOUT", "300"))
+
+
+class ImageBatchRequest(BaseModel):
+    # Either a single `prompt` or a list of `prompts`; each is rendered once per seed in `seeds`.
+    prompt: str | None = None
+    prompts: list[str] | None = None
+    seeds: list[int] | None = None
+    model: str
+    workflow: str = "default"
+    steps: int | None = None
+    width: int | None = None
+    height: int | None = None
+
+
+@app.post("/api/generate-image/batch")
+async def generate_image_batch(request: ImageBatchRequest):
+    """
+    Queues a batch of image generations on ComfyUI at once and streams results back
+    as NDJSON, one line per image in completion order, each with an asset URL.
+    """
+    prompts = request.prompts or ([request.prompt] if request.prompt else [])
+    if not prompts:
+        raise HTTPException(status_code=400, detail="No prompt provided. Include prompt or prompts.")
+    seeds = request.seeds or [None]
+    specs = [{"prompt": p, "seed": seed} for p in prompts for seed in seeds]
+    if len(specs) > MAX_IMAGE_BATCH:
+        raise HTTPException(status_code=400, detail=f"Batch too large: {len(specs)} images (max {MAX_IMAGE_BATCH}).")
+
+    try:
+        workflows = [
+            workflow_registry.render(
+                request.workflow,
+                prompt=spec["prompt"],
+                checkpoint=request.model,
+                seed=spec["seed"],
+                steps=request.steps,
+                width=request.width,
+                height=request.height
+            )
+            for spec in specs
+        ]
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid workflow request: {e}")
+
+    # Spread the batch over the backends, one websocket per backend in use
+    try:
+        owners = [await asyncio.to_thread(comfy_pool.select, request.model) for _ in workflows]
+    except comfy_client.NoBackendAvailable as e:
+        raise HTTPException(status_code=503, detail=f"No image generation server available: {e}")
+    client_id = str(uuid.uuid4())
+    websockets_by_url = {}
+
+    # Queue everything up front so ComfyUI can pipeline the whole batch
+    pending = {}
+    try:
+        for index, workflow in enumerate(workflows):
+            owner = owners[index] if owners[index].healthy else None
+            owners[index], prompt_id = await queue_on_comfy(workflow, request.model, client_id, websockets_by_url, owner)
+            pending[prompt_id] = index
+    except Exception as e:
+        for ws in websockets_by_url.values():
+            await ws.close()
+        logger.error(f"Could not queue image batch on ComfyUI: {e}")
+        if isinstance(e, comfy_client.NoBackendAvailable):
+            raise HTTPException(status_code=503, detail=f"No image generation server available: {e}")
+        raise HTTPException(status_code=503, detail="Could not connect to ComfyUI API.")
+    logger.info(f"Queued batch of {len(pending)} images on {len(websockets_by_url)} ComfyUI backend(s)")
+
+    def error_line(prompt_id, error):
+        index = pending.pop(prompt_id)
+        return json.dumps({"index": index, "prompt_id": prompt_id, **specs[index], "status": "error", "error": error}) + "\n"
+
+    async def results():
+        inbox = asyncio.Queue()
+
+        async def pump(url, websocket):
+            try:
+                while True:
+                    await inbox.put((url, await websocket.recv()))
+            except Exception as e:
+                await inbox.put((url, e))
+
+        pumps = [asyncio.create_task(pump(url, ws)) for url, ws in websockets_by_url.items()]
+        try:
+            while pending:
+                try:
+                    url, raw = await asyncio.wait_for(inbox.get(), IMAGE_BATCH_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    logger.error(f"No message from ComfyUI for {IMAGE_BATCH_IDLE_TIMEOUT}s; abandoning {len(pending)} batch image(s)")
+                    for prompt_id in list(pending):
+                        yield error_line(prompt_id, "Timed out waiting for the image generation server.")
+                    break
+                if isinstance(raw, Exception):
+                    logger.error(f"WebSocket connection to ComfyUI at {url} closed during batch: {raw}")
+                    if isinstance(raw, websockets.exceptions.ConnectionClosedError):
+                        comfy_pool.mark_unhealthy(next(b for b in owners if b.url == url), str(raw))
+                    for prompt_id in [p for p, i in pending.items() if owners[i].url == url]:
+                        yield error_line(prompt_id, "Lost connection to image generation server.")
+                    continue
+                message = comfy_client.parse_message(raw)
+                if not message:
+                    continue
+                data = message.get('data', {})
+                prompt_id = data.get('prompt_id')
+                if prompt_id not in pending:
+                    continue
+                if message['type'] == 'executed':
+                    images = comfy_client.executed_images(message)
+                    if not images:
+                        continue
+                    index = pending.pop(prompt_id)
+                    line = {
+                        "index": index, "prompt_id": prompt_id, **specs[index], "status": "done",
+                        "image_urls": [f"/api/comfyui/view?{comfy_client.view_params(img)}&backend={owners[index].id}" for img in images]
+                    }
+                    yield json.dumps(line) + "\n"
+                elif message['type'] == 'execution_error':
+                    yield error_line(prompt_id, data.get('exception_message', 'Execution failed'))
+        finally:
+            for task in pumps:
+                task.cancel()
+            for ws in websockets_by_url.values():
+                await ws.close()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.get("/api/comfyui/view")
+async def view_comfyui_image(request: Request, filename: str, subfolder: str = "", type: str = "output",
+                             backend: str | None = None, prompt_id: str | None = None):
+    """
+    Proxies a generated image from the output directory of the ComfyUI backend
+    with id `backend` (or the one that ran `prompt_id`, while that is still
+    remembered). Every backend numbers its outputs the same way, so with more
+    than one backend an image whose owner is unknown is a 404 rather than a
+    guess. Range and conditional requests are passed through to ComfyUI.
+    """
+    owner = comfy_pool.by_id(backend) if backend else comfy_pool.backend_for(prompt_id)
+    if owner is None and not backend and len(comfy_pool.backends) == 1:
+        owner = comfy_pool.primary
+    if owner is None:
+        raise HTTPException(status_code=404, detail="Unknown image generation server for this image.")
+    image = {"filename": filename, "subfolder": subfolder, "type": type}
+    try:
+        return await http_files.proxy(comfy_client.view_url(owner.url, image), request)
+    except http_files.UpstreamError as e:
+        raise HTTPException(status_code=404 if e.status_code == 404 else 502, detail="Image not available from ComfyUI.")
+    except httpx.HTTPError as e:
+        logger.error(f"Could not fetch image from ComfyUI: {e}")
+        raise HTTPException(status_code=503, detail="Could not connect to ComfyUI API.")
+
+
+@app.get("/api/images/{image_key}")
+async def get_generated_image(request: Request, image_key: str, size: int | None = None):
+    """
+    Serves a previously generated image by its content key (the X-Image-Key
+    header of /api/generate-image), with ETag and Range support. Pass `size`
+    for a downscaled thumbnail; the original is served until it is ready.
+    """
+    cached = image_cache.get(image_key)
+    if not cached:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return serve_image(request, cached.path, cached.content_type, size, etag=f'"{image_key}"',
+                       cache_control="public, max-age=31536000, immutable")
+
+
+# Background image-generation jobs, decoupled from the HTTP request lifetime
+image_job_queue = ImageJobQueue(os.path.join(DB_PATH, "image_jobs"), comfy_pool, image_cache)
+
+
+@app.post("/api/image-jobs")
+async def submit_image_job(
+    prompt: str = Form(...),
+    model: str = Form(...),
+    workflow_name: str = Form("default", alias="workflow"),
+    seed: int = Form(None),
+    steps: int = Form(None),
+    width: int = Form(None),
+    height: int = Form(None)
+):
+    """
+    Submits an image generation job and returns immediately with its job id.
+    Progress is available at /api/image-jobs/{job_id}/events (SSE) and the image
+    at /api/image-jobs/{job_id}/result once the job is done.
+    """
+    params = {"prompt": prompt, "checkpoint": model, "seed": seed, "steps": steps, "width": width, "height": height}
+    try:
+        workflow = workflow_registry.render(workflow_name, **params)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid workflow request: {e}")
+
+    try:
+        job = image_job_queue.submit(workflow, DiskCache.key_for(workflow), params={"workflow": workflow_name, **params})
+        return {"job_id": job.id, "status": job.status}
+    except Exception as e:
+        logger.error(f"Error submitting image job: {e}")
+        raise HTTPException(status_code=500, detail="Failed to submit image job")
+
+
+@app.get("/api/image-jobs/{job_id}")
+async def image_job_status(job_id: str):
+    job = image_job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Image job not found")
+    return job.to_dict()
+
+
+@app.get("/api/image-jobs/{job_id}/events")
+async def image_job_events(job_id: str):
+    """
+    Streams the job's status, ComfyUI `progress` (step x/y) and `executed` events as SSE.
+    """
+    job = image_job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Image job not found")
+    return StreamingResponse(sse_events(job.events), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/api/image-jobs/{job_id}/result")
+async def image_job_result(request: Request, job_id: str):
+    job = image_job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Image job not found")
+    if job.status != 'done':
+        raise HTTPException(status_code=409, detail=f"Image not ready: {job.status}")
+    entry = image_job_queue.result(job)
+    if not entry:
+        raise HTTPException(status_code=410, detail="Image is no longer available")
+    return http_files.serve_file(request, entry.path, entry.content_type, etag=f'"{job.cache_key}"')
+
+
+# Synthesized speech keyed by (voice, model, text); repeats are served from disk
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(512 * 1024 ** 2)))
+tts_cache = DiskCache(os.path.join(DB_PATH, "tts_cache"), TTS_CACHE_MAX_BYTES)
+# Sentences synthesized concurrently in pipelined mode
+TTS_MAX_PARALLEL = int(os.getenv("TTS_MAX_PARALLEL", "3"))
+
+
+def synthesize_segment(text: str, voice_id: str, model_id: str | None = None) -> bytes:
+    """Blocking synthesis of one segment, going through the TTS cache."""
+    cache_key = DiskCache.key_for("tts", voice_id, model_id or "default", text)
+    cached = tts_cache.get(cache_key)
+    if cached:
+        with open(cached.path, "rb") as f:
+            return f.read()
+    options = {"model_id": model_id} if model_id else {}
+    audio = b"".join(eleven_client.text_to_speech.stream(text=text, voice_id=voice_id, **options))
+    tts_cache.put(cache_key, audio, "audio/mpeg")
+    return audio
+
+
 @app.post("/api/text-to-speech")
-async def text_to_speech(text: str = Form(...), voice_id: str = Form(...)):
+async def text_to_speech(
+    request: Request,
+    text: str = Form(...),
+    voice_id: str = Form(...),
+    model_id: str = Form(None),
+    pipelined: bool = Form(False)
+):
     """
     Converts text to speech using the ElevenLabs API and streams the audio back.
+    Audio is cached on disk while it streams; repeated requests for the same
+    voice, model and text are served from the cache (with Range support).
+    With `pipelined`, long text is split into sentences that are synthesized
+    concurrently and streamed in order as soon as the first one is ready.
     """
     if not eleven_client:
         raise HTTPException(status_code=501, detail="Text-to-speech service is not configured.")
@@ -284,15 +723,51 @@ async def text_to_speech(text: str = Form(...), voice_id: str = Form(...)):
     if not text:
         raise HTTPException(status_code=400, detail="No text provided for speech synthesis.")
 
+    segments = tts_pipeline.split_sentences(text) if pipelined else [text]
+    if len(segments) > 1:
+        cache_key = DiskCache.key_for("tts-pipelined", voice_id, model_id or "default", text)
+        cached = tts_cache.get(cache_key)
+        if cached:
+            response = http_files.serve_file(request, cached.path, cached.content_type, etag=f'"{cache_key}"')
+            response.headers["X-Cache"] = "hit"
+            return response
+
+        def synthesize(segment):
+            return synthesize_segment(segment, voice_id, model_id)
+
+        async def audio_chunks():
+            async for _, audio in tts_pipeline.synthesize_in_order(segments, synthesize, TTS_MAX_PARALLEL):
+                yield audio
+
+        logger.info(f"Synthesizing {len(segments)} segments with up to {TTS_MAX_PARALLEL} in parallel")
+        return StreamingResponse(
+            tts_cache.atee(cache_key, audio_chunks(), "audio/mpeg"),
+            media_type="audio/mpeg",
+            headers={"X-Cache": "miss", "X-TTS-Segments": str(len(segments))}
+        )
+
+    cache_key = DiskCache.key_for("tts", voice_id, model_id or "default", text)
+    cached = tts_cache.get(cache_key)
+    if cached:
+        response = http_files.serve_file(request, cached.path, cached.content_type, etag=f'"{cache_key}"')
+        response.headers["X-Cache"] = "hit"
+        return response
+
     try:
         # Use the text_to_speech.stream method
+        options = {"model_id": model_id} if model_id else {}
         audio_stream = eleven_client.text_to_speech.stream(
             text=text,
-            voice_id=voice_id
+            voice_id=voice_id,
+            **options
         )
 
-        # The stream from the client is an iterator of bytes, which is exactly what StreamingResponse needs.
-        return StreamingResponse(audio_stream, media_type="audio/mpeg")
+        # The stream from the client is an iterator of bytes; tee it to disk while the client receives it.
+        return StreamingResponse(
+            tts_cache.tee(cache_key, audio_stream, "audio/mpeg"),
+            media_type="audio/mpeg",
+            headers={"X-Cache": "miss", "ETag": f'"{cache_key}"'}
+        )
 
     except Exception as e:
         logger.error(f"Error during text-to-speech generation: {e}")
@@ -318,18 +793,11 @@ async def get_elevenlabs_voices():
         raise HTTPException(status_code=500, detail="Failed to fetch voices from ElevenLabs.")
 
 
-@app.post("/query/rag")
-async def query_rag(query: str = Form(...), model: str = Form(...)):
-    """
-    Performs Retrieval-Augmented Generation.
-    1. Retrieves relevant document chunks from ChromaDB.
-    2. Constructs a prompt with the user's query and the retrieved context.
-    3. Sends the prompt to the selected Ollama model.
-    4. Returns the model's response.
-    """
-    logger.info(f"Received RAG query: '{query}' with model: '{model}'")
+RAG_NO_CONTEXT_ANSWER = "I couldn't find any relevant documents to answer your question."
 
-    # 1. Retrieve context from ChromaDB
+
+def retrieve_rag_context(query: str) -> list:
+    """Document chunks from ChromaDB relevant to `query` (empty if none)."""
     try:
         results = collection.query(
             query_texts=[query],
@@ -337,18 +805,21 @@ async def query_rag(query: str = Form(...), model: str = Form(...)):
         )
         documents = results.get('documents')
         if not documents or not documents[0]:
-            return {"answer": "I couldn't find any relevant documents to answer your question.", "context": []}
-        
+            return []
+
         context_chunks = documents[0]
         context = "\\n\\n---\\n\\n".join(context_chunks)
         logger.info(f"Retrieved context: {context[:500]}...") # Log first 500 chars of context
+        return context_chunks
 
     except Exception as e:
         logger.error(f"Error querying ChromaDB: {e}")
         raise HTTPException(status_code=500, detail="Error retrieving documents from the database.")
 
-    # 2. Construct the prompt
-    prompt = f"""
+
+def build_rag_prompt(query: str, context_chunks: list) -> str:
+    context = "\\n\\n---\\n\\n".join(context_chunks)
+    return f"""
     Based on the following context, please answer the user's question.
     If the context does not contain the answer, state that you cannot find the answer in the provided documents.
 
@@ -359,6 +830,26 @@ async def query_rag(query: str = Form(...), model: str = Form(...)):
     User's Question: {query}
     """
 
+
+@app.post("/query/rag")
+async def query_rag(query: str = Form(...), model: str = Form(...)):
+    """
+    Performs Retrieval-Augmented Generation.
+    1. Retrieves relevant document chunks from ChromaDB.
+    2. Constructs a prompt with the user's query and the retrieved context.
+    3. Sends the prompt to the selected Ollama model.
+    4. Returns the model's response.
+    """
+    logger.info(f"Received RAG query: '{query}' with model: '{model}'")
+
+    # 1. Retrieve context from ChromaDB
+    context_chunks = retrieve_rag_context(query)
+    if not context_chunks:
+        return {"answer": RAG_NO_CONTEXT_ANSWER, "context": []}
+
+    # 2. Construct the prompt
+    prompt = build_rag_prompt(query, context_chunks)
+
     # 3. Send to Ollama
     try:
         ollama_response = requests.post(
@@ -384,6 +875,118 @@ async def query_rag(query: str = Form(...), model: str = Form(...)):
         raise HTTPException(status_code=500, detail="An error occurred while generating the answer.")
 
 
+async def ollama_tokens(upstream: httpx.Response):
+    """Yield response tokens from a streamed Ollama /api/generate call."""
+    try:
+        async for line in upstream.aiter_lines():
+            if not line.strip():
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise RuntimeError(chunk["error"])
+            if chunk.get("response"):
+                yield chunk["response"]
+            if chunk.get("done"):
+                break
+    finally:
+        await upstream.aclose()
+
+
+@app.post("/query/rag/speech")
+async def query_rag_speech(
+    query: str = Form(...),
+    model: str = Form(...),
+    voice_id: str = Form(...),
+    model_id: str = Form(None)
+):
+    """
+    Answers a RAG query as speech while the answer is still being generated.
+
+    Ollama's tokens are streamed, cut at sentence boundaries and each sentence
+    is synthesized as soon as it is complete, so audio starts within a sentence
+    of generation. The response is NDJSON, one event per line:
+    `context` (retrieved chunks), `text` (each token as generated), `audio`
+    (one per sentence, in order, base64-encoded MP3), then `done` with the full
+    answer, or `error` if generation or synthesis fails midway.
+    """
+    if not eleven_client:
+        raise HTTPException(status_code=501, detail="Text-to-speech service is not configured.")
+
+    logger.info(f"Received spoken RAG query: '{query}' with model: '{model}'")
+    context_chunks = retrieve_rag_context(query)
+
+    upstream = None
+    if context_chunks:
+        client = http_files.async_client()
+        try:
+            upstream = await client.send(client.build_request(
+                "POST",
+                "http://127.0.0.1:11434/api/generate",
+                json={"model": model, "prompt": build_rag_prompt(query, context_chunks), "stream": True}
+            ), stream=True)
+        except httpx.HTTPError as e:
+            logger.error(f"Could not connect to Ollama model '{model}': {e}")
+            raise HTTPException(status_code=503, detail=f"Could not connect to Ollama model '{model}'.")
+        if upstream.status_code >= 400:
+            await upstream.aclose()
+            logger.error(f"Ollama model '{model}' returned {upstream.status_code}")
+            raise HTTPException(status_code=503, detail=f"Could not connect to Ollama model '{model}'.")
+        tokens = ollama_tokens(upstream)
+    else:
+        async def no_context_answer():
+            yield RAG_NO_CONTEXT_ANSWER
+        tokens = no_context_answer()
+
+    def synthesize(sentence):
+        return synthesize_segment(sentence, voice_id, model_id)
+
+    async def event_stream():
+        events: asyncio.Queue = asyncio.Queue()
+        answer = []
+
+        async def sentences():
+            splitter = tts_pipeline.SentenceSplitter()
+            async for token in tokens:
+                answer.append(token)
+                await events.put({"type": "text", "text": token})
+                for sentence in splitter.feed(token):
+                    yield sentence
+            tail = splitter.flush()
+            if tail:
+                yield tail
+
+        async def speak():
+            try:
+                index = 0
+                async for sentence, audio in tts_pipeline.synthesize_in_order(sentences(), synthesize, TTS_MAX_PARALLEL):
+                    await events.put({
+                        "type": "audio",
+                        "index": index,
+                        "text": sentence,
+                        "content_type": "audio/mpeg",
+                        "audio": base64.b64encode(audio).decode("ascii"),
+                    })
+                    index += 1
+                await events.put({"type": "done", "answer": "".join(answer)})
+            except Exception as e:
+                logger.error(f"Spoken RAG answer failed: {e}")
+                await events.put({"type": "error", "detail": str(e)})
+            finally:
+                await events.put(None)
+
+        speaker = asyncio.ensure_future(speak())
+        try:
+            yield json.dumps({"type": "context", "context": context_chunks}) + "\n"
+            while (event := await events.get()) is not None:
+                yield json.dumps(event) + "\n"
+        finally:
+            speaker.cancel()
+            if upstream is not None:
+                await upstream.aclose()
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
 @app.post("/api/generate-image-prompt")
 async def generate_image_prompt(
     base_prompt: str = Form(...),
@@ -440,65 +1043,149 @@ async def generate_image_prompt(
 PIXVERSE_API_KEY = os.getenv("PIXVERSE_API_KEY")
 PIXVERSE_API_URL = "https://app-api.pixverse.ai/openapi/v2"
 
-@app.post("/api/pixverse/generate-video")
-async def generate_pixverse_video(prompt: str = Form(...)):
+# All PixVerse calls share one client: pooled sessions, a rate limit across
+# endpoints and background pollers, and retries on transient failures
+pixverse = PixverseClient(
+    PIXVERSE_API_KEY,
+    PIXVERSE_API_URL,
+    rate=float(os.getenv("PIXVERSE_RATE_LIMIT", "5")),
+    burst=int(os.getenv("PIXVERSE_BURST", "10")),
+    max_retries=int(os.getenv("PIXVERSE_MAX_RETRIES", "3")),
+)
+
+
+async def call_pixverse(op: str, method: str, path: str, error_prefix: str = "PixVerse API Error", **kwargs) -> dict:
+    """Call PixVerse through the shared client, mapping failures to HTTP errors."""
+    try:
+        return await pixverse.request(op, method, path, **kwargs)
+    except PixverseError as e:
+        logger.error(f"PixVerse {op} failed: {e}")
+        raise HTTPException(status_code=500, detail=f"{error_prefix}: {e}")
+    except PixverseUnavailable as e:
+        logger.error(f"Could not reach PixVerse for {op}: {e}")
+        raise HTTPException(status_code=503, detail="Could not connect to PixVerse API.")
+
+
+# Uploaded images/media are reused by content hash instead of being uploaded again
+PIXVERSE_UPLOAD_TTL = float(os.getenv("PIXVERSE_UPLOAD_TTL", str(24 * 3600)))
+pixverse_uploads = PixverseUploadCache(os.path.join(DB_PATH, "pixverse.sqlite3"), PIXVERSE_UPLOAD_TTL)
+# Upload size limits (PixVerse accepts images up to 20MB and video/audio up to 50MB)
+PIXVERSE_MAX_IMAGE_BYTES = int(os.getenv("PIXVERSE_MAX_IMAGE_BYTES", str(20 * 1024 ** 2)))
+PIXVERSE_MAX_MEDIA_BYTES = int(os.getenv("PIXVERSE_MAX_MEDIA_BYTES", str(50 * 1024 ** 2)))
+
+
+async def upload_pixverse_image(image: UploadFile) -> tuple:
+    """Upload an image to PixVerse unless these bytes were uploaded recently.
+
+    Returns (img_id, content digest, whether a cached img_id was reused).
     """
-    Starts a text-to-video generation task with PixVerse.
+    try:
+        image_digest, image_size = await http_files.digest_upload(image, PIXVERSE_MAX_IMAGE_BYTES)
+    except http_files.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"Image is larger than {e.max_bytes} bytes.")
+
+    cached_upload = pixverse_uploads.get("image", image_digest)
+    if cached_upload:
+        logger.info(f"Reusing previously uploaded image, img_id: {cached_upload['img_id']}")
+        return cached_upload["img_id"], image_digest, True
+
+    filename = image.filename or "upload.jpg"
+    content_type = image.content_type or "image/jpeg"
+    # streamed from the spooled upload rather than read into memory
+    upload_resp = await call_pixverse(
+        "image_upload", "POST", "/image/upload", error_prefix="PixVerse Image Upload Error",
+        files={'image': (filename, image.file, content_type)}
+    )
+    img_id = upload_resp.get("img_id")
+    if not img_id:
+        raise HTTPException(status_code=500, detail="PixVerse API did not return an img_id.")
+
+    logger.info(f"Successfully uploaded image ({image_size} bytes), received img_id: {img_id}")
+    pixverse_uploads.put("image", image_digest, upload_resp)
+    return img_id, image_digest, False
+
+
+async def reserve_pixverse_credits(payload: dict) -> int | None:
+    """Reserve the estimated cost of `payload` against the cached credit balance;
+    402 if the balance can't cover it. Returns the reserved cost."""
+    cost = estimate_cost(payload)
+    try:
+        await asyncio.to_thread(pixverse_credits.reserve, cost)
+    except InsufficientCredits as e:
+        raise HTTPException(status_code=402, detail=f"Insufficient PixVerse credits: {e}.")
+    return cost
+
+
+async def submit_pixverse_video(op: str, path: str, kind: str, payload: dict, reserved: bool = False):
+    """Submit one generation, record it in the job registry and return its video_id.
+
+    The estimated cost is reserved against the cached credit balance first
+    (unless the caller already did, `reserved`), so a submission the balance
+    can't cover is rejected without calling PixVerse.
     """
-    if not PIXVERSE_API_KEY:
-        raise HTTPException(status_code=501, detail="PixVerse API key is not configured.")
+    if reserved:
+        cost = estimate_cost(payload)
+    else:
+        cost = await reserve_pixverse_credits(payload)
 
-    trace_id = str(uuid.uuid4())
-    headers = {
-        "API-KEY": PIXVERSE_API_KEY,
-        "Content-Type": "application/json",
-        "Ai-trace-id": trace_id
+    logger.debug(f"PixVerse {op} payload: {payload}")
+    try:
+        resp = await call_pixverse(op, "POST", path, json=payload)
+    except HTTPException:
+        pixverse_credits.release(cost)
+        raise
+    pixverse_credits.settle(cost, resp.get("credits"))
+
+    video_id = resp.get("video_id")
+    if not video_id:
+        raise HTTPException(status_code=500, detail="PixVerse API did not return a video_id.")
+
+    logger.info(f"Successfully created {op} task with video_id: {video_id}")
+    await asyncio.to_thread(register_pixverse_job, video_id, kind, payload)
+    return video_id
+
+
+def text_to_video_payload(prompt: str, duration: int = 5, model: str = "v5", quality: str = "540p",
+                          aspect_ratio: str = "16:9", seed: int = 0) -> dict:
+    return {
+        "aspect_ratio": aspect_ratio,
+        "duration": duration,
+        "model": model,
+        "negative_prompt": "blurry, low quality, distorted",
+        "prompt": prompt,
+        "quality": quality,
+        "seed": seed
     }
+
+
+def image_to_video_payload(prompt: str, img_id, duration: int = 5, model: str = "v4.5", quality: str = "540p",
+                           motion_mode: str = "normal", camera_movement: str | None = None, seed: int = 0) -> dict:
     payload = {
-        "aspect_ratio": "16:9",
-        "duration": 5,
-        "model": "v5",
+        "duration": duration,
+        "img_id": int(img_id),
+        "model": model,
+        "motion_mode": motion_mode,
         "negative_prompt": "blurry, low quality, distorted",
         "prompt": prompt,
-        "quality": "540p",
-        "seed": 0
+        "quality": quality,
+        "seed": seed
     }
+    # Add camera_movement only if specified
+    if camera_movement and camera_movement != "none":
+        payload["camera_movement"] = camera_movement
+    return payload
 
-    try:
-        logger.info(f"Sending PixVerse text-to-video request with trace_id: {trace_id}")
-        logger.info(f"Payload: {json.dumps(payload, indent=2)}")
-        
-        response = requests.post(f"{PIXVERSE_API_URL}/video/text/generate", headers=headers, json=payload)
-        
-        # Log the full response for debugging
-        logger.info(f"PixVerse Response Status: {response.status_code}")
-        logger.info(f"PixVerse Response Body: {response.text}")
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        if data.get("ErrCode") != 0:
-            error_msg = data.get('ErrMsg', 'Unknown error')
-            logger.error(f"PixVerse API Error: {error_msg}")
-            raise HTTPException(status_code=500, detail=f"PixVerse API Error: {error_msg}")
-        
-        video_id = data.get("Resp", {}).get("video_id")
-        if not video_id:
-            raise HTTPException(status_code=500, detail="PixVerse API did not return a video_id.")
 
-        logger.info(f"Successfully created video generation task with video_id: {video_id}")
-        return {"video_id": video_id}
+@app.post("/api/pixverse/generate-video")
+async def generate_pixverse_video(prompt: str = Form(...)):
+    """
+    Starts a text-to-video generation task with PixVerse.
+    """
+    if not PIXVERSE_API_KEY:
+        raise HTTPException(status_code=501, detail="PixVerse API key is not configured.")
 
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"HTTP Error from PixVerse API: {e}")
-        logger.error(f"Response content: {e.response.text if hasattr(e, 'response') else 'No response'}")
-        raise HTTPException(status_code=503, detail=f"PixVerse API error: {str(e)}")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Could not connect to PixVerse API: {e}")
-        raise HTTPException(status_code=503, detail="Could not connect to PixVerse API.")
-    except Exception as e:
-        logger.error(f"An error occurred during PixVerse video generation initiation: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to start video generation: {e}")
+    video_id = await submit_pixverse_video("text_to_video", "/video/text/generate", "text", text_to_video_payload(prompt))
+    return {"video_id": video_id}
 
 @app.post("/api/pixverse/generate-video-from-image")
 async def generate_pixverse_video_from_image(
@@ -517,157 +1204,274 @@ async def generate_pixverse_video_from_image(
     if not PIXVERSE_API_KEY:
         raise HTTPException(status_code=501, detail="PixVerse API key is not configured.")
 
-    trace_id = str(uuid.uuid4())
-    
+    # Step 1: Reserve the credits first, so a balance that can't cover the video costs no upload
+    payload = image_to_video_payload(prompt, 0, duration, model, quality, motion_mode, camera_movement, seed)
+    cost = await reserve_pixverse_credits(payload)
+
+    # Step 2: Upload image to PixVerse to get an img_id (unless these bytes were uploaded recently)
     try:
-        # Step 1: Upload image to PixVerse to get an img_id
-        upload_headers = {
-            "API-KEY": PIXVERSE_API_KEY,
-            "Ai-trace-id": trace_id
-        }
-        
-        image_content = await image.read()
-        filename = image.filename or "upload.jpg"
-        content_type = image.content_type or "image/jpeg"
-        
-        files = {'image': (filename, image_content, content_type)}
-        
-        logger.info(f"Uploading image to PixVerse with trace_id: {trace_id}")
-        upload_response = requests.post(f"{PIXVERSE_API_URL}/image/upload", headers=upload_headers, files=files)
-        
-        logger.info(f"Image Upload Response Status: {upload_response.status_code}")
-        logger.info(f"Image Upload Response Body: {upload_response.text}")
-        
-        upload_response.raise_for_status()
-        upload_data = upload_response.json()
+        img_id, image_digest, reused = await upload_pixverse_image(image)
+    except HTTPException:
+        pixverse_credits.release(cost)
+        raise
 
-        if upload_data.get("ErrCode") != 0:
-            error_msg = upload_data.get('ErrMsg', 'Unknown error')
-            logger.error(f"PixVerse Image Upload Error: {error_msg}")
-            raise HTTPException(status_code=500, detail=f"PixVerse Image Upload Error: {error_msg}")
+    # Step 3: Use the img_id to generate the video
+    payload["img_id"] = int(img_id)
+    try:
+        video_id = await submit_pixverse_video("image_to_video", "/video/img/generate", "image", payload, reserved=True)
+    except HTTPException as e:
+        if reused and e.status_code == 500:
+            # the reused img_id may no longer be valid; upload again next time
+            pixverse_uploads.delete("image", image_digest)
+        raise
+    return {"video_id": video_id}
 
-        img_id = upload_data.get("Resp", {}).get("img_id")
-        if not img_id:
-            raise HTTPException(status_code=500, detail="PixVerse API did not return an img_id.")
 
-        logger.info(f"Successfully uploaded image, received img_id: {img_id}")
+@app.post("/api/pixverse/upload-image")
+async def upload_pixverse_image_endpoint(image: UploadFile = File(...)):
+    """
+    Uploads an image to PixVerse and returns its img_id, e.g. for batch submissions.
+    """
+    if not PIXVERSE_API_KEY:
+        raise HTTPException(status_code=501, detail="PixVerse API key is not configured.")
 
-        # Step 2: Use the img_id to generate the video
-        generation_headers = {
-            "API-KEY": PIXVERSE_API_KEY,
-            "Content-Type": "application/json",
-            "Ai-trace-id": trace_id
-        }
-        payload = {
-            "duration": duration,
-            "img_id": int(img_id),
-            "model": model,
-            "motion_mode": motion_mode,
-            "negative_prompt": "blurry, low quality, distorted",
-            "prompt": prompt,
-            "quality": quality,
-            "seed": seed
-        }
-        
-        # Add camera_movement only if specified
-        if camera_movement and camera_movement != "none":
-            payload["camera_movement"] = camera_movement
+    img_id, _, _ = await upload_pixverse_image(image)
+    return {"img_id": img_id}
 
-        logger.info(f"Sending image-to-video request with payload: {json.dumps(payload, indent=2)}")
-        response = requests.post(f"{PIXVERSE_API_URL}/video/img/generate", headers=generation_headers, json=payload)
-        
-        logger.info(f"Video Generation Response Status: {response.status_code}")
-        logger.info(f"Video Generation Response Body: {response.text}")
-        
-        response.raise_for_status()
-        data = response.json()
 
-        if data.get("ErrCode") != 0:
-            error_msg = data.get('ErrMsg', 'Unknown error')
-            logger.error(f"PixVerse API Error: {error_msg}")
-            raise HTTPException(status_code=500, detail=f"PixVerse API Error: {error_msg}")
-        
-        video_id = data.get("Resp", {}).get("video_id")
-        if not video_id:
-            raise HTTPException(status_code=500, detail="PixVerse API did not return a video_id.")
+# Batch submissions fan out to at most this many concurrent PixVerse calls
+# (on top of the client's own rate limit)
+PIXVERSE_BATCH_CONCURRENCY = int(os.getenv("PIXVERSE_BATCH_CONCURRENCY", "6"))
+MAX_PIXVERSE_BATCH = 24
 
-        logger.info(f"Successfully created image-to-video task with video_id: {video_id}")
-        return {"video_id": video_id}
 
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"HTTP Error from PixVerse API: {e}")
-        logger.error(f"Response content: {e.response.text if hasattr(e, 'response') else 'No response'}")
-        raise HTTPException(status_code=503, detail=f"PixVerse API error: {str(e)}")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Could not connect to PixVerse API: {e}")
-        raise HTTPException(status_code=503, detail="Could not connect to PixVerse API.")
+class PixverseVideoSpec(BaseModel):
+    # Text-to-video, or image-to-video when `img_id` (from /api/pixverse/upload-image) is given
+    prompt: str
+    img_id: int | None = None
+    model: str | None = None
+    duration: int = 5
+    quality: str = "540p"
+    aspect_ratio: str = "16:9"
+    motion_mode: str = "normal"
+    camera_movement: str | None = None
+    seed: int = 0
+
+
+class PixverseBatchRequest(BaseModel):
+    jobs: list[PixverseVideoSpec]
+
+
+@app.post("/api/pixverse/generate-videos")
+async def generate_pixverse_videos(request: PixverseBatchRequest):
+    """
+    Submits several PixVerse generations at once (e.g. a storyboard). Returns one
+    entry per job, in request order, with either its video_id or the error that
+    job failed with; one failing job doesn't stop the others.
+    """
+    if not PIXVERSE_API_KEY:
+        raise HTTPException(status_code=501, detail="PixVerse API key is not configured.")
+    if not request.jobs:
+        raise HTTPException(status_code=400, detail="No jobs provided.")
+    if len(request.jobs) > MAX_PIXVERSE_BATCH:
+        raise HTTPException(status_code=400, detail=f"Batch too large: {len(request.jobs)} jobs (max {MAX_PIXVERSE_BATCH}).")
+
+    slots = asyncio.Semaphore(PIXVERSE_BATCH_CONCURRENCY)
+
+    async def submit(index: int, spec: PixverseVideoSpec) -> dict:
+        if spec.img_id is not None:
+            args = ("image_to_video", "/video/img/generate", "image", image_to_video_payload(
+                spec.prompt, spec.img_id, spec.duration, spec.model or "v4.5", spec.quality,
+                spec.motion_mode, spec.camera_movement, spec.seed))
+        else:
+            args = ("text_to_video", "/video/text/generate", "text", text_to_video_payload(
+                spec.prompt, spec.duration, spec.model or "v5", spec.quality, spec.aspect_ratio, spec.seed))
+        async with slots:
+            try:
+                return {"index": index, "video_id": await submit_pixverse_video(*args)}
+            except HTTPException as e:
+                return {"index": index, "error": e.detail, "status_code": e.status_code}
+
+    results = await asyncio.gather(*(submit(index, spec) for index, spec in enumerate(request.jobs)))
+    failed = sum(1 for result in results if "error" in result)
+    logger.info(f"Submitted PixVerse batch: {len(results) - failed} started, {failed} failed")
+    return {"jobs": results, "submitted": len(results) - failed, "failed": failed}
+
+
+def fetch_pixverse_video_status(video_id: str) -> dict:
+    """Blocking status lookup for one PixVerse video; returns its `Resp` object."""
+    return pixverse.request_sync("video_status", "GET", f"/video/result/{video_id}")
+
+
+def fetch_pixverse_balance() -> dict:
+    return pixverse.request_sync("credits", "GET", "/account/balance")
+
+
+# Credit balance cached between checks and decremented locally on submission
+pixverse_credits = CreditLedger(
+    fetch_pixverse_balance,
+    ttl=float(os.getenv("PIXVERSE_CREDITS_TTL", "60")),
+    reconcile_delay=float(os.getenv("PIXVERSE_CREDITS_RECONCILE_DELAY", "15")),
+)
+
+
+# Every submitted generation is recorded so it survives reloads and restarts
+pixverse_jobs = PixverseJobStore(os.path.join(DB_PATH, "pixverse.sqlite3"))
+
+
+# Finished videos are downloaded once and then served locally
+PIXVERSE_VIDEO_CACHE_MAX_BYTES = int(os.getenv("PIXVERSE_VIDEO_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+pixverse_videos = MediaMirror(DiskCache(os.path.join(DB_PATH, "pixverse_videos"), PIXVERSE_VIDEO_CACHE_MAX_BYTES))
+
+
+def pixverse_video_key(video_id) -> str:
+    return DiskCache.key_for("pixverse-video", str(video_id))
+
+
+def record_pixverse_status(video):
+    try:
+        pixverse_jobs.update(video.video_id, video.resp)
+    except Exception as e:
+        logger.error(f"Could not record status of PixVerse video {video.video_id}: {e}")
+    if video.resp.get("status") == STATUS_SUCCESSFUL and video.resp.get("url"):
+        pixverse_videos.enqueue(pixverse_video_key(video.video_id), video.resp["url"])
+
+
+def abandon_pixverse_job(video):
+    logger.warning(f"Stopped tracking PixVerse video {video.video_id}: {video.error}")
+    try:
+        pixverse_jobs.mark_unknown(video.video_id)
     except Exception as e:
-        logger.error(f"An error occurred during PixVerse image-to-video generation: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to start video generation: {e}")
+        logger.error(f"Could not record PixVerse video {video.video_id} as unknown: {e}")
+
+
+# One background poller per process; clients read its cached status or subscribe to its events
+pixverse_tracker = PixverseTracker(
+    fetch_pixverse_video_status,
+    min_interval=float(os.getenv("PIXVERSE_POLL_MIN_INTERVAL", "3")),
+    max_interval=float(os.getenv("PIXVERSE_POLL_MAX_INTERVAL", "30")),
+    max_errors=int(os.getenv("PIXVERSE_POLL_MAX_ERRORS", "10")),
+    max_age=float(os.getenv("PIXVERSE_POLL_MAX_AGE", str(6 * 3600))),
+    on_status=record_pixverse_status,
+    on_abandon=abandon_pixverse_job,
+)
+
+# Resume tracking of generations that were still running when the server stopped
+for _video_id in pixverse_jobs.active_ids():
+    pixverse_tracker.track(_video_id)
+
+
+def register_pixverse_job(video_id, kind: str, params: dict):
+    """Record a newly submitted generation and start tracking it."""
+    try:
+        pixverse_jobs.add(video_id, kind, params)
+    except Exception as e:
+        # the generation has been paid for either way; don't fail the request
+        logger.error(f"Could not record PixVerse job {video_id}: {e}")
+    pixverse_tracker.track(video_id, delay=pixverse_tracker.min_interval)
+
 
 @app.get("/api/pixverse/video-status/{video_id}")
 async def get_pixverse_video_status(video_id: str):
     """
     Gets the status of a PixVerse video generation task.
+    Once a video is tracked its latest status is served from the tracker, so
+    clients polling this endpoint don't each cost an upstream request.
     """
     if not PIXVERSE_API_KEY:
         raise HTTPException(status_code=501, detail="PixVerse API key is not configured.")
 
-    headers = {
-        "API-KEY": PIXVERSE_API_KEY,
-        "Ai-trace-id": str(uuid.uuid4())
-    }
-    
-    try:
-        response = requests.get(f"{PIXVERSE_API_URL}/video/result/{video_id}", headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        
-        logger.info(f"Status check for video_id {video_id}: {data}")
+    tracked = pixverse_tracker.get(video_id)
+    if tracked and tracked.resp is not None:
+        return tracked.resp
 
-        if data.get("ErrCode") != 0:
-            raise HTTPException(status_code=500, detail=f"PixVerse API Error: {data.get('ErrMsg')}")
+    resp = await call_pixverse("video_status", "GET", f"/video/result/{video_id}")
+    await asyncio.to_thread(pixverse_tracker.track, video_id, resp)
+    return resp
 
-        return data.get("Resp", {})
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Could not connect to PixVerse API for status check: {e}")
-        raise HTTPException(status_code=503, detail="Could not connect to PixVerse API for status check.")
-    except Exception as e:
-        logger.error(f"An error occurred while checking PixVerse video status: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to check video status: {e}")
-
-@app.get("/api/pixverse/credits")
-async def get_pixverse_credits():
+@app.get("/api/pixverse/video-status/{video_id}/events")
+async def pixverse_video_events(video_id: str):
     """
-    Gets the user's PixVerse credit balance.
+    Streams status changes of a PixVerse video as SSE `status` events (the
+    same object as /api/pixverse/video-status); the stream ends once the video
+    has finished, failed or been deleted, or with an `abandoned` event if
+    its status can no longer be checked.
     """
     if not PIXVERSE_API_KEY:
         raise HTTPException(status_code=501, detail="PixVerse API key is not configured.")
+    video = pixverse_tracker.get(video_id)
+    if video is None:
+        # only videos PixVerse knows about are tracked
+        try:
+            resp = await pixverse.request("video_status", "GET", f"/video/result/{video_id}")
+        except PixverseError as e:
+            raise HTTPException(status_code=404, detail=f"PixVerse video not found: {e}")
+        except PixverseUnavailable:
+            raise HTTPException(status_code=503, detail="Could not connect to PixVerse API.")
+        video = await asyncio.to_thread(pixverse_tracker.track, video_id, resp)
+    return StreamingResponse(sse_events(video.events), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/api/pixverse/jobs")
+async def list_pixverse_jobs(state: str | None = None, kind: str | None = None, limit: int = 50, offset: int = 0):
+    """
+    Lists submitted PixVerse generations, newest first. `state` is one of
+    pending, generating, completed, failed, deleted or unknown (no longer
+    trackable); `kind` is text, image, extend or lip_sync.
+    """
+    if limit < 1 or limit > 500 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be 1-500 and offset non-negative")
+    return {"jobs": pixverse_jobs.list(state=state, kind=kind, limit=limit, offset=offset)}
 
-    headers = {
-        "API-KEY": PIXVERSE_API_KEY,
-        "ai-trace-id": str(uuid.uuid4())
-    }
-    
-    try:
-        response = requests.get(f"{PIXVERSE_API_URL}/account/balance", headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        
-        logger.info(f"Credit balance check: {data}")
 
-        if data.get("ErrCode") != 0:
-            raise HTTPException(status_code=500, detail=f"PixVerse API Error: {data.get('ErrMsg')}")
+@app.get("/api/pixverse/jobs/{video_id}")
+async def get_pixverse_job(video_id: str):
+    job = pixverse_jobs.get(video_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="PixVerse job not found")
+    return job
 
-        return data.get("Resp", {})
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Could not connect to PixVerse API for credit check: {e}")
-        raise HTTPException(status_code=503, detail="Could not connect to PixVerse API for credit check.")
-    except Exception as e:
-        logger.error(f"An error occurred while checking PixVerse credits: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to check credits: {e}")
+@app.get("/api/pixverse/videos/{video_id}")
+async def get_pixverse_video(request: Request, video_id: str):
+    """
+    Plays a finished PixVerse video from the local copy (with Range, ETag and
+    long-lived caching). Until the background download has finished, this
+    redirects to PixVerse's own URL.
+    """
+    key = pixverse_video_key(video_id)
+    entry = pixverse_videos.get(key)
+    if entry:
+        return http_files.serve_file(request, entry.path, entry.content_type, etag=f'"{key}"',
+                                     cache_control="public, max-age=31536000, immutable")
+
+    tracked = pixverse_tracker.get(video_id)
+    job = pixverse_jobs.get(video_id)
+    url = (tracked.resp or {}).get("url") if tracked else None
+    url = url or (job or {}).get("url")
+    if not url:
+        raise HTTPException(status_code=404, detail="Video is not available yet.")
+    pixverse_videos.enqueue(key, url)
+    return RedirectResponse(url, status_code=307, headers={"Cache-Control": "no-store"})
+
+
+@app.get("/api/pixverse/credits")
+async def get_pixverse_credits(refresh: bool = False):
+    """
+    Gets the user's PixVerse credit balance. It is served from a short-lived
+    cache that submissions decrement locally; `refresh` forces an upstream check.
+    """
+    if not PIXVERSE_API_KEY:
+        raise HTTPException(status_code=501, detail="PixVerse API key is not configured.")
+
+    try:
+        return await asyncio.to_thread(pixverse_credits.balance, refresh)
+    except PixverseError as e:
+        logger.error(f"PixVerse credits failed: {e}")
+        raise HTTPException(status_code=500, detail=f"PixVerse API Error: {e}")
+    except PixverseUnavailable as e:
+        logger.error(f"Could not reach PixVerse for credits: {e}")
+        raise HTTPException(status_code=503, detail="Could not connect to PixVerse API.")
 
 
 @app.post("/api/pixverse/extend-video")
@@ -686,13 +1490,6 @@ async def extend_pixverse_video(
     if not PIXVERSE_API_KEY:
         raise HTTPException(status_code=501, detail="PixVerse API key is not configured.")
 
-    trace_id = str(uuid.uuid4())
-    headers = {
-        "API-KEY": PIXVERSE_API_KEY,
-        "Content-Type": "application/json",
-        "Ai-trace-id": trace_id
-    }
-    
     payload = {
         "source_video_id": source_video_id,
         "prompt": prompt,
@@ -703,35 +1500,8 @@ async def extend_pixverse_video(
         "motion_mode": motion_mode
     }
 
-    logger.info(f"Sending video extension request with trace_id: {trace_id}")
-    logger.info(f"Payload: {json.dumps(payload, indent=2)}")
-
-    try:
-        response = requests.post(f"{PIXVERSE_API_URL}/video/extend/generate", headers=headers, json=payload)
-        logger.info(f"PixVerse Extension Response Status: {response.status_code}")
-        logger.info(f"PixVerse Extension Response Body: {response.text}")
-        
-        response.raise_for_status()
-        data = response.json()
-
-        if data.get("ErrCode") != 0:
-            error_msg = data.get('ErrMsg', 'Unknown error')
-            logger.error(f"PixVerse API Error: {error_msg}")
-            raise HTTPException(status_code=500, detail=f"PixVerse API Error: {error_msg}")
-        
-        video_id = data.get("Resp", {}).get("video_id")
-        if not video_id:
-            raise HTTPException(status_code=500, detail="PixVerse API did not return a video_id.")
-
-        logger.info(f"Successfully extended video with new video_id: {video_id}")
-        return {"video_id": video_id}
-
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Could not connect to PixVerse API: {e}")
-        raise HTTPException(status_code=503, detail="Could not connect to PixVerse API.")
-    except Exception as e:
-        logger.error(f"An error occurred during video extension: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to extend video: {e}")
+    video_id = await submit_pixverse_video("extend_video", "/video/extend/generate", "extend", payload)
+    return {"video_id": video_id}
 
 
 @app.post("/api/pixverse/upload-media")
@@ -742,43 +1512,28 @@ async def upload_pixverse_media(file: UploadFile = File(...)):
     if not PIXVERSE_API_KEY:
         raise HTTPException(status_code=501, detail="PixVerse API key is not configured.")
 
-    trace_id = str(uuid.uuid4())
-    headers = {
-        "API-KEY": PIXVERSE_API_KEY,
-        "Ai-trace-id": trace_id
-    }
-    
     try:
-        file_content = await file.read()
-        filename = file.filename or "upload"
-        content_type = file.content_type or "application/octet-stream"
-        
-        files = {'file': (filename, file_content, content_type)}
-        
-        logger.info(f"Uploading media to PixVerse with trace_id: {trace_id}")
-        response = requests.post(f"{PIXVERSE_API_URL}/media/upload", headers=headers, files=files)
-        
-        logger.info(f"Media Upload Response Status: {response.status_code}")
-        logger.info(f"Media Upload Response Body: {response.text}")
-        
-        response.raise_for_status()
-        data = response.json()
+        media_digest, media_size = await http_files.digest_upload(file, PIXVERSE_MAX_MEDIA_BYTES)
+    except http_files.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"File is larger than {e.max_bytes} bytes.")
 
-        if data.get("ErrCode") != 0:
-            error_msg = data.get('ErrMsg', 'Unknown error')
-            logger.error(f"PixVerse Media Upload Error: {error_msg}")
-            raise HTTPException(status_code=500, detail=f"PixVerse Media Upload Error: {error_msg}")
+    cached_upload = pixverse_uploads.get("media", media_digest)
+    if cached_upload:
+        logger.info(f"Reusing previously uploaded media, media_id: {cached_upload.get('media_id')}")
+        return cached_upload
 
-        resp_data = data.get("Resp", {})
-        logger.info(f"Successfully uploaded media: {resp_data}")
-        return resp_data
+    filename = file.filename or "upload"
+    content_type = file.content_type or "application/octet-stream"
+    # streamed from the spooled upload rather than read into memory
+    resp_data = await call_pixverse(
+        "media_upload", "POST", "/media/upload", error_prefix="PixVerse Media Upload Error",
+        files={'file': (filename, file.file, content_type)}
+    )
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Could not connect to PixVerse API: {e}")
-        raise HTTPException(status_code=503, detail="Could not connect to PixVerse API.")
-    except Exception as e:
-        logger.error(f"An error occurred during media upload: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to upload media: {e}")
+    logger.info(f"Successfully uploaded media ({media_size} bytes), media_id: {resp_data.get('media_id')}")
+    if resp_data.get("media_id"):
+        pixverse_uploads.put("media", media_digest, resp_data)
+    return resp_data
 
 
 @app.post("/api/pixverse/lip-sync")
@@ -797,13 +1552,6 @@ async def generate_lip_sync(
     if not lip_sync_tts_content and not audio_media_id:
         raise HTTPException(status_code=400, detail="Either lip_sync_tts_content or audio_media_id must be provided.")
 
-    trace_id = str(uuid.uuid4())
-    headers = {
-        "API-KEY": PIXVERSE_API_KEY,
-        "Content-Type": "application/json",
-        "Ai-trace-id": trace_id
-    }
-    
     payload = {
         "source_video_id": source_video_id
     }
@@ -817,35 +1565,97 @@ async def generate_lip_sync(
     if audio_media_id:
         payload["audio_media_id"] = audio_media_id
 
-    logger.info(f"Sending lip sync request with trace_id: {trace_id}")
-    logger.info(f"Payload: {json.dumps(payload, indent=2)}")
+    video_id = await submit_pixverse_video("lip_sync", "/video/lip_sync/generate", "lip_sync", payload)
+    return {"video_id": video_id}
+
+
+def synthesize_to_file(text: str, voice_id: str, model_id: str | None = None) -> str:
+    """Blocking synthesis of `text` into the TTS cache; returns the audio file path."""
+    cache_key = DiskCache.key_for("tts", voice_id, model_id or "default", text)
+    cached = tts_cache.get(cache_key)
+    if not cached:
+        options = {"model_id": model_id} if model_id else {}
+        # streamed to disk chunk by chunk, never held in memory as a whole
+        for _ in tts_cache.tee(cache_key, eleven_client.text_to_speech.stream(text=text, voice_id=voice_id, **options), "audio/mpeg"):
+            pass
+        cached = tts_cache.get(cache_key)
+        if cached is None:
+            raise RuntimeError("synthesized audio could not be stored")
+    return cached.path
+
+
+def upload_pixverse_media_file(path: str, filename: str = "speech.mp3", content_type: str = "audio/mpeg"):
+    """Blocking upload of a local file to PixVerse (reused by content hash); returns its media_id."""
+    media_digest, media_size = http_files.digest_file(path)
+    cached_upload = pixverse_uploads.get("media", media_digest)
+    if cached_upload:
+        return cached_upload["media_id"]
+    with open(path, "rb") as f:
+        resp = pixverse.request_sync("media_upload", "POST", "/media/upload", files={'file': (filename, f, content_type)})
+    if not resp.get("media_id"):
+        raise RuntimeError("PixVerse API did not return a media_id.")
+    logger.info(f"Uploaded synthesized speech ({media_size} bytes), media_id: {resp['media_id']}")
+    pixverse_uploads.put("media", media_digest, resp)
+    return resp["media_id"]
+
+
+def start_pixverse_lip_sync(source_video_id: int, media_id):
+    """Blocking lip-sync request with uploaded audio; returns the new video_id."""
+    payload = {"source_video_id": source_video_id, "audio_media_id": media_id}
+    resp = pixverse.request_sync("lip_sync", "POST", "/video/lip_sync/generate", json=payload)
+    pixverse_credits.settle(None, resp.get("credits"))
+    video_id = resp.get("video_id")
+    if not video_id:
+        raise RuntimeError("PixVerse API did not return a video_id.")
+    logger.info(f"Successfully created lip sync video with video_id: {video_id}")
+    register_pixverse_job(video_id, "lip_sync", payload)
+    return video_id
+
+
+lip_sync_pipeline = LipSyncPipeline(synthesize_to_file, upload_pixverse_media_file, start_pixverse_lip_sync)
+
+
+@app.post("/api/pixverse/lip-sync-jobs")
+async def submit_lip_sync_job(
+    source_video_id: int = Form(...),
+    text: str = Form(...),
+    voice_id: str = Form(...),
+    model_id: str = Form(None)
+):
+    """
+    Starts a server-side TTS -> media upload -> lip-sync job with an ElevenLabs
+    voice and returns its job id immediately. Stage progress is available at
+    /api/pixverse/lip-sync-jobs/{job_id}/events (SSE); the final event carries
+    the new video_id.
+    """
+    if not PIXVERSE_API_KEY:
+        raise HTTPException(status_code=501, detail="PixVerse API key is not configured.")
+    if not eleven_client:
+        raise HTTPException(status_code=501, detail="Text-to-speech service is not configured.")
+    if not text:
+        raise HTTPException(status_code=400, detail="No text provided for speech synthesis.")
 
-    try:
-        response = requests.post(f"{PIXVERSE_API_URL}/video/lip_sync/generate", headers=headers, json=payload)
-        logger.info(f"PixVerse Lip Sync Response Status: {response.status_code}")
-        logger.info(f"PixVerse Lip Sync Response Body: {response.text}")
-        
-        response.raise_for_status()
-        data = response.json()
+    job = lip_sync_pipeline.submit(source_video_id, text, voice_id, model_id)
+    return {"job_id": job.id, "status": job.status}
 
-        if data.get("ErrCode") != 0:
-            error_msg = data.get('ErrMsg', 'Unknown error')
-            logger.error(f"PixVerse API Error: {error_msg}")
-            raise HTTPException(status_code=500, detail=f"PixVerse API Error: {error_msg}")
-        
-        video_id = data.get("Resp", {}).get("video_id")
-        if not video_id:
-            raise HTTPException(status_code=500, detail="PixVerse API did not return a video_id.")
 
-        logger.info(f"Successfully created lip sync video with video_id: {video_id}")
-        return {"video_id": video_id}
+@app.get("/api/pixverse/lip-sync-jobs/{job_id}")
+async def lip_sync_job_status(job_id: str):
+    job = lip_sync_pipeline.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Lip sync job not found")
+    return job.to_dict()
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Could not connect to PixVerse API: {e}")
-        raise HTTPException(status_code=503, detail="Could not connect to PixVerse API.")
-    except Exception as e:
-        logger.error(f"An error occurred during lip sync generation: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate lip sync: {e}")
+
+@app.get("/api/pixverse/lip-sync-jobs/{job_id}/events")
+async def lip_sync_job_events(job_id: str):
+    """
+    Streams the job's `stage` events (synthesizing, uploading, lip_sync) and a final `done` or `failed` as SSE.
+    """
+    job = lip_sync_pipeline.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Lip sync job not found")
+    return StreamingResponse(sse_events(job.events), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 
 @app.get("/api/pixverse/tts-speakers")
@@ -856,47 +1666,84 @@ async def get_tts_speakers(page_num: int = 1, page_size: int = 50):
     if not PIXVERSE_API_KEY:
         raise HTTPException(status_code=501, detail="PixVerse API key is not configured.")
 
-    trace_id = str(uuid.uuid4())
-    headers = {
-        "API-KEY": PIXVERSE_API_KEY,
-        "Content-Type": "application/json",
-        "Ai-trace-id": trace_id
-    }
-    
-    try:
-        response = requests.get(
-            f"{PIXVERSE_API_URL}/video/lip_sync/tts_list",
-            headers=headers,
-            params={"page_num": page_num, "page_size": page_size}
-        )
-        logger.info(f"TTS Speakers Response Status: {response.status_code}")
-        
-        response.raise_for_status()
-        data = response.json()
-
-        if data.get("ErrCode") != 0:
-            error_msg = data.get('ErrMsg', 'Unknown error')
-            logger.error(f"PixVerse API Error: {error_msg}")
-            raise HTTPException(status_code=500, detail=f"PixVerse API Error: {error_msg}")
+    return await call_pixverse("tts_speakers", "GET", "/video/lip_sync/tts_list",
+                               params={"page_num": page_num, "page_size": page_size})
 
-        return data.get("Resp", {})
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Could not connect to PixVerse API: {e}")
-        raise HTTPException(status_code=503, detail="Could not connect to PixVerse API.")
-    except Exception as e:
-        logger.error(f"An error occurred while fetching TTS speakers: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to fetch TTS speakers: {e}")
+@app.get("/api/pixverse/metrics")
+async def get_pixverse_metrics():
+    """
+    Per-operation PixVerse call counts, errors, retries and latency (ms).
+    """
+    return {"operations": pixverse.metrics()}
 
 
 # --- Image Chat with Vision Model ---
+# Images for vision chat, shrunk to the model's input size and cached by source hash
+VISION_CACHE_MAX_BYTES = int(os.getenv("VISION_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))
+vision_images = VisionImageNormalizer(
+    DiskCache(os.path.join(DB_PATH, "vision_cache"), VISION_CACHE_MAX_BYTES),
+    max_side=int(os.getenv("VISION_IMAGE_MAX_SIDE", "672")),
+)
+# Images fetched from `image_url`, kept by URL and revalidated after REMOTE_IMAGE_FRESH_SECONDS
+REMOTE_IMAGE_MAX_BYTES = int(os.getenv("REMOTE_IMAGE_MAX_BYTES", str(20 * 1024 ** 2)))
+remote_images = RemoteImageFetcher(
+    DiskCache(os.path.join(DB_PATH, "remote_images"), int(os.getenv("REMOTE_IMAGE_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))),
+    max_bytes=REMOTE_IMAGE_MAX_BYTES,
+    fresh_for=float(os.getenv("REMOTE_IMAGE_FRESH_SECONDS", "300")),
+)
+
+
 class ImageChatRequest(BaseModel):
-    # Either provide `image_url` (http(s) URL) OR `image_base64` (base64-encoded image bytes).
+    # Either provide `image_asset_id` (see resolve_image_asset), `image_url` (http(s) URL)
+    # OR `image_base64` (base64-encoded image bytes).
+    image_asset_id: str | None = None
     image_url: str | None = None
     image_base64: str | None = None
     message: str
     model: str = "llava:latest"  # Default to llava
 
+async def load_chat_image(request: ImageChatRequest) -> bytes:
+    """Image bytes of a vision chat request, downscaled to the model's input size."""
+    # Determine where the image bytes come from: a stored asset, base64 provided already, or a URL to fetch
+    if request.image_asset_id:
+        asset = resolve_image_asset(request.image_asset_id)
+        if not asset:
+            raise HTTPException(status_code=404, detail="Image asset not found")
+
+        def read_asset():
+            with open(asset[0], "rb") as f:
+                return f.read()
+        image_bytes = await asyncio.to_thread(read_asset)
+    elif request.image_base64:
+        try:
+            image_bytes = decode_base64_image(request.image_base64)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid image_base64.")
+    elif request.image_url:
+        try:
+            image_bytes = await remote_images.fetch(request.image_url)
+        except RemoteImageTooLarge as e:
+            raise HTTPException(status_code=413, detail=f"Image at URL exceeds {e.max_bytes} bytes.")
+        except RemoteImageError as e:
+            logger.error(f"Failed to fetch image URL: {e}")
+            raise HTTPException(status_code=400, detail=f"Failed to fetch image: {e}")
+    else:
+        raise HTTPException(status_code=400, detail="No image provided. Include image_asset_id, image_url or image_base64.")
+
+    # Downscale to the model's input size before encoding it into the request
+    return await asyncio.to_thread(vision_images.normalize, image_bytes)
+
+
+def vision_chat_payload(request: ImageChatRequest, image_bytes: bytes, stream: bool) -> dict:
+    return {
+        "model": request.model,
+        "prompt": request.message,
+        "images": [base64.b64encode(image_bytes).decode('utf-8')],
+        "stream": stream
+    }
+
+
 @app.post("/api/chat-with-image")
 async def chat_with_image(request: ImageChatRequest):
     """
@@ -904,35 +1751,11 @@ async def chat_with_image(request: ImageChatRequest):
     Accepts image URL and user message, returns AI response.
     """
     try:
-        # Determine where the image bytes come from: base64 provided already, or a URL to fetch
-        image_base64 = None
+        image_bytes = await load_chat_image(request)
 
-        if request.image_base64:
-            image_base64 = request.image_base64
-        elif request.image_url:
-            # Fetch the image and convert to base64
-            try:
-                img_response = requests.get(request.image_url, timeout=10)
-            except Exception as e:
-                logger.error(f"Failed to fetch image URL: {e}")
-                raise HTTPException(status_code=400, detail="Failed to fetch image URL")
-
-            if img_response.status_code != 200:
-                raise HTTPException(status_code=400, detail="Failed to fetch image")
-
-            # Convert image to base64
-            image_base64 = base64.b64encode(img_response.content).decode('utf-8')
-        else:
-            raise HTTPException(status_code=400, detail="No image provided. Include image_url or image_base64.")
-        
         # Prepare Ollama vision request
         ollama_url = "http://127.0.0.1:11434/api/generate"
-        payload = {
-            "model": request.model,
-            "prompt": request.message,
-            "images": [image_base64],
-            "stream": False
-        }
+        payload = vision_chat_payload(request, image_bytes, stream=False)
         
         logger.info(f"Sending image chat request to Ollama with model: {request.model}")
         
@@ -965,10 +1788,79 @@ async def chat_with_image(request: ImageChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Longest pause allowed between two streamed tokens (and before the first one,
+# which includes loading the model) before a streamed image chat gives up.
+VISION_TOKEN_TIMEOUT = float(os.getenv("VISION_TOKEN_TIMEOUT", "60"))
+
+
+@app.post("/api/chat-with-image/stream")
+async def chat_with_image_stream(request: ImageChatRequest):
+    """
+    Streaming variant of /api/chat-with-image.
+
+    Tokens are relayed as llava generates them, so long answers aren't bound
+    by a total time limit; only a gap of more than VISION_TOKEN_TIMEOUT
+    seconds between tokens ends the answer. The response is NDJSON, one event
+    per line: `text` (each token), then `done` with the full response, or
+    `error` if generation fails or stalls midway.
+    """
+    image_bytes = await load_chat_image(request)
+    payload = vision_chat_payload(request, image_bytes, stream=True)
+
+    logger.info(f"Streaming image chat request to Ollama with model: {request.model}")
+    client = http_files.async_client()
+    try:
+        upstream = await client.send(client.build_request(
+            "POST",
+            "http://127.0.0.1:11434/api/generate",
+            json=payload,
+            timeout=httpx.Timeout(VISION_TOKEN_TIMEOUT, connect=5.0)
+        ), stream=True)
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="Request timed out. Vision model may be loading.")
+    except httpx.HTTPError as e:
+        logger.error(f"Error connecting to Ollama: {e}")
+        raise HTTPException(status_code=503, detail="Could not connect to Ollama. Make sure it's running.")
+    if upstream.status_code != 200:
+        error = (await upstream.aread()).decode(errors="replace")
+        await upstream.aclose()
+        raise HTTPException(status_code=500, detail=f"Ollama error: {error}")
+
+    async def event_stream():
+        answer = []
+        try:
+            async for token in ollama_tokens(upstream):
+                answer.append(token)
+                yield json.dumps({"type": "text", "text": token}) + "\n"
+        except httpx.TimeoutException:
+            logger.error(f"Vision model '{request.model}' sent no token for {VISION_TOKEN_TIMEOUT}s")
+            yield json.dumps({"type": "error", "detail": f"Vision model stopped responding for {VISION_TOKEN_TIMEOUT:g}s."}) + "\n"
+            return
+        except Exception as e:
+            logger.error(f"Error in image chat stream: {e}")
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+            return
+        finally:
+            await upstream.aclose()
+        ai_response = "".join(answer)
+        logger.info(f"Image chat response streamed: {ai_response[:100]}...")
+        yield json.dumps({"type": "done", "response": ai_response, "model": request.model}) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
 # --- 6. Chat thread persistence (server-side) ---
-# Initialize a thread store under the db directory
+# Initialize a thread store under the db directory: SQLite by default, the
+# JSON file (imported into SQLite once) with THREAD_STORE_BACKEND=json
 THREAD_STORE_PATH = os.path.join(DB_PATH, "chat_threads.json")
-thread_store = ThreadStore(THREAD_STORE_PATH)
+THREAD_STORE_BACKEND = os.getenv("THREAD_STORE_BACKEND", "sqlite")
+if THREAD_STORE_BACKEND == "json":
+    thread_store = ThreadStore(THREAD_STORE_PATH)
+else:
+    thread_store = SqliteThreadStore(os.path.join(DB_PATH, "chat_threads.sqlite3"))
+    migrated = thread_store.migrate_from_json(THREAD_STORE_PATH)
+    if migrated:
+        logger.info(f"Imported {migrated} chat threads from {THREAD_STORE_PATH}")
 
 # export queue for async export jobs
 export_queue = ExportQueue(DB_PATH, thread_store)
@@ -986,8 +1878,14 @@ class AddMessageRequest(BaseModel):
 
 
 @app.get("/api/chat/threads")
-async def list_threads():
+async def list_threads(summary: bool = False, limit: int = 50, offset: int = 0):
+    """
+    Lists threads with their messages, or with `summary` only their names,
+    timestamps and message counts, most recently modified first, `limit` at a time.
+    """
     try:
+        if summary:
+            return {"threads": thread_store.recent_threads(limit=limit, offset=offset)}
         return {"threads": thread_store.list_threads()}
     except Exception as e:
         logger.error(f"Error listing threads: {e}")
@@ -1026,7 +1924,7 @@ async def delete_thread(thread_id: str):
             raise HTTPException(status_code=404, detail="Thread not found")
         # remove persisted assets and exports for this thread
         try:
-            assets_dir = os.path.join(DB_PATH, 'thread_assets', thread_id)
+            assets_dir = os.path.join(THREAD_ASSETS_PATH, thread_id)
             exports_dir = os.path.join(DB_PATH, 'exports', thread_id)
             if os.path.exists(assets_dir):
                 shutil.rmtree(assets_dir)
@@ -1043,20 +1941,55 @@ async def delete_thread(thread_id: str):
         raise HTTPException(status_code=500, detail="Failed to delete thread")
 
 
+@app.get("/api/chat/threads/{thread_id}/messages")
+async def list_messages(thread_id: str, after: str | None = None, limit: int | None = None):
+    """
+    Messages of a thread oldest first, only those created after the `after`
+    timestamp (a message's `created_at`) if given.
+    """
+    try:
+        return {"messages": thread_store.messages_after(thread_id, after=after, limit=limit)}
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Thread not found")
+    except Exception as e:
+        logger.error(f"Error listing thread messages: {e}")
+        raise HTTPException(status_code=500, detail="Failed to list messages")
+
+
 @app.post("/api/chat/threads/{thread_id}/messages")
 async def add_message(thread_id: str, payload: AddMessageRequest):
     try:
-        t = thread_store.get_thread(thread_id)
-        if not t:
+        if not thread_store.has_thread(thread_id):
             raise HTTPException(status_code=404, detail="Thread not found")
         # Persist image contents to disk when present in payload.extra
         extra = payload.extra or {}
-        if extra.get('image_base64'):
-            # write to disk under DB_PATH/thread_assets/<thread_id>/
-            dest_dir = os.path.join(DB_PATH, 'thread_assets', thread_id)
+        # write to disk under DB_PATH/thread_assets/<thread_id>/
+        dest_dir = os.path.join(THREAD_ASSETS_PATH, thread_id)
+        file_path = None
+        new_file = True
+        if extra.get('image_asset_id'):
+            # an image already on the server is referenced, not sent again
+            asset = resolve_image_asset(extra['image_asset_id'])
+            if not asset:
+                raise HTTPException(status_code=404, detail="Image asset not found")
+            source_path, content_type = asset
+            if os.path.dirname(source_path) == os.path.realpath(dest_dir):
+                # already stored with this thread
+                file_path, new_file = source_path, False
+            else:
+                # cache entries can be evicted and other threads deleted, so those are copied
+                ext = mimetypes.guess_extension(content_type) or '.png'
+                os.makedirs(dest_dir, exist_ok=True)
+                file_path = os.path.abspath(os.path.join(dest_dir, f"image-{uuid.uuid4().hex}{ext}"))
+                await asyncio.to_thread(shutil.copyfile, source_path, file_path)
+        elif extra.get('image_base64'):
             file_path = save_base64_image(extra.get('image_base64'), dest_dir)
-            if file_path:
-                extra['file_path'] = file_path
+        if file_path:
+            extra['file_path'] = file_path
+            extra['asset_url'] = f"/api/chat/threads/{thread_id}/assets/{os.path.basename(file_path)}"
+            extra['asset_id'] = thread_asset_id(file_path)
+            if new_file:
+                derivative_pipeline.enqueue(file_path)
 
         msg = thread_store.add_message(thread_id, role=payload.role, text=payload.text, type_=payload.type or "text", extra=extra)
         return msg
@@ -1069,6 +2002,18 @@ async def add_message(thread_id: str, payload: AddMessageRequest):
         raise HTTPException(status_code=500, detail="Failed to add message")
 
 
+@app.get("/api/chat/threads/{thread_id}/assets/{filename}")
+async def get_thread_asset(request: Request, thread_id: str, filename: str, size: int | None = None):
+    """
+    Serves an image saved with a thread message; `size` selects a thumbnail.
+    """
+    asset = resolve_image_asset(f"thread:{thread_id}/{filename}")
+    if not asset:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    path, media_type = asset
+    return serve_image(request, path, media_type, size, cache_control="private, max-age=86400")
+
+
 @app.post("/api/chat/threads/{thread_id}/export")
 async def export_thread(thread_id: str, format: str | None = 'zip'):
     """Enqueue an async export job (default: zip containing markdown + images).
@@ -1076,8 +2021,7 @@ async def export_thread(thread_id: str, format: str | None = 'zip'):
     and the artifact can be downloaded at /api/chat/threads/{thread_id}/export/{job_id}/download
     """
     try:
-        t = thread_store.get_thread(thread_id)
-        if not t:
+        if not thread_store.has_thread(thread_id):
             raise HTTPException(status_code=404, detail="Thread not found")
 
         job = export_queue.enqueue(thread_id, format=format or 'zip')
@@ -0,0 +1,70 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from disk_cache import CacheEntry, DiskCache
+from http_files import PROXY_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class MediaMirror:
+    """Downloads remote media into a DiskCache in the background.
+
+    Each key is fetched at most once at a time; until its download has been
+    committed `get` returns None and callers keep using the remote URL. A key
+    whose download failed isn't tried again for `backoff` seconds, doubling
+    with every further failure up to `max_backoff`, so a URL that keeps
+    failing (e.g. an expired signed URL) isn't fetched on every request.
+    """
+
+    def __init__(self, cache: DiskCache, max_workers: int = 2, timeout: float = 60.0,
+                 backoff: float = 30.0, max_backoff: float = 3600.0):
+        self.cache = cache
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pending = set()
+        self.failures = {}  # key -> (retry_at, last delay)
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='media-mirror')
+
+    def get(self, key: str) -> CacheEntry | None:
+        return self.cache.get(key)
+
+    def enqueue(self, key: str, url: str) -> bool:
+        """Schedule a download of `url` unless it is cached, already in progress
+        or failed too recently."""
+        if not url:
+            return False
+        with self.lock:
+            if key in self.pending or self.cache.get(key):
+                return False
+            if key in self.failures and time.monotonic() < self.failures[key][0]:
+                return False
+            self.pending.add(key)
+        self.executor.submit(self._download, key, url)
+        return True
+
+    def _download(self, key: str, url: str):
+        try:
+            with requests.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('Content-Type', 'application/octet-stream')
+                for _ in self.cache.tee(key, response.iter_content(PROXY_CHUNK_SIZE), content_type, meta={"url": url}):
+                    pass
+        except Exception as e:
+            # the remote URL keeps working; a later request schedules another attempt after the backoff
+            with self.lock:
+                delay = min(self.failures[key][1] * 2, self.max_backoff) if key in self.failures else self.backoff
+                self.failures[key] = (time.monotonic() + delay, delay)
+            logger.error(f"Could not mirror {url} (retrying in {delay:g}s): {e}")
+        else:
+            with self.lock:
+                self.failures.pop(key, None)
+        finally:
+            with self.lock:
+                self.pending.discard(key)
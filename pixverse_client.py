@@ -0,0 +1,221 @@
+import asyncio
+import random
+import threading
+import time
+import uuid
+from collections import deque
+
+import httpx
+
+PIXVERSE_API_URL = "https://app-api.pixverse.ai/openapi/v2"
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+# Failures where the request never reached PixVerse, so even a POST is safe to resend
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class PixverseError(Exception):
+    """PixVerse answered with a non-zero ErrCode."""
+
+    def __init__(self, message: str, code: int | None = None):
+        super().__init__(message)
+        self.code = code
+
+
+class PixverseUnavailable(Exception):
+    """PixVerse could not be reached or answered with an HTTP error (after retries)."""
+
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by sync and async callers.
+
+    `reserve` takes a token (the balance may go negative) and returns how long
+    the caller has to wait before using it, so no lock is held while waiting.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class CallStats:
+    def __init__(self, window: int):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.latencies = deque(maxlen=window)
+
+    def to_dict(self) -> dict:
+        ordered = sorted(self.latencies)
+
+        def percentile(p):
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1) if ordered else None
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_ms": round(sum(ordered) / len(ordered) * 1000, 1) if ordered else None,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(ordered[-1] * 1000, 1) if ordered else None,
+        }
+
+
+class PixverseClient:
+    """Single entry point for PixVerse OpenAPI calls.
+
+    Calls go through pooled HTTP sessions (async for endpoints, sync for
+    background threads) with timeouts, a token bucket shared by all callers,
+    and retries with jittered exponential backoff on transient failures. GETs
+    are retried on any transport error, 429 and 5xx; POSTs only when the
+    request cannot have reached PixVerse or on 429, so a generation is never
+    submitted twice. Latency, error and retry counts are kept per operation.
+    """
+
+    def __init__(self, api_key: str | None, base_url: str = PIXVERSE_API_URL, rate: float = 5.0, burst: int = 10,
+                 max_retries: int = 3, backoff: float = 0.5, max_backoff: float = 8.0,
+                 timeout: httpx.Timeout = httpx.Timeout(60.0, connect=10.0), transport=None, metrics_window: int = 256):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.transport = transport
+        self.metrics_window = metrics_window
+        self.stats = {}
+        self.lock = threading.Lock()
+        self._async_session = None
+        self._sync_session = None
+
+    def async_session(self) -> httpx.AsyncClient:
+        if self._async_session is None:
+            self._async_session = httpx.AsyncClient(
+                base_url=self.base_url, timeout=self.timeout, transport=self.transport,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._async_session
+
+    def sync_session(self) -> httpx.Client:
+        if self._sync_session is None:
+            self._sync_session = httpx.Client(
+                base_url=self.base_url, timeout=self.timeout, transport=self.transport,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            )
+        return self._sync_session
+
+    async def request(self, op: str, method: str, path: str, **kwargs) -> dict:
+        """Call PixVerse and return its `Resp` object (`op` names the call in metrics)."""
+        headers = self._headers()
+        started = time.monotonic()
+        attempt, ok = 0, False
+        try:
+            while True:
+                await asyncio.sleep(self.bucket.reserve())
+                response_delay = 0.0
+                try:
+                    response = await self.async_session().request(method, path, headers=headers, **kwargs)
+                except httpx.TransportError as e:
+                    if not self._should_retry(method, attempt, error=e):
+                        raise PixverseUnavailable(f"Could not connect to PixVerse: {e}") from e
+                else:
+                    if not self._should_retry(method, attempt, status=response.status_code):
+                        resp = self._parse(response)
+                        ok = True
+                        return resp
+                    response_delay = self._retry_after(response)
+                attempt += 1
+                await asyncio.sleep(max(self._backoff_delay(attempt), response_delay))
+        finally:
+            self._record(op, time.monotonic() - started, ok, attempt)
+
+    def request_sync(self, op: str, method: str, path: str, **kwargs) -> dict:
+        """Blocking counterpart of `request` for background threads."""
+        headers = self._headers()
+        started = time.monotonic()
+        attempt, ok = 0, False
+        try:
+            while True:
+                time.sleep(self.bucket.reserve())
+                response_delay = 0.0
+                try:
+                    response = self.sync_session().request(method, path, headers=headers, **kwargs)
+                except httpx.TransportError as e:
+                    if not self._should_retry(method, attempt, error=e):
+                        raise PixverseUnavailable(f"Could not connect to PixVerse: {e}") from e
+                else:
+                    if not self._should_retry(method, attempt, status=response.status_code):
+                        resp = self._parse(response)
+                        ok = True
+                        return resp
+                    response_delay = self._retry_after(response)
+                attempt += 1
+                time.sleep(max(self._backoff_delay(attempt), response_delay))
+        finally:
+            self._record(op, time.monotonic() - started, ok, attempt)
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {op: stats.to_dict() for op, stats in self.stats.items()}
+
+    def _headers(self) -> dict:
+        # one trace id per logical call, kept across its retries
+        return {"API-KEY": self.api_key or "", "Ai-trace-id": str(uuid.uuid4())}
+
+    def _should_retry(self, method: str, attempt: int, error: Exception | None = None, status: int | None = None) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if error is not None:
+            return method == "GET" or isinstance(error, NOT_SENT_ERRORS)
+        if method == "GET":
+            return status in RETRYABLE_STATUS
+        return status == 429
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # "full jitter": spreads out retries from concurrent callers
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float:
+        try:
+            return float(response.headers.get("retry-after", 0))
+        except ValueError:
+            return 0.0
+
+    @staticmethod
+    def _parse(response: httpx.Response) -> dict:
+        if response.status_code >= 400:
+            raise PixverseUnavailable(f"PixVerse returned HTTP {response.status_code}", response.status_code)
+        try:
+            data = response.json()
+        except ValueError:
+            raise PixverseUnavailable("PixVerse returned an invalid response", response.status_code)
+        if data.get("ErrCode") != 0:
+            raise PixverseError(data.get("ErrMsg") or "Unknown error", data.get("ErrCode"))
+        return data.get("Resp") or {}
+
+    def _record(self, op: str, seconds: float, ok: bool, retries: int):
+        with self.lock:
+            stats = self.stats.setdefault(op, CallStats(self.metrics_window))
+            stats.calls += 1
+            stats.retries += retries
+            stats.latencies.append(seconds)
+            if not ok:
+                stats.errors += 1
@@ -0,0 +1,149 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+# Approximate cost of a 5 second generation per quality; 8 second clips cost
+# twice as much. Only used for the pre-flight check and until the balance has
+# been reconciled with PixVerse; the `credits` PixVerse reports wins.
+CREDITS_PER_5S = {"360p": 45, "540p": 45, "720p": 60, "1080p": 120}
+
+
+def estimate_cost(payload: dict) -> int | None:
+    """Estimated credits for a generation payload, or None if unknown."""
+    base = CREDITS_PER_5S.get(payload.get("quality"))
+    if base is None:
+        return None
+    return base * 2 if (payload.get("duration") or 5) > 5 else base
+
+
+class InsufficientCredits(Exception):
+    def __init__(self, needed: int, available: int):
+        super().__init__(f"needs {needed} credits, {available} available")
+        self.needed = needed
+        self.available = available
+
+
+class CreditLedger:
+    """Locally cached PixVerse credit balance with optimistic accounting.
+
+    The balance (`Resp` of /account/balance) is fetched at most once per
+    `ttl` seconds, by one caller at a time; concurrent callers wait for that
+    fetch instead of starting their own. Submissions `reserve` their estimated
+    cost up front, which fails without calling PixVerse when the balance minus
+    the reservations still in flight can't cover it, and then `settle` with
+    the cost PixVerse reported (or `release` on failure). Reservations are
+    kept apart from the fetched balance, so a fetch that happens while a
+    submission is in flight doesn't lose or double-count it. Every settled
+    charge schedules one background `fetch_balance` after `reconcile_delay`
+    seconds to correct the local figure.
+    """
+
+    def __init__(self, fetch_balance: Callable[[], dict], ttl: float = 60.0, reconcile_delay: float = 15.0):
+        self.fetch_balance = fetch_balance
+        self.ttl = ttl
+        self.reconcile_delay = reconcile_delay
+        self.resp: dict | None = None
+        self.fetched_at = 0.0
+        self.reserved = 0  # credits of submissions not yet settled or released
+        self.fetching: Future | None = None
+        self.reconcile_timer: threading.Timer | None = None
+        self.lock = threading.Lock()
+
+    def balance(self, refresh: bool = False) -> dict:
+        """Current balance, fetched from PixVerse if stale or `refresh` is set."""
+        with self.lock:
+            if self.resp is not None and not refresh and time.time() - self.fetched_at < self.ttl:
+                return self._snapshot()
+        self._fetch()
+        with self.lock:
+            return self._snapshot()
+
+    def _fetch(self):
+        """Fetch the balance, or wait for the fetch another caller has started."""
+        with self.lock:
+            fetching, leader = self.fetching, self.fetching is None
+            if leader:
+                fetching = self.fetching = Future()
+        if not leader:
+            fetching.result()
+            return
+        try:
+            self.update(self.fetch_balance())
+            fetching.set_result(None)
+        except Exception as e:
+            fetching.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.fetching = None
+
+    def update(self, resp: dict):
+        with self.lock:
+            self.resp = dict(resp)
+            self.fetched_at = time.time()
+
+    def reserve(self, cost: int | None):
+        """Reserve `cost` if the balance covers it; raises InsufficientCredits otherwise.
+
+        An unknown cost, or a balance that can't be fetched, is let through for
+        PixVerse to decide.
+        """
+        if not cost:
+            return
+        try:
+            self.balance()
+        except Exception:
+            return
+        with self.lock:
+            available = self._available() - self.reserved
+            if available < cost:
+                raise InsufficientCredits(cost, available)
+            self.reserved += cost
+
+    def release(self, cost: int | None):
+        """Give back a reservation whose submission failed."""
+        if cost:
+            with self.lock:
+                self.reserved = max(self.reserved - cost, 0)
+
+    def settle(self, reserved: int | None, actual: int | None):
+        """Turn a reservation into a charge of the cost PixVerse reported (the
+        estimate if it reported none), then reconcile soon."""
+        charge = actual if actual is not None else reserved
+        with self.lock:
+            if reserved:
+                self.reserved = max(self.reserved - reserved, 0)
+            if charge and self.resp is not None:
+                self._deduct(charge)
+        self._schedule_reconcile()
+
+    def _available(self) -> int:
+        return (self.resp.get("credit_monthly") or 0) + (self.resp.get("credit_package") or 0)
+
+    def _deduct(self, credits: int):
+        # monthly credits are spent before package credits
+        monthly = self.resp.get("credit_monthly") or 0
+        from_monthly = min(monthly, credits)
+        self.resp["credit_monthly"] = monthly - from_monthly
+        self.resp["credit_package"] = (self.resp.get("credit_package") or 0) - (credits - from_monthly)
+
+    def _snapshot(self) -> dict:
+        return {**self.resp, "cached_at": self.fetched_at}
+
+    def _schedule_reconcile(self):
+        with self.lock:
+            if self.reconcile_timer is not None:
+                return
+            self.reconcile_timer = threading.Timer(self.reconcile_delay, self._reconcile)
+            self.reconcile_timer.daemon = True
+            self.reconcile_timer.start()
+
+    def _reconcile(self):
+        with self.lock:
+            self.reconcile_timer = None
+        try:
+            self._fetch()
+        except Exception:
+            # the next balance() after the TTL tries again
+            pass
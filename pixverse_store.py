@@ -0,0 +1,171 @@
+import json
+import sqlite3
+import threading
+import time
+
+from pixverse_tracker import STATUS_SUCCESSFUL, TERMINAL_STATUSES
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pixverse_jobs (
+    video_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status INTEGER,
+    state TEXT NOT NULL,
+    url TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pixverse_jobs_created ON pixverse_jobs (created_at);
+CREATE INDEX IF NOT EXISTS idx_pixverse_jobs_state ON pixverse_jobs (state, created_at);
+CREATE INDEX IF NOT EXISTS idx_pixverse_jobs_kind ON pixverse_jobs (kind, created_at);
+"""
+
+ACTIVE_STATES = ('pending', 'generating')
+
+
+def state_for(status: int | None) -> str:
+    """Coarse job state for a PixVerse status code (None before the first status check)."""
+    if status is None:
+        return 'pending'
+    if status == STATUS_SUCCESSFUL:
+        return 'completed'
+    if status == 6:
+        return 'deleted'
+    if status in TERMINAL_STATUSES:
+        return 'failed'
+    return 'generating'
+
+
+class PixverseJobStore:
+    """Durable registry of submitted PixVerse generations.
+
+    One row per video_id in a local SQLite database (WAL journal) holding the
+    submitted parameters, the latest status and result URL, and timestamps,
+    indexed for listing by state or kind, newest first.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(_SCHEMA)
+
+    def add(self, video_id, kind: str, params: dict) -> dict:
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO pixverse_jobs (video_id, kind, params, status, state, created_at, updated_at) "
+                "VALUES (?, ?, ?, NULL, 'pending', ?, ?)",
+                (str(video_id), kind, json.dumps(params), now, now),
+            )
+        return self.get(video_id)
+
+    def update(self, video_id, resp: dict):
+        """Record the latest PixVerse status (`Resp` object) of a job."""
+        status = resp.get('status')
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE pixverse_jobs SET status = ?, state = ?, url = COALESCE(?, url), result = ?, updated_at = ? "
+                "WHERE video_id = ?",
+                (status, state_for(status), resp.get('url') or None, json.dumps(resp), time.time(), str(video_id)),
+            )
+
+    def mark_unknown(self, video_id):
+        """Stop treating a job as active when its status can no longer be followed."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE pixverse_jobs SET state = 'unknown', updated_at = ? WHERE video_id = ?",
+                (time.time(), str(video_id)),
+            )
+
+    def get(self, video_id) -> dict | None:
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM pixverse_jobs WHERE video_id = ?", (str(video_id),)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, state: str | None = None, kind: str | None = None, limit: int = 50, offset: int = 0) -> list:
+        clauses, args = [], []
+        if state:
+            clauses.append("state = ?")
+            args.append(state)
+        if kind:
+            clauses.append("kind = ?")
+            args.append(kind)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM pixverse_jobs {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (*args, limit, offset),
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def active_ids(self) -> list:
+        """video_ids of jobs that haven't reached a terminal status yet."""
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT video_id FROM pixverse_jobs WHERE state IN ({', '.join('?' * len(ACTIVE_STATES))}) ORDER BY created_at",
+                ACTIVE_STATES,
+            ).fetchall()
+        return [row['video_id'] for row in rows]
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        record = dict(row)
+        record['params'] = json.loads(record['params'])
+        record['result'] = json.loads(record['result']) if record['result'] else None
+        return record
+
+
+_UPLOADS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pixverse_uploads (
+    kind TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    resp TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (kind, sha256)
+);
+CREATE INDEX IF NOT EXISTS idx_pixverse_uploads_expires ON pixverse_uploads (expires_at);
+"""
+
+
+class PixverseUploadCache:
+    """Content hash -> PixVerse upload response (`img_id`/`media_id`).
+
+    Entries expire after `ttl` seconds so ids are not reused after PixVerse
+    has discarded the uploaded file.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(_UPLOADS_SCHEMA)
+
+    def get(self, kind: str, digest: str) -> dict | None:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT resp FROM pixverse_uploads WHERE kind = ? AND sha256 = ? AND expires_at > ?",
+                (kind, digest, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, kind: str, digest: str, resp: dict):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM pixverse_uploads WHERE expires_at <= ?", (now,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pixverse_uploads (kind, sha256, resp, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, digest, json.dumps(resp), now, now + self.ttl),
+            )
+
+    def delete(self, kind: str, digest: str):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM pixverse_uploads WHERE kind = ? AND sha256 = ?", (kind, digest))
@@ -0,0 +1,196 @@
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+from event_stream import EventLog
+
+# PixVerse video status codes: 1=successful, 5=generating, 6=deleted,
+# 7=moderation failed, 8=generation failed
+STATUS_SUCCESSFUL = 1
+TERMINAL_STATUSES = (1, 6, 7, 8)
+
+
+class TrackedVideo:
+    def __init__(self, video_id: str):
+        self.video_id = video_id
+        self.resp: dict | None = None
+        self.error: str | None = None
+        self.interval = 0.0
+        self.next_poll = 0.0
+        self.polling = False
+        self.errors = 0  # consecutive failed polls
+        self.abandoned = False
+        self.tracked_at = time.time()
+        self.updated_at = self.tracked_at
+        self.events = EventLog()
+
+    @property
+    def finished(self) -> bool:
+        return self.abandoned or (self.resp is not None and self.resp.get('status') in TERMINAL_STATUSES)
+
+
+class PixverseTracker:
+    """Background poller that owns all PixVerse status checks.
+
+    Each tracked video is polled by one worker however many clients watch it.
+    The poll interval starts at `min_interval` and grows by `backoff` for every
+    poll (or error) that brings no change, up to `max_interval`. Status changes
+    are appended to the video's EventLog as `status` events carrying PixVerse's
+    `Resp` object, and the log is closed once the video reaches a terminal
+    status. A video is abandoned after `max_errors` consecutive failed polls
+    or once it has been tracked for `max_age` seconds without finishing: an
+    `abandoned` event is published, the log is closed and `on_abandon` is called
+    with the video. Finished videos are forgotten `retain` seconds after they
+    finish. `on_status` is called with the video after each status change.
+    Both callbacks run after the tracker's lock is released, so they may block
+    (e.g. on disk I/O) without holding up other pollers or `get()`.
+    """
+
+    def __init__(self, fetch_status: Callable[[str], dict], min_interval: float = 2.0, max_interval: float = 30.0,
+                 backoff: float = 1.5, retain: float = 3600.0, max_workers: int = 4,
+                 max_errors: int = 10, max_age: float = 6 * 3600.0,
+                 on_status: Callable[[TrackedVideo], None] | None = None,
+                 on_abandon: Callable[[TrackedVideo], None] | None = None):
+        self.fetch_status = fetch_status
+        self.on_status = on_status
+        self.on_abandon = on_abandon
+        self.max_errors = max_errors
+        self.max_age = max_age
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.retain = retain
+        self.videos: Dict[str, TrackedVideo] = {}
+        self.schedule = []  # heap of (next_poll, video_id)
+        self.cond = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pixverse-poll')
+        self.worker = threading.Thread(target=self._loop, daemon=True)
+        self.worker.start()
+
+    def track(self, video_id, resp: dict | None = None, delay: float | None = None) -> TrackedVideo:
+        """Start tracking `video_id` (no-op if already tracked).
+
+        `resp` is a status the caller has just fetched; it is published as the
+        first event. The first poll happens after `delay` seconds (default:
+        immediately, or after `min_interval` when `resp` is given).
+        """
+        video_id = str(video_id)
+        callbacks = []
+        with self.cond:
+            video = self.videos.get(video_id)
+            if video is None:
+                video = TrackedVideo(video_id)
+                self.videos[video_id] = video
+                if resp is not None:
+                    _, callbacks = self._apply(video, resp)
+                if delay is None:
+                    delay = self.min_interval if resp is not None else 0.0
+                if not video.finished:
+                    self._schedule(video, delay)
+        self._run(callbacks)
+        return video
+
+    def get(self, video_id) -> TrackedVideo | None:
+        with self.cond:
+            return self.videos.get(str(video_id))
+
+    def active(self) -> int:
+        with self.cond:
+            return sum(1 for video in self.videos.values() if not video.finished)
+
+    def _schedule(self, video: TrackedVideo, delay: float):
+        video.next_poll = time.time() + delay
+        heapq.heappush(self.schedule, (video.next_poll, video.video_id))
+        self.cond.notify()
+
+    def _apply(self, video: TrackedVideo, resp: dict) -> tuple:
+        """Record a fetched status; the caller holds the lock. Returns whether
+        the status changed and the callbacks to run once the lock is released."""
+        callbacks = []
+        changed = video.resp is None or resp.get('status') != video.resp.get('status')
+        video.resp = resp
+        video.error = None
+        video.errors = 0
+        video.updated_at = time.time()
+        if changed:
+            video.events.append('status', resp)
+            if self.on_status:
+                callbacks.append(lambda: self.on_status(video))
+        if video.finished:
+            video.events.close()
+        return changed, callbacks
+
+    @staticmethod
+    def _run(callbacks: list):
+        for callback in callbacks:
+            callback()
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                now = time.time()
+                self._prune(now)
+                while self.schedule and self.schedule[0][0] <= now:
+                    due, video_id = heapq.heappop(self.schedule)
+                    video = self.videos.get(video_id)
+                    # skip entries superseded by a later reschedule
+                    if video is None or video.finished or video.polling or due != video.next_poll:
+                        continue
+                    video.polling = True
+                    try:
+                        self.executor.submit(self._poll, video)
+                    except RuntimeError:
+                        # executor shut down at interpreter exit
+                        return
+                timeout = min(self.schedule[0][0] - now, 60.0) if self.schedule else 60.0
+                self.cond.wait(timeout)
+
+    def _poll(self, video: TrackedVideo):
+        try:
+            resp, error = self.fetch_status(video.video_id), None
+        except Exception as e:
+            resp, error = None, str(e)
+        with self.cond:
+            callbacks = self._update(video, resp, error)
+        self._run(callbacks)
+
+    def _update(self, video: TrackedVideo, resp: dict | None, error: str | None) -> list:
+        """Apply the outcome of one poll and schedule the next; the caller holds
+        the lock. Returns the callbacks to run once it is released."""
+        video.polling = False
+        changed, callbacks = False, []
+        if resp is None:
+            video.error = error
+            video.errors += 1
+        else:
+            changed, callbacks = self._apply(video, resp)
+        if video.finished or video.video_id not in self.videos:
+            return callbacks
+        if video.errors >= self.max_errors:
+            return callbacks + self._abandon(video, f"status check failed {video.errors} times in a row: {error}")
+        if time.time() - video.tracked_at > self.max_age:
+            return callbacks + self._abandon(video, f"still not finished after {self.max_age:g}s")
+        if changed:
+            video.interval = self.min_interval
+        else:
+            video.interval = min(max(video.interval * self.backoff, self.min_interval), self.max_interval)
+        self._schedule(video, video.interval)
+        return callbacks
+
+    def _abandon(self, video: TrackedVideo, reason: str) -> list:
+        """Stop polling a video that can't be followed any more; the caller holds
+        the lock. Returns the callbacks to run once it is released."""
+        video.abandoned = True
+        video.error = reason
+        video.updated_at = time.time()
+        video.events.append('abandoned', {"video_id": video.video_id, "error": reason})
+        video.events.close()
+        return [lambda: self.on_abandon(video)] if self.on_abandon else []
+
+    def _prune(self, now: float):
+        expired = [video_id for video_id, video in self.videos.items()
+                   if video.finished and video.updated_at < now - self.retain]
+        for video_id in expired:
+            del self.videos[video_id]
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from typing import Callable
+from urllib.parse import urlsplit
+
+import httpx
+
+import http_files
+from disk_cache import CacheEntry, DiskCache
+
+# Magic numbers of the image formats vision models accept; the Content-Type a
+# server sends is not trusted (error pages are often served as 200 text/html).
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+)
+SNIFF_BYTES = 12
+
+
+def sniff_image_type(head: bytes) -> str | None:
+    """Image content type from the first bytes of a file, or None if it isn't one."""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+
+class RemoteImageError(Exception):
+    pass
+
+
+class RemoteImageTooLarge(RemoteImageError):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"image exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class RemoteImageFetcher:
+    """Downloads images from http(s) URLs without blocking the event loop.
+
+    Bodies are streamed and abandoned as soon as they exceed `max_bytes` or
+    their first bytes aren't a known image format. Downloads are cached by
+    URL together with the ETag / Last-Modified validators the server sent:
+    within `fresh_for` seconds of the last check the cached copy is used as
+    is, after that it is revalidated with a conditional GET and only
+    downloaded again if it changed. `client` returns the httpx client to use
+    (default: the shared pool from http_files).
+    """
+
+    def __init__(self, cache: DiskCache, max_bytes: int = 20 * 1024 ** 2, timeout: float = 10.0,
+                 fresh_for: float = 300.0, client: Callable[[], httpx.AsyncClient] | None = None):
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.fresh_for = fresh_for
+        self.client = client
+
+    async def fetch(self, url: str) -> bytes:
+        """Image bytes at `url`; raises RemoteImageError if it can't be fetched."""
+        if urlsplit(url).scheme not in ('http', 'https'):
+            raise RemoteImageError("only http(s) image URLs are supported")
+        key = DiskCache.key_for("remote-image", url)
+        entry = self.cache.get(key)
+        headers = {}
+        if entry is not None:
+            if time.time() - entry.meta.get("validated_at", 0) < self.fresh_for:
+                return await asyncio.to_thread(self._read, entry)
+            if entry.meta.get("etag"):
+                headers["If-None-Match"] = entry.meta["etag"]
+            if entry.meta.get("last_modified"):
+                headers["If-Modified-Since"] = entry.meta["last_modified"]
+
+        client = self.client() if self.client else http_files.async_client()
+        try:
+            async with client.stream("GET", url, headers=headers, timeout=self.timeout, follow_redirects=True) as response:
+                if response.status_code == 304 and entry is not None:
+                    # CacheEntry.meta lives as long as the entry, so the check is remembered with it
+                    entry.meta["validated_at"] = time.time()
+                    return await asyncio.to_thread(self._read, entry)
+                if response.status_code != 200:
+                    raise RemoteImageError(f"{url} returned {response.status_code}")
+                data, content_type = await self._read_body(response)
+                meta = {
+                    "url": url,
+                    "etag": response.headers.get("etag"),
+                    "last_modified": response.headers.get("last-modified"),
+                    "validated_at": time.time(),
+                }
+        except httpx.HTTPError as e:
+            raise RemoteImageError(f"could not fetch {url}: {e}") from e
+
+        await asyncio.to_thread(self.cache.put, key, data, content_type, meta)
+        return data
+
+    async def _read_body(self, response: httpx.Response) -> tuple:
+        length = response.headers.get("content-length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            raise RemoteImageTooLarge(self.max_bytes)
+        data = bytearray()
+        content_type = None
+        async for chunk in response.aiter_bytes():
+            data += chunk
+            if len(data) > self.max_bytes:
+                raise RemoteImageTooLarge(self.max_bytes)
+            if content_type is None and len(data) >= SNIFF_BYTES:
+                content_type = self._sniff(data)
+        if content_type is None:
+            content_type = self._sniff(data)
+        return bytes(data), content_type
+
+    @staticmethod
+    def _sniff(data: bytes) -> str:
+        content_type = sniff_image_type(bytes(data[:SNIFF_BYTES]))
+        if content_type is None:
+            raise RemoteImageError("URL did not return a supported image")
+        return content_type
+
+    @staticmethod
+    def _read(entry: CacheEntry) -> bytes:
+        with open(entry.path, 'rb') as f:
+            return f.read()
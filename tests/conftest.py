@@ -1,7 +1,23 @@
 import sys
 import os
+import time
+
 import pytest
 
 # Add the project root to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+
+
+@pytest.fixture
+def wait_for():
+    """Poll `predicate` until it holds or `timeout` seconds pass; returns its last result.
+
+    For code that finishes in a background thread.
+    """
+    def wait(predicate, timeout=5.0):
+        deadline = time.time() + timeout
+        while not predicate() and time.time() < deadline:
+            time.sleep(0.01)
+        return predicate()
+    return wait
@@ -1,12 +1,57 @@
 import pytest
+from contextlib import contextmanager
 from fastapi.testclient import TestClient
 from main import app
 import os
+import json
+import httpx
 from unittest.mock import patch, MagicMock, AsyncMock
 import base64
+from disk_cache import DiskCache
+from pixverse_client import PixverseClient
 
 client = TestClient(app)
 
+
+@pytest.fixture(autouse=True)
+def isolated_pixverse_uploads(tmp_path):
+    """Start every test without remembered PixVerse uploads."""
+    from pixverse_store import PixverseUploadCache
+    with patch('main.pixverse_uploads', PixverseUploadCache(str(tmp_path / "uploads.sqlite3"), ttl=3600)) as uploads:
+        yield uploads
+
+
+@pytest.fixture(autouse=True)
+def ample_pixverse_credits():
+    """Start every test with a known, ample PixVerse credit balance."""
+    from main import fetch_pixverse_balance
+    from pixverse_credits import CreditLedger
+    ledger = CreditLedger(fetch_pixverse_balance, ttl=3600, reconcile_delay=3600)
+    ledger.update({"credit_monthly": 1000000, "credit_package": 0})
+    with patch('main.pixverse_credits', ledger):
+        yield ledger
+
+
+@contextmanager
+def fake_pixverse(*bodies):
+    """Answer PixVerse calls with the given JSON bodies in order (the last one
+    repeats; a callable body is called with the request) and yield the list of
+    requests sent."""
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        body = bodies[min(len(sent), len(bodies)) - 1]
+        return httpx.Response(200, json=body(request) if callable(body) else body)
+
+    fake = PixverseClient("test-key", transport=httpx.MockTransport(handler), rate=1000, burst=1000)
+    with patch('main.pixverse', fake):
+        yield sent
+
+
+def sent_json(request):
+    return json.loads(request.content)
+
 def test_read_main():
     """
     Tests if the root endpoint returns the frontend HTML.
@@ -87,12 +132,13 @@ def test_query_rag_success():
             assert "This is the context for the query." in sent_json['prompt']
             assert "User's Question: What is the answer?" in sent_json['prompt']
 
-def test_text_to_speech_success():
+def test_text_to_speech_success(tmp_path):
     """
     Tests the text-to-speech endpoint successfully generating audio.
     Mocks the ElevenLabs client.
     """
-    with patch('main.eleven_client') as mock_eleven_client:
+    with patch('main.eleven_client') as mock_eleven_client, \
+            patch('main.tts_cache', DiskCache(str(tmp_path / "tts"), max_bytes=1024 * 1024)):
         # Mock the stream method to return an iterator of bytes
         mock_audio_chunk = b'\\x01\\x02\\x03'
         mock_eleven_client.text_to_speech.stream.return_value = iter([mock_audio_chunk])
@@ -111,6 +157,55 @@ def test_text_to_speech_success():
             voice_id="21m00Tcm4TlvDq8ikWAM"
         )
 
+def test_text_to_speech_repeat_served_from_cache(tmp_path):
+    """
+    The second request for the same voice and text is served from the on-disk
+    cache (with Range support) without calling ElevenLabs again.
+    """
+    with patch('main.eleven_client') as mock_eleven_client, \
+            patch('main.tts_cache', DiskCache(str(tmp_path / "tts"), max_bytes=1024 * 1024)):
+        mock_eleven_client.text_to_speech.stream.return_value = iter([b'abc', b'def'])
+        form = {"text": "Hello again", "voice_id": "voice-1"}
+
+        first = client.post("/api/text-to-speech", data=form)
+        assert first.content == b'abcdef'
+        assert first.headers['x-cache'] == 'miss'
+
+        second = client.post("/api/text-to-speech", data=form)
+        assert second.status_code == 200
+        assert second.content == b'abcdef'
+        assert second.headers['x-cache'] == 'hit'
+        assert second.headers['content-type'] == 'audio/mpeg'
+
+        ranged = client.post("/api/text-to-speech", data=form, headers={"Range": "bytes=3-"})
+        assert ranged.status_code == 206
+        assert ranged.content == b'def'
+
+        mock_eleven_client.text_to_speech.stream.assert_called_once()
+
+        # a different model is a different cache entry
+        mock_eleven_client.text_to_speech.stream.return_value = iter([b'xyz'])
+        other = client.post("/api/text-to-speech", data={**form, "model_id": "eleven_turbo_v2"})
+        assert other.content == b'xyz'
+        assert mock_eleven_client.text_to_speech.stream.call_args.kwargs['model_id'] == "eleven_turbo_v2"
+
+def test_text_to_speech_pipelined_streams_segments_in_order(tmp_path):
+    """
+    Pipelined mode synthesizes each sentence separately and concatenates the
+    audio in sentence order.
+    """
+    text = "The first sentence is long enough to stand alone. The second sentence is also long enough here."
+    with patch('main.eleven_client') as mock_eleven_client, \
+            patch('main.tts_cache', DiskCache(str(tmp_path / "tts"), max_bytes=1024 * 1024)):
+        mock_eleven_client.text_to_speech.stream.side_effect = lambda text, voice_id: iter([f"<{text[:10]}>".encode()])
+
+        response = client.post("/api/text-to-speech", data={"text": text, "voice_id": "v", "pipelined": "true"})
+
+        assert response.status_code == 200
+        assert response.headers['x-tts-segments'] == '2'
+        assert response.content == b'<The first ><The second>'
+        assert mock_eleven_client.text_to_speech.stream.call_count == 2
+
 def test_text_to_speech_no_client():
     """
     Tests the TTS endpoint when the ElevenLabs client is not configured.
@@ -179,10 +274,7 @@ def test_pixverse_text_to_video_success():
         }
     }
     
-    with patch('requests.post') as mock_post:
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = mock_pixverse_response
-        mock_post.return_value.raise_for_status = MagicMock()
+    with fake_pixverse(mock_pixverse_response) as mock_post:
         
         response = client.post(
             "/api/pixverse/generate-video",
@@ -194,14 +286,72 @@ def test_pixverse_text_to_video_success():
         assert data["video_id"] == 123456789
         
         # Verify API was called correctly
-        mock_post.assert_called_once()
-        called_args, called_kwargs = mock_post.call_args
-        assert "video/text/generate" in called_args[0]
-        sent_json = called_kwargs['json']
-        assert sent_json['prompt'] == "A cat playing piano"
-        assert sent_json['model'] == "v5"
-        assert sent_json['aspect_ratio'] == "16:9"
-        assert sent_json['duration'] == 5
+        assert len(mock_post) == 1
+        assert "video/text/generate" in str(mock_post[0].url)
+        sent = sent_json(mock_post[0])
+        assert sent['prompt'] == "A cat playing piano"
+        assert sent['model'] == "v5"
+        assert sent['aspect_ratio'] == "16:9"
+        assert sent['duration'] == 5
+
+
+
+def test_pixverse_generation_is_registered_and_listed(tmp_path):
+    """
+    Submitted generations are recorded in the local job registry, start being
+    tracked, and show up in the list/filter endpoints.
+    """
+    from pixverse_store import PixverseJobStore
+
+    store = PixverseJobStore(str(tmp_path / "pixverse.sqlite3"))
+    with patch('main.pixverse_jobs', store), patch('main.pixverse_tracker') as mock_tracker, \
+            fake_pixverse({"ErrCode": 0, "Resp": {"video_id": 424242}}):
+
+        response = client.post("/api/pixverse/generate-video", data={"prompt": "A cat playing piano"})
+        assert response.status_code == 200
+        mock_tracker.track.assert_called_once()
+        assert mock_tracker.track.call_args[0][0] == 424242
+
+        job = client.get("/api/pixverse/jobs/424242").json()
+        assert job["kind"] == "text"
+        assert job["state"] == "pending"
+        assert job["params"]["prompt"] == "A cat playing piano"
+
+        assert [j["video_id"] for j in client.get("/api/pixverse/jobs?state=pending").json()["jobs"]] == ["424242"]
+        assert client.get("/api/pixverse/jobs?kind=image").json()["jobs"] == []
+        assert client.get("/api/pixverse/jobs/1").status_code == 404
+
+def test_pixverse_batch_submission_reports_partial_failures():
+    """
+    A storyboard is submitted in one request; each job gets its video_id or its
+    own error, in request order.
+    """
+    def answer(request):
+        prompt = sent_json(request)['prompt']
+        if prompt == "shot 2":
+            return {"ErrCode": 500008, "ErrMsg": "Insufficient balance", "Resp": {}}
+        return {"ErrCode": 0, "Resp": {"video_id": 1000 + int(prompt.split()[-1])}}
+
+    jobs = [{"prompt": "shot 1"}, {"prompt": "shot 2"}, {"prompt": "shot 3", "img_id": 42, "duration": 8}]
+    with fake_pixverse(answer) as sent, patch('main.pixverse_tracker'):
+        response = client.post("/api/pixverse/generate-videos", json={"jobs": jobs})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["submitted"] == 2 and data["failed"] == 1
+    assert data["jobs"][0] == {"index": 0, "video_id": 1001}
+    assert data["jobs"][1]["status_code"] == 500
+    assert "Insufficient balance" in data["jobs"][1]["error"]
+    assert data["jobs"][2] == {"index": 2, "video_id": 1003}
+
+    by_prompt = {sent_json(r)['prompt']: r for r in sent}
+    assert "video/text/generate" in str(by_prompt["shot 1"].url)
+    assert "video/img/generate" in str(by_prompt["shot 3"].url)
+    assert sent_json(by_prompt["shot 3"])['img_id'] == 42
+    assert sent_json(by_prompt["shot 3"])['duration'] == 8
+
+    too_many = client.post("/api/pixverse/generate-videos", json={"jobs": [{"prompt": "x"}] * 100})
+    assert too_many.status_code == 400
 
 
 def test_pixverse_text_to_video_no_api_key():
@@ -227,10 +377,7 @@ def test_pixverse_text_to_video_api_error():
         "Resp": {}
     }
     
-    with patch('requests.post') as mock_post:
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = mock_pixverse_response
-        mock_post.return_value.raise_for_status = MagicMock()
+    with fake_pixverse(mock_pixverse_response):
         
         response = client.post(
             "/api/pixverse/generate-video",
@@ -258,10 +405,7 @@ def test_pixverse_video_status_success():
         }
     }
     
-    with patch('requests.get') as mock_get:
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_status_response
-        mock_get.return_value.raise_for_status = MagicMock()
+    with fake_pixverse(mock_status_response) as mock_get:
         
         response = client.get("/api/pixverse/video-status/123456789")
         
@@ -271,15 +415,84 @@ def test_pixverse_video_status_success():
         assert data["url"] == "https://example.com/video.mp4"
         
         # Verify API was called correctly
-        mock_get.assert_called_once()
-        called_url = mock_get.call_args[0][0]
+        assert len(mock_get) == 1
+        called_url = str(mock_get[0].url)
         assert "video/result/123456789" in called_url
 
 
+
+def test_pixverse_video_status_served_from_tracker():
+    """
+    Status requests and SSE subscribers for a tracked video are answered from the
+    tracker's cached status without calling PixVerse again.
+    """
+    from main import pixverse_tracker
+
+    pixverse_tracker.track("555000111", {"id": 555000111, "status": 1, "url": "https://example.com/done.mp4"})
+
+    with fake_pixverse({"ErrCode": 0, "Resp": {}}) as mock_get:
+        response = client.get("/api/pixverse/video-status/555000111")
+        events = client.get("/api/pixverse/video-status/555000111/events")
+
+    assert response.status_code == 200
+    assert response.json()["url"] == "https://example.com/done.mp4"
+    assert events.status_code == 200
+    assert 'event: status' in events.text
+    assert '"url": "https://example.com/done.mp4"' in events.text
+    assert mock_get == []
+
+
+
+def test_pixverse_video_events_for_unknown_video():
+    """
+    Subscribing to a video PixVerse doesn't know is a 404 and doesn't start polling it.
+    """
+    from main import pixverse_tracker
+
+    with fake_pixverse({"ErrCode": 400012, "ErrMsg": "video not found", "Resp": {}}) as sent:
+        response = client.get("/api/pixverse/video-status/999000999/events")
+
+    assert response.status_code == 404
+    assert len(sent) == 1
+    assert pixverse_tracker.get("999000999") is None
+
+def test_pixverse_video_redirects_until_local_copy_is_ready(tmp_path):
+    """
+    A finished video is served from PixVerse's URL until the background
+    download lands, then locally with Range, ETag and long-lived caching.
+    """
+    from media_mirror import MediaMirror
+    from main import pixverse_video_key
+
+    mirror = MediaMirror(DiskCache(str(tmp_path / "videos"), max_bytes=1024 * 1024))
+    tracked = MagicMock(resp={"status": 1, "url": "https://example.com/v.mp4"})
+    with patch('main.pixverse_videos', mirror), patch('main.pixverse_tracker') as mock_tracker, \
+            patch.object(mirror, 'enqueue') as mock_enqueue:
+        mock_tracker.get.return_value = tracked
+
+        response = client.get("/api/pixverse/videos/31337", follow_redirects=False)
+        assert response.status_code == 307
+        assert response.headers['location'] == "https://example.com/v.mp4"
+        mock_enqueue.assert_called_once_with(pixverse_video_key("31337"), "https://example.com/v.mp4")
+
+        mirror.cache.put(pixverse_video_key("31337"), b"0123456789", "video/mp4")
+        local = client.get("/api/pixverse/videos/31337", headers={"Range": "bytes=0-3"})
+        assert local.status_code == 206
+        assert local.content == b"0123"
+        assert "immutable" in local.headers['cache-control']
+        assert client.get("/api/pixverse/videos/31337", headers={"If-None-Match": local.headers['etag']}).status_code == 304
+
+        mock_tracker.get.return_value = None
+        assert client.get("/api/pixverse/videos/404404").status_code == 404
+
 def test_pixverse_credits_balance_success():
     """
-    Tests fetching credit balance from PixVerse.
+    Tests fetching credit balance from PixVerse; repeat checks within the TTL
+    are served from the local cache.
     """
+    from main import fetch_pixverse_balance
+    from pixverse_credits import CreditLedger
+
     mock_balance_response = {
         "ErrCode": 0,
         "ErrMsg": "success",
@@ -290,11 +503,8 @@ def test_pixverse_credits_balance_success():
         }
     }
     
-    with patch('requests.get') as mock_get:
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_balance_response
-        mock_get.return_value.raise_for_status = MagicMock()
-        
+    with patch('main.pixverse_credits', CreditLedger(fetch_pixverse_balance)), \
+            fake_pixverse(mock_balance_response) as mock_get:
         response = client.get("/api/pixverse/credits")
         
         assert response.status_code == 200
@@ -304,10 +514,35 @@ def test_pixverse_credits_balance_success():
         assert data["account_id"] == 123456
         
         # Verify API was called correctly
-        mock_get.assert_called_once()
-        called_url = mock_get.call_args[0][0]
+        assert len(mock_get) == 1
+        called_url = str(mock_get[0].url)
         assert "account/balance" in called_url
 
+        assert client.get("/api/pixverse/credits").json()["credit_monthly"] == 500000
+        assert len(mock_get) == 1
+        client.get("/api/pixverse/credits?refresh=true")
+        assert len(mock_get) == 2
+
+
+def test_pixverse_submission_decrements_credits_and_preflight_rejects(ample_pixverse_credits):
+    """
+    A submission is charged locally with the cost PixVerse reports, and one the
+    balance can't cover is rejected before reaching PixVerse.
+    """
+    ample_pixverse_credits.update({"credit_monthly": 60, "credit_package": 10})
+
+    with fake_pixverse({"ErrCode": 0, "Resp": {"video_id": 1, "credits": 45}}) as sent, \
+            patch('main.pixverse_tracker'), patch.object(ample_pixverse_credits, '_schedule_reconcile') as reconcile:
+        assert client.post("/api/pixverse/generate-video", data={"prompt": "first"}).status_code == 200
+        credits = client.get("/api/pixverse/credits").json()
+        assert (credits["credit_monthly"], credits["credit_package"]) == (15, 10)
+        reconcile.assert_called_once()
+
+        response = client.post("/api/pixverse/generate-video", data={"prompt": "second"})
+        assert response.status_code == 402
+        assert "45" in response.json()["detail"]
+    assert len(sent) == 1
+
 
 def test_pixverse_image_to_video_success():
     """
@@ -334,12 +569,8 @@ def test_pixverse_image_to_video_success():
         }
     }
     
-    with patch('requests.post') as mock_post:
-        # Configure mock to return different responses for upload vs generation
-        mock_post.side_effect = [
-            MagicMock(status_code=200, json=lambda: mock_upload_response, raise_for_status=MagicMock()),
-            MagicMock(status_code=200, json=lambda: mock_video_response, raise_for_status=MagicMock())
-        ]
+    # Different responses for upload vs generation
+    with fake_pixverse(mock_upload_response, mock_video_response) as mock_post:
         
         # Create a test image file
         test_image_content = b'\\x89PNG\\r\\n\\x1a\\n\\x00\\x00\\x00\\rIHDR'
@@ -361,23 +592,42 @@ def test_pixverse_image_to_video_success():
         assert data["video_id"] == 123456789
         
         # Verify both API calls were made
-        assert mock_post.call_count == 2
+        assert len(mock_post) == 2
         
         # Check first call (image upload)
-        first_call_url = mock_post.call_args_list[0][0][0]
-        assert "image/upload" in first_call_url
+        assert "image/upload" in str(mock_post[0].url)
         
         # Check second call (video generation)
-        second_call_url = mock_post.call_args_list[1][0][0]
-        assert "video/img/generate" in second_call_url
-        sent_json = mock_post.call_args_list[1][1]['json']
-        assert sent_json['img_id'] == 987654
-        assert sent_json['prompt'] == "camera zooms in slowly"
-        assert sent_json['duration'] == 5
-        assert sent_json['quality'] == "540p"
+        assert "video/img/generate" in str(mock_post[1].url)
+        sent = sent_json(mock_post[1])
+        assert sent['img_id'] == 987654
+        assert sent['prompt'] == "camera zooms in slowly"
+        assert sent['duration'] == 5
+        assert sent['quality'] == "540p"
         # model should be included (default v4.5)
-        assert sent_json['model'] == 'v4.5'
+        assert sent['model'] == 'v4.5'
+
+
 
+def test_pixverse_image_to_video_reuses_uploaded_image():
+    """
+    Submitting the same source image again skips the upload and reuses the img_id.
+    """
+    upload = {"ErrCode": 0, "Resp": {"img_id": 555, "img_url": "https://example.com/a.jpg"}}
+    video = {"ErrCode": 0, "Resp": {"video_id": 777}}
+
+    with fake_pixverse(upload, video) as mock_post, patch('main.pixverse_tracker'):
+        for prompt in ("zoom in", "pan left"):
+            response = client.post(
+                "/api/pixverse/generate-video-from-image",
+                data={"prompt": prompt},
+                files={"image": ("same.png", b"same-image-bytes", "image/png")}
+            )
+            assert response.status_code == 200
+
+    assert ["image/upload" in str(r.url) for r in mock_post] == [True, False, False]
+    assert sent_json(mock_post[2])['img_id'] == 555
+    assert sent_json(mock_post[2])['prompt'] == "pan left"
 
 def test_pixverse_image_to_video_with_camera_movement():
     """
@@ -395,11 +645,7 @@ def test_pixverse_image_to_video_with_camera_movement():
         "Resp": {"video_id": 123456789, "credits": 45}
     }
     
-    with patch('requests.post') as mock_post:
-        mock_post.side_effect = [
-            MagicMock(status_code=200, json=lambda: mock_upload_response, raise_for_status=MagicMock()),
-            MagicMock(status_code=200, json=lambda: mock_video_response, raise_for_status=MagicMock())
-        ]
+    with fake_pixverse(mock_upload_response, mock_video_response) as mock_post:
         
         test_image_content = b'\\x89PNG\\r\\n\\x1a\\n'
         
@@ -419,19 +665,38 @@ def test_pixverse_image_to_video_with_camera_movement():
         assert response.status_code == 200
         
         # Verify camera_movement was included in the payload
-        sent_json = mock_post.call_args_list[1][1]['json']
-        assert sent_json['camera_movement'] == "zoom_in"
-        assert sent_json['duration'] == 10
-        assert sent_json['quality'] == "720p"
-        assert sent_json['motion_mode'] == "slow"
-        assert sent_json['seed'] == 12345
+        sent = sent_json(mock_post[1])
+        assert sent['camera_movement'] == "zoom_in"
+        assert sent['duration'] == 10
+        assert sent['quality'] == "720p"
+        assert sent['motion_mode'] == "slow"
+        assert sent['seed'] == 12345
         # include model default
-        assert sent_json['model'] == 'v4.5'
+        assert sent['model'] == 'v4.5'
+
+
+def test_pixverse_image_to_video_preflight_rejects_before_upload(ample_pixverse_credits):
+    """
+    An image-to-video request the balance can't cover is rejected before the
+    image is uploaded.
+    """
+    ample_pixverse_credits.update({"credit_monthly": 0, "credit_package": 0})
+
+    with fake_pixverse({"ErrCode": 0, "Resp": {"img_id": 1}}) as sent:
+        response = client.post(
+            "/api/pixverse/generate-video-from-image",
+            data={"prompt": "test"},
+            files={"image": ("test.png", b"never-uploaded", "image/png")}
+        )
+
+    assert response.status_code == 402
+    assert sent == []
 
 
-def test_pixverse_image_to_video_upload_failure():
+def test_pixverse_image_to_video_upload_failure(ample_pixverse_credits):
     """
-    Tests image-to-video when image upload fails.
+    Tests image-to-video when image upload fails; the credits reserved for the
+    video are given back.
     """
     mock_upload_response = {
         "ErrCode": 400,
@@ -439,10 +704,7 @@ def test_pixverse_image_to_video_upload_failure():
         "Resp": {}
     }
     
-    with patch('requests.post') as mock_post:
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = mock_upload_response
-        mock_post.return_value.raise_for_status = MagicMock()
+    with fake_pixverse(mock_upload_response):
         
         test_image_content = b'invalid image data'
         
@@ -454,6 +716,7 @@ def test_pixverse_image_to_video_upload_failure():
         
         assert response.status_code == 500
         assert "Invalid image format" in response.json()['detail']
+        assert client.get("/api/pixverse/credits").json()["credit_monthly"] == 1000000
 
 
 # --- Regression Tests ---
@@ -542,11 +805,7 @@ def test_pixverse_extend_video_success():
         "Resp": {"video_id": 999888777}
     }
     
-    with patch('requests.post') as mock_post:
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = mock_response
-        mock_post.return_value.text = str(mock_response)
-        mock_post.return_value.raise_for_status = MagicMock()
+    with fake_pixverse(mock_response) as mock_post:
         
         response = client.post(
             "/api/pixverse/extend-video",
@@ -565,12 +824,12 @@ def test_pixverse_extend_video_success():
         assert data["video_id"] == 999888777
         
         # Verify the API was called correctly
-        mock_post.assert_called_once()
-        called_url = mock_post.call_args[0][0]
+        assert len(mock_post) == 1
+        called_url = str(mock_post[0].url)
         assert "video/extend/generate" in called_url
-        sent_json = mock_post.call_args.kwargs['json']
-        assert sent_json['source_video_id'] == 123456
-        assert sent_json['prompt'] == "camera continues forward"
+        sent = sent_json(mock_post[0])
+        assert sent['source_video_id'] == 123456
+        assert sent['prompt'] == "camera continues forward"
 
 
 def test_pixverse_upload_media_success():
@@ -587,11 +846,7 @@ def test_pixverse_upload_media_success():
         }
     }
     
-    with patch('requests.post') as mock_post:
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = mock_response
-        mock_post.return_value.text = str(mock_response)
-        mock_post.return_value.raise_for_status = MagicMock()
+    with fake_pixverse(mock_response) as mock_post:
         
         audio_content = b'fake audio data'
         response = client.post(
@@ -606,11 +861,39 @@ def test_pixverse_upload_media_success():
         assert data["url"] == "https://example.com/audio.mp3"
         
         # Verify API call
-        mock_post.assert_called_once()
-        called_url = mock_post.call_args[0][0]
+        assert len(mock_post) == 1
+        called_url = str(mock_post[0].url)
         assert "media/upload" in called_url
 
 
+
+def test_pixverse_upload_media_streams_file_body():
+    """
+    The media file is passed on as a streamed multipart body with an exact
+    length instead of being read into memory, and oversized files are refused.
+    """
+    from email.parser import BytesParser
+
+    audio_content = b'fake audio data' * 1000
+    with fake_pixverse({"ErrCode": 0, "Resp": {"media_id": 1}}) as sent:
+        response = client.post("/api/pixverse/upload-media", files={"file": ('voice "1".mp3', audio_content, "audio/mpeg")})
+
+    assert response.status_code == 200
+    [request] = sent
+    body = request.read()
+    assert int(request.headers['content-length']) == len(body)
+    message = BytesParser().parsebytes(f"Content-Type: {request.headers['content-type']}\r\n\r\n".encode() + body)
+    [part] = message.get_payload()
+    assert part.get_param('name', header='content-disposition') == 'file'
+    assert part.get_filename() == 'voice %221%22.mp3'
+    assert part.get_content_type() == 'audio/mpeg'
+    assert part.get_payload(decode=True) == audio_content
+
+    with patch('main.PIXVERSE_MAX_MEDIA_BYTES', 10), fake_pixverse({"ErrCode": 0, "Resp": {}}) as sent:
+        response = client.post("/api/pixverse/upload-media", files={"file": ("big.mp3", b"x" * 11, "audio/mpeg")})
+    assert response.status_code == 413
+    assert sent == []
+
 def test_pixverse_lip_sync_tts_success():
     """
     Tests lip sync generation with TTS.
@@ -621,11 +904,7 @@ def test_pixverse_lip_sync_tts_success():
         "Resp": {"video_id": 777666555}
     }
     
-    with patch('requests.post') as mock_post:
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = mock_response
-        mock_post.return_value.text = str(mock_response)
-        mock_post.return_value.raise_for_status = MagicMock()
+    with fake_pixverse(mock_response) as mock_post:
         
         response = client.post(
             "/api/pixverse/lip-sync",
@@ -641,30 +920,31 @@ def test_pixverse_lip_sync_tts_success():
         assert data["video_id"] == 777666555
         
         # Verify API call
-        mock_post.assert_called_once()
-        called_url = mock_post.call_args[0][0]
+        assert len(mock_post) == 1
+        called_url = str(mock_post[0].url)
         assert "lip_sync/generate" in called_url
-        sent_json = mock_post.call_args.kwargs['json']
-        assert sent_json['source_video_id'] == 123456
-        assert sent_json['lip_sync_tts_content'] == "Hello world"
-        assert sent_json['lip_sync_tts_speaker_id'] == "1"
+        sent = sent_json(mock_post[0])
+        assert sent['source_video_id'] == 123456
+        assert sent['lip_sync_tts_content'] == "Hello world"
+        assert sent['lip_sync_tts_speaker_id'] == "1"
 
 
-def test_chat_with_image_url_success():
+def test_chat_with_image_url_success(tmp_path):
     """
     Test chat-with-image when given an image URL; backend should fetch image and send base64 to Ollama.
     """
+    from remote_images import RemoteImageFetcher
+
     # Mock the image fetch and Ollama call
-    fake_image_bytes = b'\x89PNG\r\n\x1a\n'  # pretend PNG
+    fake_image_bytes = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR'  # pretend PNG
     mock_ollama_resp = {"response": "This is an analysis from the vision model."}
+    fetcher = RemoteImageFetcher(
+        DiskCache(str(tmp_path / "remote"), max_bytes=1024 * 1024),
+        client=lambda: httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=fake_image_bytes))),
+    )
 
-    with patch('requests.get') as mock_get:
+    with patch('main.remote_images', fetcher):
         with patch('requests.post') as mock_post:
-            # requests.get for the image
-            mock_get.return_value.status_code = 200
-            mock_get.return_value.content = fake_image_bytes
-            mock_get.return_value.raise_for_status = MagicMock()
-
             # requests.post to Ollama
             mock_post.return_value.status_code = 200
             mock_post.return_value.json.return_value = mock_ollama_resp
@@ -680,6 +960,7 @@ def test_chat_with_image_url_success():
             data = response.json()
             assert 'response' in data
             assert data['response'] == mock_ollama_resp['response']
+            assert base64.b64decode(mock_post.call_args.kwargs['json']['images'][0]) == fake_image_bytes
 
 
 def test_chat_with_image_base64_success():
@@ -705,6 +986,105 @@ def test_chat_with_image_base64_success():
         assert data['response'] == mock_ollama_resp['response']
 
 
+def test_chat_with_image_sends_downscaled_image(tmp_path):
+    """
+    A large photo is shrunk to the vision model's input size before it is sent.
+    """
+    import io
+    pytest.importorskip("PIL")
+    from PIL import Image
+    from vision_images import VisionImageNormalizer
+
+    buf = io.BytesIO()
+    Image.new("RGB", (3000, 2000), "blue").save(buf, format="PNG")
+    normalizer = VisionImageNormalizer(DiskCache(str(tmp_path / "vision"), max_bytes=1024 * 1024), max_side=672)
+
+    with patch('main.vision_images', normalizer), patch('requests.post') as mock_post:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {"response": "Blue"}
+        response = client.post('/api/chat-with-image', json={
+            'image_base64': base64.b64encode(buf.getvalue()).decode('utf-8'),
+            'message': 'What colors?'
+        })
+
+    assert response.status_code == 200
+    sent_image = base64.b64decode(mock_post.call_args.kwargs['json']['images'][0])
+    with Image.open(io.BytesIO(sent_image)) as img:
+        assert img.size == (672, 448)
+
+
+
+def test_chat_with_image_stream_relays_tokens():
+    """
+    The streaming variant relays each token from Ollama as it is generated,
+    then the full response.
+    """
+    ollama_lines = [
+        {"response": "A red", "done": False},
+        {"response": " square.", "done": True},
+    ]
+    seen = {}
+
+    def ollama_handler(request):
+        seen['json'] = json.loads(request.content)
+        body = "".join(json.dumps(line) + "\n" for line in ollama_lines).encode()
+        return httpx.Response(200, stream=httpx.ByteStream(body))
+
+    with patch('http_files.async_client', return_value=httpx.AsyncClient(transport=httpx.MockTransport(ollama_handler))):
+        response = client.post('/api/chat-with-image/stream', json={
+            'image_base64': base64.b64encode(b'\x89PNG\r\n\x1a\n').decode('utf-8'),
+            'message': 'What is it?'
+        })
+
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events == [
+        {"type": "text", "text": "A red"},
+        {"type": "text", "text": " square."},
+        {"type": "done", "response": "A red square.", "model": "llava:latest"},
+    ]
+    assert seen['json']['stream'] is True
+    assert base64.b64decode(seen['json']['images'][0]) == b'\x89PNG\r\n\x1a\n'
+
+
+def test_chat_with_image_stream_reports_stalled_model():
+    """
+    A gap between tokens longer than the inter-token timeout ends the stream
+    with an error event after the tokens already generated.
+    """
+    class StallingStream(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield json.dumps({"response": "A red", "done": False}).encode() + b"\n"
+            raise httpx.ReadTimeout("timed out")
+
+    def ollama_handler(request):
+        return httpx.Response(200, stream=StallingStream())
+
+    with patch('http_files.async_client', return_value=httpx.AsyncClient(transport=httpx.MockTransport(ollama_handler))):
+        response = client.post('/api/chat-with-image/stream', json={
+            'image_base64': base64.b64encode(b'\x89PNG\r\n\x1a\n').decode('utf-8'),
+            'message': 'What is it?'
+        })
+
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0] == {"type": "text", "text": "A red"}
+    assert events[-1]["type"] == "error"
+    assert "stopped responding" in events[-1]["detail"]
+
+
+def test_chat_with_image_stream_ollama_error():
+    def ollama_handler(request):
+        return httpx.Response(404, text='model "llava:latest" not found')
+
+    with patch('http_files.async_client', return_value=httpx.AsyncClient(transport=httpx.MockTransport(ollama_handler))):
+        response = client.post('/api/chat-with-image/stream', json={
+            'image_base64': base64.b64encode(b'\x89PNG\r\n\x1a\n').decode('utf-8'),
+            'message': 'What is it?'
+        })
+
+    assert response.status_code == 500
+    assert "not found" in response.json()["detail"]
+
 def test_pixverse_lip_sync_audio_success():
     """
     Tests lip sync generation with uploaded audio.
@@ -715,11 +1095,7 @@ def test_pixverse_lip_sync_audio_success():
         "Resp": {"video_id": 888999000}
     }
     
-    with patch('requests.post') as mock_post:
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = mock_response
-        mock_post.return_value.text = str(mock_response)
-        mock_post.return_value.raise_for_status = MagicMock()
+    with fake_pixverse(mock_response) as mock_post:
         
         response = client.post(
             "/api/pixverse/lip-sync",
@@ -734,8 +1110,41 @@ def test_pixverse_lip_sync_audio_success():
         assert data["video_id"] == 888999000
         
         # Verify audio_media_id was included
-        sent_json = mock_post.call_args.kwargs['json']
-        assert sent_json['audio_media_id'] == 555444
+        assert sent_json(mock_post[0])['audio_media_id'] == 555444
+
+
+def test_pixverse_lip_sync_job_moves_speech_server_side(tmp_path):
+    """
+    An ElevenLabs lip sync runs as one server-side job: the synthesized audio is
+    uploaded to PixVerse and used for the lip-sync request, with stage events.
+    """
+    from email.parser import BytesParser
+
+    answers = [
+        {"ErrCode": 0, "Resp": {"media_id": 555444, "media_type": "audio"}},
+        {"ErrCode": 0, "Resp": {"video_id": 888999000}},
+    ]
+    with patch('main.eleven_client') as mock_eleven_client, \
+            patch('main.tts_cache', DiskCache(str(tmp_path / "tts"), max_bytes=1024 * 1024)), \
+            patch('main.pixverse_tracker'), fake_pixverse(*answers) as sent:
+        mock_eleven_client.text_to_speech.stream.return_value = iter([b"mp3-", b"audio"])
+
+        response = client.post("/api/pixverse/lip-sync-jobs",
+                               data={"source_video_id": 123456, "text": "Hello world", "voice_id": "v1"})
+        assert response.status_code == 200
+        job_id = response.json()["job_id"]
+        events = client.get(f"/api/pixverse/lip-sync-jobs/{job_id}/events").text
+
+    assert events.count("event: stage") == 3
+    assert '"video_id": 888999000' in events
+    assert client.get(f"/api/pixverse/lip-sync-jobs/{job_id}").json()["status"] == "done"
+
+    upload, lip_sync = sent
+    assert "media/upload" in str(upload.url)
+    message = BytesParser().parsebytes(f"Content-Type: {upload.headers['content-type']}\r\n\r\n".encode() + upload.read())
+    assert message.get_payload()[0].get_payload(decode=True) == b"mp3-audio"
+    assert "lip_sync/generate" in str(lip_sync.url)
+    assert sent_json(lip_sync) == {"source_video_id": 123456, "audio_media_id": 555444}
 
 
 def test_pixverse_lip_sync_no_input():
@@ -768,10 +1177,7 @@ def test_pixverse_tts_speakers_success():
         }
     }
     
-    with patch('requests.get') as mock_get:
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_response
-        mock_get.return_value.raise_for_status = MagicMock()
+    with fake_pixverse(mock_response) as mock_get:
         
         response = client.get("/api/pixverse/tts-speakers")
         
@@ -783,8 +1189,8 @@ def test_pixverse_tts_speakers_success():
         assert data["data"][2]["speaker_id"] == "auto"
         
         # Verify API call
-        mock_get.assert_called_once()
-        called_url = mock_get.call_args[0][0]
+        assert len(mock_get) == 1
+        called_url = str(mock_get[0].url)
         assert "lip_sync/tts_list" in called_url
 
 
@@ -813,11 +1219,7 @@ def test_pixverse_upload_media_api_error():
         "Resp": {}
     }
     
-    with patch('requests.post') as mock_post:
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = mock_response
-        mock_post.return_value.text = str(mock_response)
-        mock_post.return_value.raise_for_status = MagicMock()
+    with fake_pixverse(mock_response):
         
         response = client.post(
             "/api/pixverse/upload-media",
@@ -840,10 +1242,7 @@ def test_regression_original_video_generation_still_works():
         "Resp": {"video_id": 123, "credits": 45}
     }
     
-    with patch('requests.post') as mock_post:
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = mock_response
-        mock_post.return_value.raise_for_status = MagicMock()
+    with fake_pixverse(mock_response):
         
         response = client.post(
             "/api/pixverse/generate-video",
@@ -853,3 +1252,57 @@ def test_regression_original_video_generation_still_works():
         assert response.status_code == 200
         assert response.json()["video_id"] == 123
 
+
+
+def test_query_rag_speech_streams_text_and_audio_per_sentence(tmp_path):
+    """
+    The spoken RAG endpoint streams Ollama's tokens as text events and one audio
+    event per completed sentence, in order, followed by the full answer.
+    """
+    import json
+    import httpx
+
+    mock_chroma_results = {'documents': [['The sky is blue because of Rayleigh scattering.']]}
+    ollama_lines = [
+        {"response": "The sky looks blue because air scatters", "done": False},
+        {"response": " short wavelengths more strongly. Sunsets", "done": False},
+        {"response": " are red for the same reason.", "done": True},
+    ]
+    seen = {}
+
+    def ollama_handler(request):
+        seen['url'] = str(request.url)
+        seen['json'] = json.loads(request.content)
+        body = "".join(json.dumps(line) + "\n" for line in ollama_lines).encode()
+        return httpx.Response(200, stream=httpx.ByteStream(body))
+
+    with patch('main.collection.query', return_value=mock_chroma_results), \
+            patch('http_files.async_client', return_value=httpx.AsyncClient(transport=httpx.MockTransport(ollama_handler))), \
+            patch('main.eleven_client') as mock_eleven_client, \
+            patch('main.tts_cache', DiskCache(str(tmp_path / "tts"), max_bytes=1024 * 1024)):
+        mock_eleven_client.text_to_speech.stream.side_effect = lambda text, voice_id: iter([text[:3].encode()])
+
+        response = client.post("/query/rag/speech", data={"query": "Why is the sky blue?", "model": "test-model", "voice_id": "v1"})
+
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0] == {"type": "context", "context": ['The sky is blue because of Rayleigh scattering.']}
+    assert [e["text"] for e in events if e["type"] == "text"] == [line["response"] for line in ollama_lines]
+
+    audio = [e for e in events if e["type"] == "audio"]
+    assert [e["text"] for e in audio] == [
+        "The sky looks blue because air scatters short wavelengths more strongly.",
+        "Sunsets are red for the same reason.",
+    ]
+    assert [base64.b64decode(e["audio"]) for e in audio] == [b"The", b"Sun"]
+    assert events[-1] == {"type": "done", "answer": "".join(line["response"] for line in ollama_lines)}
+
+    assert seen['url'] == "http://127.0.0.1:11434/api/generate"
+    assert seen['json']['stream'] is True
+    assert "User's Question: Why is the sky blue?" in seen['json']['prompt']
+
+
+def test_query_rag_speech_no_client():
+    with patch('main.eleven_client', None):
+        response = client.post("/query/rag/speech", data={"query": "q", "model": "m", "voice_id": "v"})
+    assert response.status_code == 501
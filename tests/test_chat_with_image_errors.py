@@ -1,8 +1,8 @@
-import base64
+import httpx
 from fastapi.testclient import TestClient
-import pytest
 from main import app
-from unittest.mock import patch, MagicMock
+from disk_cache import DiskCache
+from unittest.mock import patch
 
 client = TestClient(app)
 
@@ -16,37 +16,63 @@ def test_chat_with_image_missing_image():
     assert "No image provided" in response.json()["detail"]
 
 
-def test_chat_with_image_invalid_url_fetch():
+def test_chat_with_image_invalid_base64():
     """
-    If the image URL fetch fails or returns non-200, the endpoint should return 400.
+    image_base64 that isn't base64 is rejected before anything is sent to Ollama.
     """
-    with patch('requests.get') as mock_get:
-        mock_get.return_value.status_code = 404
-        mock_get.return_value.raise_for_status.side_effect = Exception("Not Found")
+    with patch('requests.post') as mock_post:
+        response = client.post('/api/chat-with-image', json={"image_base64": "not base64!", "message": "Hi"})
+    assert response.status_code == 400
+    assert "Invalid image_base64" in response.json()["detail"]
+    mock_post.assert_not_called()
+
+
+def _fetcher(tmp_path, *responses):
+    """Remote image fetcher answering with `responses` in order."""
+    from remote_images import RemoteImageFetcher
+    answers = iter(responses)
+    return RemoteImageFetcher(
+        DiskCache(str(tmp_path / "remote"), max_bytes=1024 * 1024),
+        client=lambda: httpx.AsyncClient(transport=httpx.MockTransport(lambda request: next(answers))),
+    )
 
+
+def test_chat_with_image_invalid_url_fetch(tmp_path):
+    """
+    If the image URL fetch fails or returns non-200, the endpoint should return 400.
+    """
+    with patch('main.remote_images', _fetcher(tmp_path, httpx.Response(404, text="Not Found"))):
         response = client.post('/api/chat-with-image', json={
             'image_url': 'https://example.com/missing.png',
             'message': 'Describe it',
             'model': 'llava:latest'
         })
 
-        assert response.status_code == 400
-        assert "Failed to fetch image" in response.json()["detail"] or "Failed to fetch image URL" in response.json()["detail"]
+    assert response.status_code == 400
+    assert "Failed to fetch image" in response.json()["detail"]
+
+
+def test_chat_with_image_url_not_an_image(tmp_path):
+    """
+    A URL that answers with something other than an image is rejected before Ollama is called.
+    """
+    page = httpx.Response(200, text="<html>" + "x" * 100 + "</html>", headers={"Content-Type": "image/png"})
+    with patch('main.remote_images', _fetcher(tmp_path, page)), patch('requests.post') as mock_post:
+        response = client.post('/api/chat-with-image', json={'image_url': 'https://example.com/page', 'message': 'Hi'})
+
+    assert response.status_code == 400
+    assert "not return a supported image" in response.json()["detail"]
+    mock_post.assert_not_called()
 
 
-def test_chat_with_image_ollama_returns_error():
+def test_chat_with_image_ollama_returns_error(tmp_path):
     """
     If Ollama returns a non-200 status, the endpoint should propagate a 500 error.
     """
-    fake_image_bytes = b'\x89PNG\r\n\x1a\n'
+    fake_image_bytes = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR'
 
-    with patch('requests.get') as mock_get:
+    with patch('main.remote_images', _fetcher(tmp_path, httpx.Response(200, content=fake_image_bytes))):
         with patch('requests.post') as mock_post:
-            # requests.get for image fetch
-            mock_get.return_value.status_code = 200
-            mock_get.return_value.content = fake_image_bytes
-            mock_get.return_value.raise_for_status = MagicMock()
-
             # Ollama responds with non-200
             mock_post.return_value.status_code = 500
             mock_post.return_value.text = 'Ollama internal error'
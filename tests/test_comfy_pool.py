@@ -0,0 +1,134 @@
+from unittest.mock import patch, MagicMock
+
+import pytest
+import requests
+
+from comfy_client import ComfyPool, NoBackendAvailable
+
+
+def _fake_backends(state):
+    """Build a requests.get replacement answering /queue and /models/checkpoints per host."""
+    def fake_get(url, timeout=None):
+        host, _, path = url.partition("//")[2].partition("/")
+        info = state[host]
+        if info.get("down"):
+            raise requests.exceptions.ConnectionError("refused")
+        response = MagicMock()
+        response.raise_for_status = MagicMock()
+        if path == "queue":
+            response.json.return_value = {"queue_running": [[0]] * info["running"], "queue_pending": [[0]] * info["pending"]}
+        else:
+            response.json.return_value = info["models"]
+        return response
+    return fake_get
+
+
+def test_routes_to_shortest_queue_with_model():
+    state = {
+        "a:8188": {"running": 1, "pending": 3, "models": ["xl.safetensors"]},
+        "b:8188": {"running": 1, "pending": 0, "models": ["xl.safetensors"]},
+        "c:8188": {"running": 0, "pending": 0, "models": ["sd15.ckpt"]},
+    }
+    pool = ComfyPool(["http://a:8188", "http://b:8188", "http://c:8188"])
+    with patch("requests.get", side_effect=_fake_backends(state)):
+        assert pool.select("xl.safetensors").url == "http://b:8188"
+        assert pool.select("sd15.ckpt").url == "http://c:8188"
+
+
+def test_spreads_consecutive_prompts_between_probes():
+    state = {
+        "a:8188": {"running": 0, "pending": 0, "models": ["m"]},
+        "b:8188": {"running": 0, "pending": 0, "models": ["m"]},
+    }
+    pool = ComfyPool(["http://a:8188", "http://b:8188"], health_ttl=60)
+    with patch("requests.get", side_effect=_fake_backends(state)):
+        urls = [pool.select("m").url for _ in range(4)]
+    assert sorted(urls) == ["http://a:8188", "http://a:8188", "http://b:8188", "http://b:8188"]
+
+
+def test_unhealthy_backends_are_skipped():
+    state = {
+        "a:8188": {"down": True},
+        "b:8188": {"running": 5, "pending": 5, "models": ["m"]},
+    }
+    pool = ComfyPool(["http://a:8188", "http://b:8188"])
+    with patch("requests.get", side_effect=_fake_backends(state)):
+        assert pool.select("m").url == "http://b:8188"
+        with pytest.raises(NoBackendAvailable):
+            pool.select("other-model")
+    assert pool.backends[0].healthy is False
+
+
+def test_single_backend_is_not_probed_and_tracks_prompt_owner():
+    pool = ComfyPool(["http://only:8188"])
+    with patch("requests.get") as mock_get:
+        backend = pool.select("anything")
+    mock_get.assert_not_called()
+
+    pool.assign("prompt-1", backend)
+    assert pool.backend_for("prompt-1") is backend
+    assert pool.backend_for("unknown") is None
+
+
+def test_backend_marked_unhealthy_is_skipped_until_next_probe():
+    state = {
+        "a:8188": {"running": 0, "pending": 0, "models": ["m"]},
+        "b:8188": {"running": 3, "pending": 3, "models": ["m"]},
+    }
+    pool = ComfyPool(["http://a:8188", "http://b:8188"], health_ttl=60)
+    with patch("requests.get", side_effect=_fake_backends(state)):
+        a = pool.select("m")
+        assert a.url == "http://a:8188"
+        pool.mark_unhealthy(a, "connection refused")
+        assert pool.select("m").url == "http://b:8188"
+        with pytest.raises(NoBackendAvailable):
+            pool.select("m", exclude=[pool.backends[1]])
+        pool.refresh(force=True)
+        assert pool.select("m").url == "http://a:8188"
+
+
+def test_single_backend_cannot_be_excluded():
+    pool = ComfyPool(["http://only:8188"])
+    with pytest.raises(NoBackendAvailable):
+        pool.select("m", exclude=[pool.primary])
+
+
+def test_submit_fails_over_once_to_another_backend():
+    state = {
+        "a:8188": {"running": 0, "pending": 0, "models": ["m"]},
+        "b:8188": {"running": 1, "pending": 0, "models": ["m"]},
+    }
+    pool = ComfyPool(["http://a:8188", "http://b:8188"], health_ttl=60)
+    connected, disconnected = [], []
+
+    def fake_post(url, **kwargs):
+        if url.startswith("http://a:8188"):
+            raise requests.exceptions.ConnectionError("refused")
+        response = MagicMock()
+        response.json.return_value = {"prompt_id": "p1"}
+        return response
+
+    with patch("requests.get", side_effect=_fake_backends(state)), patch("requests.post", side_effect=fake_post):
+        backend, prompt_id = pool.submit({}, "client", "m", connect=lambda b: connected.append(b.url),
+                                         disconnect=lambda b: disconnected.append(b.url))
+
+    assert (backend.url, prompt_id) == ("http://b:8188", "p1")
+    assert connected == ["http://a:8188", "http://b:8188"]
+    assert disconnected == ["http://a:8188"]
+    assert pool.backends[0].healthy is False
+    assert pool.backend_for("p1") is backend
+
+
+def test_submit_reraises_when_there_is_nothing_to_fail_over_to():
+    pool = ComfyPool(["http://only:8188"])
+    refused = requests.exceptions.ConnectionError("refused")
+    with patch("requests.post", side_effect=refused), pytest.raises(requests.exceptions.ConnectionError) as excinfo:
+        pool.submit({}, "client")
+    assert excinfo.value is refused
+    assert pool.primary.healthy is False
+
+    rejected = requests.exceptions.HTTPError("400 invalid prompt")
+    pool = ComfyPool(["http://only:8188"])
+    with patch("requests.post", side_effect=rejected), pytest.raises(requests.exceptions.HTTPError):
+        pool.submit({}, "client")
+    assert pool.primary.healthy is True
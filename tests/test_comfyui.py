@@ -4,18 +4,33 @@ from unittest.mock import patch, MagicMock, AsyncMock
 import sys
 import os
 import json
+import httpx
 
 # Add the project root to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from main import app
+from comfy_client import ComfyPool
+from disk_cache import DiskCache
 
 client = TestClient(app)
 
-@patch('main.websockets.connect')
-@patch('main.requests.get')
+
+@pytest.fixture(autouse=True)
+def isolated_image_cache(tmp_path):
+    """Give each test an empty generated-image cache."""
+    cache = DiskCache(str(tmp_path / "image_cache"), max_bytes=10 * 1024 * 1024)
+    with patch('main.image_cache', cache):
+        yield cache
+
+
+def _mock_upstream(handler):
+    """Route the shared async HTTP client through an in-process handler."""
+    return patch('http_files.async_client', return_value=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+@patch('main.websockets.connect', new_callable=AsyncMock)
 @patch('main.requests.post')
-def test_generate_image_endpoint(mock_post, mock_get, mock_ws_connect):
+def test_generate_image_endpoint(mock_post, mock_ws_connect):
     """
     Tests the /api/generate-image endpoint.
     It mocks calls to the ComfyUI server (REST and WebSocket) and verifies
@@ -49,31 +64,31 @@ def test_generate_image_endpoint(mock_post, mock_get, mock_ws_connect):
     mock_ws = AsyncMock()
     mock_ws.recv.return_value = final_ws_message # Configure what `await websocket.recv()` returns
 
-    # The context manager for `websockets.connect` must also be an AsyncMock
-    mock_ws_cm = AsyncMock()
-    mock_ws_cm.__aenter__.return_value = mock_ws # This is what `async with` gets
-    mock_ws_connect.return_value = mock_ws_cm
+    mock_ws_connect.return_value = mock_ws # This is what `await websockets.connect()` gives
 
     # 3. Mock the final GET request to /view (to fetch the image)
-    mock_get_response = MagicMock()
-    mock_get_response.status_code = 200
-    mock_get_response.headers = {'Content-Type': 'image/png'}
-    # Simulate some fake image data
-    mock_get_response.iter_content.return_value = [b'fake-image-data']
-    mock_get.return_value = mock_get_response
+    fetched = []
+
+    def view_handler(request):
+        fetched.append(str(request.url))
+        return httpx.Response(200, headers={'Content-Type': 'image/png'}, content=b'fake-image-data')
 
     # --- Act ---
     prompt_text = "A serene landscape"
     model_name = "v1-5-pruned-emaonly.ckpt"
-    response = client.post(
-        "/api/generate-image",
-        data={"prompt": prompt_text, "model": model_name}
-    )
+    with _mock_upstream(view_handler):
+        response = client.post(
+            "/api/generate-image",
+            data={"prompt": prompt_text, "model": model_name}
+        )
 
     # --- Assert ---
     assert response.status_code == 200
     assert response.content == b'fake-image-data'
     assert response.headers['content-type'] == 'image/png'
+    assert response.headers['X-Cache'] == 'miss'
+    assert response.headers['content-length'] == str(len(b'fake-image-data'))
+    assert response.headers['etag'] == f'"{response.headers["X-Image-Key"]}"'
 
     # Assert that 'requests.post' was called correctly
     mock_post.assert_called_once()
@@ -83,12 +98,237 @@ def test_generate_image_endpoint(mock_post, mock_get, mock_ws_connect):
     assert sent_data['prompt']['6']['inputs']['text'] == prompt_text
     assert sent_data['prompt']['4']['inputs']['ckpt_name'] == model_name
 
-    # Assert that the websocket was connected to
+    # Assert that the websocket was connected to, under the client id the prompt was queued with
     mock_ws_connect.assert_called_once()
+    assert mock_ws_connect.call_args.args[0].endswith(f"clientId={sent_data['client_id']}")
 
     # Assert that the final image was fetched
-    mock_get.assert_called_once_with(
-        "http://192.168.0.45:8188/view?filename=ComfyUI_00001_.png&subfolder=&type=output",
-        stream=True
+    assert fetched == ["http://192.168.0.45:8188/view?filename=ComfyUI_00001_.png&subfolder=&type=output"]
+
+
+
+@patch('main.websockets.connect', new_callable=AsyncMock)
+@patch('main.requests.post')
+def test_generate_image_fails_over_to_another_backend(mock_post, mock_ws_connect):
+    """
+    A backend whose websocket refuses the connection is marked unhealthy and
+    the prompt is queued on another backend instead.
+    """
+    pool = ComfyPool(["http://a:8188", "http://b:8188"], health_ttl=60)
+    probe = MagicMock()
+    probe.json.side_effect = [{"queue_running": [], "queue_pending": []}, ["m.ckpt"],
+                              {"queue_running": [[0]], "queue_pending": []}, ["m.ckpt"]]
+    with patch('requests.get', return_value=probe):
+        pool.refresh()
+
+    mock_post.return_value.json.return_value = {"prompt_id": "p1"}
+    mock_ws = AsyncMock()
+    mock_ws.recv.return_value = json.dumps({"type": "executed", "data": {"prompt_id": "p1", "output": {"images": [{"filename": "x.png", "subfolder": "", "type": "output"}]}}})
+
+    async def connect(url):
+        if url.startswith("ws://a:8188"):
+            raise ConnectionRefusedError("refused")
+        return mock_ws
+    mock_ws_connect.side_effect = connect
+
+    fetched = []
+
+    def view_handler(request):
+        fetched.append(request.url.host)
+        return httpx.Response(200, headers={'Content-Type': 'image/png'}, content=b'png')
+
+    with patch('main.comfy_pool', pool), _mock_upstream(view_handler):
+        response = client.post("/api/generate-image", data={"prompt": "A cat", "model": "m.ckpt"})
+
+    assert response.status_code == 200
+    assert pool.backends[0].healthy is False
+    assert mock_post.call_args.args[0] == "http://b:8188/prompt"
+    assert fetched == ["b"]
+
+
+@patch('main.requests.post')
+def test_generate_image_unknown_workflow(mock_post):
+    """
+    Asking for a workflow template that isn't registered is a client error and
+    never reaches ComfyUI.
+    """
+    response = client.post(
+        "/api/generate-image",
+        data={"prompt": "A serene landscape", "model": "v1-5-pruned-emaonly.ckpt", "workflow": "does-not-exist"}
+    )
+
+    assert response.status_code == 400
+    mock_post.assert_not_called()
+
+
+@patch('main.websockets.connect', new_callable=AsyncMock)
+@patch('main.requests.post')
+def test_generate_image_batch_streams_results(mock_post, mock_ws_connect):
+    """
+    A batch queues every prompt before waiting, then streams one NDJSON line per
+    image in the order ComfyUI finishes them.
+    """
+    mock_post.side_effect = [
+        MagicMock(status_code=200, json=lambda: {"prompt_id": "p1"}),
+        MagicMock(status_code=200, json=lambda: {"prompt_id": "p2"}),
+    ]
+
+    def executed(prompt_id, filename):
+        return json.dumps({
+            "type": "executed",
+            "data": {"prompt_id": prompt_id, "output": {"images": [{"filename": filename, "subfolder": "", "type": "output"}]}}
+        })
+
+    mock_ws = AsyncMock()
+    mock_ws.recv.side_effect = [
+        json.dumps({"type": "progress", "data": {"prompt_id": "p1", "value": 1, "max": 20}}),
+        executed("p2", "b.png"),
+        executed("p1", "a.png"),
+    ]
+    mock_ws_connect.return_value = mock_ws
+
+    response = client.post(
+        "/api/generate-image/batch",
+        json={"prompt": "A serene landscape", "seeds": [1, 2], "model": "v1-5-pruned-emaonly.ckpt"}
     )
 
+    assert response.status_code == 200
+    lines = [json.loads(l) for l in response.text.splitlines()]
+    assert [l["index"] for l in lines] == [1, 0]
+    assert lines[0]["seed"] == 2 and lines[0]["status"] == "done"
+    from main import comfy_pool
+    assert lines[0]["image_urls"] == [f"/api/comfyui/view?filename=b.png&subfolder=&type=output&backend={comfy_pool.primary.id}"]
+
+    # Both prompts were queued, with their own seeds
+    assert mock_post.call_count == 2
+    sent_seeds = [json.loads(c.kwargs['data'])['prompt']['3']['inputs']['seed'] for c in mock_post.call_args_list]
+    assert sent_seeds == [1, 2]
+    mock_ws.close.assert_awaited()
+
+    # The batch listens and queues under a client id of its own
+    client_ids = {json.loads(c.kwargs['data'])['client_id'] for c in mock_post.call_args_list}
+    assert len(client_ids) == 1
+    assert mock_ws_connect.call_args.args[0].endswith(f"clientId={client_ids.pop()}")
+
+
+@patch('main.IMAGE_BATCH_IDLE_TIMEOUT', 0.05)
+@patch('main.websockets.connect', new_callable=AsyncMock)
+@patch('main.requests.post')
+def test_generate_image_batch_gives_up_when_comfyui_goes_quiet(mock_post, mock_ws_connect):
+    """
+    Images still pending when ComfyUI has been silent for the idle timeout get error lines.
+    """
+    import asyncio
+
+    mock_post.side_effect = [
+        MagicMock(status_code=200, json=lambda: {"prompt_id": "p1"}),
+        MagicMock(status_code=200, json=lambda: {"prompt_id": "p2"}),
+    ]
+
+    async def silent():
+        await asyncio.sleep(3600)
+
+    mock_ws = AsyncMock()
+    mock_ws.recv.side_effect = silent
+    mock_ws_connect.return_value = mock_ws
+
+    response = client.post(
+        "/api/generate-image/batch",
+        json={"prompt": "A serene landscape", "seeds": [1, 2], "model": "v1-5-pruned-emaonly.ckpt"}
+    )
+
+    lines = [json.loads(l) for l in response.text.splitlines()]
+    assert sorted(l["index"] for l in lines) == [0, 1]
+    assert all(l["status"] == "error" and "Timed out" in l["error"] for l in lines)
+    mock_ws.close.assert_awaited()
+
+
+def test_generate_image_batch_requires_prompt():
+    response = client.post("/api/generate-image/batch", json={"model": "v1-5-pruned-emaonly.ckpt"})
+    assert response.status_code == 400
+
+
+@patch('main.websockets.connect')
+@patch('main.requests.post')
+def test_generate_image_served_from_cache(mock_post, mock_ws_connect, isolated_image_cache):
+    """
+    Once an image has been generated for a resolved workflow, the same request is
+    answered from the local cache without contacting ComfyUI.
+    """
+    from main import workflow_registry
+
+    workflow = workflow_registry.render("default", prompt="A serene landscape", checkpoint="v1-5-pruned-emaonly.ckpt", seed=7)
+    key = DiskCache.key_for(workflow)
+    isolated_image_cache.put(key, b"cached-image", "image/png")
+
+    response = client.post(
+        "/api/generate-image",
+        data={"prompt": "A serene landscape", "model": "v1-5-pruned-emaonly.ckpt", "seed": "7"}
+    )
+
+    assert response.status_code == 200
+    assert response.content == b"cached-image"
+    assert response.headers["X-Cache"] == "hit"
+    assert response.headers["X-Image-Key"] == key
+    mock_post.assert_not_called()
+    mock_ws_connect.assert_not_called()
+
+
+def test_generated_image_supports_range_and_conditional_requests(isolated_image_cache):
+    """
+    Generated images served by key honour Range and If-None-Match.
+    """
+    isolated_image_cache.put("abc123", b"0123456789", "image/png")
+
+    full = client.get("/api/images/abc123")
+    assert full.status_code == 200
+    assert full.headers['etag'] == '"abc123"'
+
+    partial = client.get("/api/images/abc123", headers={"Range": "bytes=2-5"})
+    assert partial.status_code == 206
+    assert partial.content == b"2345"
+
+    not_modified = client.get("/api/images/abc123", headers={"If-None-Match": '"abc123"'})
+    assert not_modified.status_code == 304
+
+    assert client.get("/api/images/unknown").status_code == 404
+
+
+def test_view_proxy_forwards_range_headers():
+    """
+    The ComfyUI view proxy passes Range through and relays the partial response.
+    """
+    seen = {}
+
+    def handler(request):
+        seen['range'] = request.headers.get('range')
+        return httpx.Response(206, headers={'Content-Type': 'image/png', 'Content-Range': 'bytes 0-3/10', 'ETag': '"v1"'}, stream=httpx.ByteStream(b'0123'))
+
+    with _mock_upstream(handler):
+        response = client.get("/api/comfyui/view?filename=a.png", headers={"Range": "bytes=0-3"})
+
+    assert seen['range'] == "bytes=0-3"
+    assert response.status_code == 206
+    assert response.content == b'0123'
+    assert response.headers['content-range'] == 'bytes 0-3/10'
+    assert response.headers['etag'] == '"v1"'
+
+
+def test_view_proxy_needs_to_know_which_backend_made_the_image():
+    """
+    With several backends the image is fetched from the one named in the URL;
+    an image whose backend is unknown is a 404, not another backend's file.
+    """
+    pool = ComfyPool(["http://a:8188", "http://b:8188"])
+    hosts = []
+
+    def handler(request):
+        hosts.append(request.url.host)
+        return httpx.Response(200, headers={'Content-Type': 'image/png'}, stream=httpx.ByteStream(b'png'))
+
+    with patch('main.comfy_pool', pool), _mock_upstream(handler):
+        assert client.get(f"/api/comfyui/view?filename=a.png&backend={pool.backends[1].id}").status_code == 200
+        assert client.get("/api/comfyui/view?filename=a.png&prompt_id=forgotten").status_code == 404
+        assert client.get("/api/comfyui/view?filename=a.png&backend=unknown").status_code == 404
+
+    assert hosts == ["b"]
@@ -0,0 +1,59 @@
+import os
+
+from disk_cache import DiskCache
+
+
+def test_put_and_get_roundtrip(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1024)
+    key = DiskCache.key_for({"prompt": "a cat", "seed": 1})
+
+    assert cache.get(key) is None
+    cache.put(key, b"png-bytes", "image/png")
+
+    entry = cache.get(key)
+    assert entry.content_type == "image/png"
+    with open(entry.path, "rb") as f:
+        assert f.read() == b"png-bytes"
+
+
+def test_key_is_order_independent_for_dicts():
+    assert DiskCache.key_for({"a": 1, "b": 2}) == DiskCache.key_for({"b": 2, "a": 1})
+    assert DiskCache.key_for("ab", "c") != DiskCache.key_for("a", "bc")
+
+
+def test_lru_eviction_by_size(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10)
+    cache.put("a", b"1234", "x")
+    cache.put("b", b"1234", "x")
+    # touch "a" so "b" becomes least recently used
+    assert cache.get("a")
+    cache.put("c", b"1234", "x")
+
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert not os.path.exists(cache.path_for("b"))
+    assert cache.total_bytes == 8
+
+
+def test_tee_commits_only_when_exhausted(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1024)
+
+    assert b"".join(cache.tee("k", iter([b"ab", b"cd"]), "image/png")) == b"abcd"
+    assert cache.get("k").size == 4
+
+    partial = cache.tee("p", iter([b"ab", b"cd"]), "image/png")
+    next(partial)
+    partial.close()
+    assert cache.get("p") is None
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+
+
+def test_index_survives_restart(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1024)
+    cache.put("k", b"data", "audio/mpeg", meta={"etag": "abc"})
+
+    reopened = DiskCache(str(tmp_path), max_bytes=1024)
+    entry = reopened.get("k")
+    assert entry.content_type == "audio/mpeg"
+    assert entry.meta == {"etag": "abc"}
+    assert reopened.total_bytes == 4
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+
+from event_stream import EventLog, sse_events
+
+
+def test_async_reader_is_woken_by_a_writer_thread():
+    log = EventLog()
+
+    async def read():
+        threading.Timer(0.05, log.append, args=('status', {'n': 1})).start()
+        started = time.monotonic()
+        events, closed = await log.wait_async(0, timeout=5)
+        return events, closed, time.monotonic() - started
+
+    events, closed, waited = asyncio.run(read())
+    assert events == [('status', {'n': 1})]
+    assert not closed
+    assert waited < 1
+    assert not log.waiters
+
+
+def test_idle_subscribers_do_not_hold_worker_threads():
+    logs = [EventLog() for _ in range(64)]
+
+    async def run():
+        streams = [sse_events(log, keepalive=30) for log in logs]
+        readers = [asyncio.ensure_future(stream.__anext__()) for stream in streams]
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        await asyncio.wait_for(asyncio.to_thread(lambda: None), timeout=2)
+        unrelated = time.monotonic() - started
+        for log in logs:
+            log.append('status', {})
+        frames = await asyncio.gather(*readers)
+        return unrelated, frames
+
+    unrelated, frames = asyncio.run(run())
+    assert unrelated < 1
+    assert all(frame.startswith('event: status') for frame in frames)
+
+
+def test_stream_ends_when_log_is_closed():
+    log = EventLog()
+    log.append('done', {'ok': True})
+    log.close()
+
+    async def collect():
+        return [frame async for frame in sse_events(log)]
+
+    assert asyncio.run(collect()) == ['event: done\ndata: {"ok": true}\n\n']
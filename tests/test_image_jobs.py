@@ -0,0 +1,145 @@
+import json
+from unittest.mock import patch, MagicMock
+
+from fastapi.testclient import TestClient
+
+from comfy_client import ComfyPool
+from disk_cache import DiskCache
+from image_jobs import ImageJobQueue
+from main import app
+
+client = TestClient(app)
+
+
+def _fake_ws(messages):
+    ws = MagicMock()
+    ws.recv.side_effect = [json.dumps(m) for m in messages]
+    cm = MagicMock()
+    cm.__enter__.return_value = ws
+    return cm
+
+
+def test_job_relays_progress_and_persists_result(tmp_path, wait_for):
+    cache = DiskCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    queue = ImageJobQueue(str(tmp_path / "jobs"), ComfyPool(["http://comfy:8188"]), cache)
+    messages = [
+        {"type": "execution_start", "data": {"prompt_id": "p1"}},
+        {"type": "progress", "data": {"prompt_id": "p1", "value": 1, "max": 2, "node": "3"}},
+        {"type": "progress", "data": {"prompt_id": "p1", "value": 2, "max": 2, "node": "3"}},
+        {"type": "executed", "data": {"prompt_id": "p1", "node": "9", "output": {"images": [{"filename": "a.png", "subfolder": "", "type": "output"}]}}},
+    ]
+    image_response = MagicMock(headers={"Content-Type": "image/png"})
+    image_response.iter_content.return_value = [b"png-", b"bytes"]
+
+    with patch('image_jobs.ws_connect', return_value=_fake_ws(messages)), \
+            patch('requests.post') as mock_post, \
+            patch('requests.get', return_value=image_response):
+        mock_post.return_value.json.return_value = {"prompt_id": "p1"}
+        job = queue.submit({"3": {"inputs": {}}}, "key-1", params={"prompt": "a cat"})
+        assert wait_for(lambda: job.finished)
+        assert job.status == 'done'
+
+    events = [name for name, _ in job.events.events]
+    assert events == ['status', 'status', 'progress', 'progress', 'executed', 'done']
+    assert job.progress == {"value": 2, "max": 2}
+    # the result is the cache entry itself, not a copy
+    with open(queue.result(job).path, "rb") as f:
+        assert f.read() == b"png-bytes"
+    assert queue.result(job).path == cache.get("key-1").path
+    assert sorted(p.name for p in (tmp_path / "jobs").iterdir()) == ["jobs.json"]
+
+    # a restarted queue still knows the finished job and its result
+    reloaded = ImageJobQueue(str(tmp_path / "jobs"), ComfyPool(["http://comfy:8188"]), cache)
+    assert reloaded.get(job.id).status == 'done'
+    assert reloaded.result(reloaded.get(job.id)).path == cache.get("key-1").path
+
+
+def test_finished_jobs_are_pruned_after_retention(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    cache.put("key-old", b"old", "image/png")
+    cache.put("key-new", b"new", "image/png")
+    queue = ImageJobQueue(str(tmp_path / "jobs"), ComfyPool(["http://comfy:8188"]), cache, retain=60)
+
+    old = queue.submit({}, "key-old")
+    old.updated_at -= 120
+    new = queue.submit({}, "key-new")
+
+    assert queue.get(old.id) is None
+    assert queue.get(new.id) is new
+    with open(tmp_path / "jobs" / "jobs.json", encoding="utf-8") as f:
+        assert list(json.load(f)) == [new.id]
+
+
+def test_job_fails_on_execution_error(tmp_path, wait_for):
+    cache = DiskCache(str(tmp_path / "cache"), max_bytes=1024)
+    queue = ImageJobQueue(str(tmp_path / "jobs"), ComfyPool(["http://comfy:8188"]), cache)
+    messages = [{"type": "execution_error", "data": {"prompt_id": "p1", "exception_message": "CUDA out of memory"}}]
+
+    with patch('image_jobs.ws_connect', return_value=_fake_ws(messages)), patch('requests.post') as mock_post:
+        mock_post.return_value.json.return_value = {"prompt_id": "p1"}
+        job = queue.submit({}, "key-2")
+        assert wait_for(lambda: job.finished)
+        assert job.status == 'failed'
+
+    assert "CUDA out of memory" in job.error
+    assert job.events.closed
+
+
+def test_job_fails_over_when_backend_is_unreachable(tmp_path, wait_for):
+    cache = DiskCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    pool = ComfyPool(["http://a:8188", "http://b:8188"], health_ttl=60)
+    probe = MagicMock()
+    probe.json.side_effect = [{"queue_running": [], "queue_pending": []}, ["m"],
+                              {"queue_running": [[0]], "queue_pending": []}, ["m"]]
+    with patch('requests.get', return_value=probe):
+        pool.refresh()
+    messages = [{"type": "executed", "data": {"prompt_id": "p1", "node": "9", "output": {"images": [{"filename": "a.png", "subfolder": "", "type": "output"}]}}}]
+    image_response = MagicMock(headers={"Content-Type": "image/png"})
+    image_response.iter_content.return_value = [b"png"]
+
+    def connect(url):
+        if url.startswith("ws://a:8188"):
+            raise ConnectionRefusedError("refused")
+        return _fake_ws(messages)
+
+    with patch('image_jobs.ws_connect', side_effect=connect), \
+            patch('requests.post') as mock_post, \
+            patch('requests.get', return_value=image_response):
+        mock_post.return_value.json.return_value = {"prompt_id": "p1"}
+        queue = ImageJobQueue(str(tmp_path / "jobs"), pool, cache)
+        job = queue.submit({}, "key-3", params={"checkpoint": "m"})
+        assert wait_for(lambda: job.finished)
+        assert job.status == 'done'
+
+    assert job.backend == "http://b:8188"
+    assert pool.backends[0].healthy is False
+    assert pool.backend_for("p1") is pool.backends[1]
+
+
+def test_image_job_api_cached_result(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    queue = ImageJobQueue(str(tmp_path / "jobs"), ComfyPool(["http://comfy:8188"]), cache)
+
+    from main import workflow_registry
+    workflow = workflow_registry.render("default", prompt="A cat", checkpoint="model.ckpt", seed=3)
+    cache.put(DiskCache.key_for(workflow), b"cached-image", "image/png")
+
+    with patch('main.image_job_queue', queue):
+        resp = client.post("/api/image-jobs", data={"prompt": "A cat", "model": "model.ckpt", "seed": "3"})
+        assert resp.status_code == 200
+        job_id = resp.json()["job_id"]
+        assert resp.json()["status"] == "done"
+
+        events = client.get(f"/api/image-jobs/{job_id}/events")
+        assert events.status_code == 200
+        assert "event: done" in events.text
+
+        result = client.get(f"/api/image-jobs/{job_id}/result")
+        assert result.status_code == 200
+        assert result.content == b"cached-image"
+
+        # an image evicted from the cache is gone for good
+        cache.delete(DiskCache.key_for(workflow))
+        assert client.get(f"/api/image-jobs/{job_id}/result").status_code == 410
+
+        assert client.get("/api/image-jobs/missing").status_code == 404
@@ -0,0 +1,41 @@
+from lip_sync_jobs import LipSyncPipeline
+
+
+def test_runs_stages_in_order_and_reports_video_id(wait_for):
+    calls = []
+    pipeline = LipSyncPipeline(
+        synthesize=lambda text, voice, model: calls.append(('tts', text, voice)) or "/tmp/speech.mp3",
+        upload_media=lambda path: calls.append(('upload', path)) or 77,
+        start_lip_sync=lambda video_id, media_id: calls.append(('lip_sync', video_id, media_id)) or 9001,
+    )
+
+    job = pipeline.submit(123, "Hello there", "voice-1")
+    assert wait_for(lambda: job.finished)
+    assert job.status == 'done'
+
+    assert calls == [('tts', "Hello there", "voice-1"), ('upload', "/tmp/speech.mp3"), ('lip_sync', 123, 77)]
+    assert job.media_id == 77 and job.video_id == 9001
+    events, closed = job.events.wait(0, timeout=1)
+    assert closed
+    assert [e for e, _ in events] == ['stage', 'stage', 'stage', 'done']
+    assert [d['stage'] for e, d in events if e == 'stage'] == ['synthesizing', 'uploading', 'lip_sync']
+    assert events[-1][1]['video_id'] == 9001
+    assert pipeline.get(job.id).to_dict()['status'] == 'done'
+
+
+def test_failure_reports_the_stage_and_stops(wait_for):
+    def upload(path):
+        raise RuntimeError("PixVerse is down")
+
+    started = []
+    pipeline = LipSyncPipeline(lambda *a: "/tmp/speech.mp3", upload, lambda *a: started.append(a))
+
+    job = pipeline.submit(123, "Hello", "voice-1")
+    assert wait_for(lambda: job.finished)
+    assert job.status == 'failed'
+
+    assert started == []
+    assert job.error == "PixVerse is down"
+    events, closed = job.events.wait(0, timeout=1)
+    assert closed
+    assert events[-1] == ('failed', {"job_id": job.id, "stage": "uploading", "error": "PixVerse is down"})
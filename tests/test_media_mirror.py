@@ -0,0 +1,59 @@
+import threading
+import time
+from unittest.mock import patch, MagicMock
+
+from disk_cache import DiskCache
+from media_mirror import MediaMirror
+
+
+def _response(chunks, release=None):
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.headers = {"Content-Type": "video/mp4"}
+
+    def iter_content(size):
+        if release:
+            release.wait(5)
+        return iter(chunks)
+    response.iter_content.side_effect = iter_content
+    return response
+
+
+def test_downloads_once_into_cache(tmp_path, wait_for):
+    mirror = MediaMirror(DiskCache(str(tmp_path / "videos"), max_bytes=1024 * 1024))
+    release = threading.Event()
+
+    with patch('media_mirror.requests.get', return_value=_response([b"mp4-", b"data"], release)) as mock_get:
+        assert mirror.enqueue("k1", "https://example.com/v.mp4") is True
+        # a second request while the first download is running is ignored
+        assert mirror.enqueue("k1", "https://example.com/v.mp4") is False
+        assert mirror.get("k1") is None
+        release.set()
+        assert wait_for(lambda: mirror.get("k1") is not None)
+        assert mirror.enqueue("k1", "https://example.com/v.mp4") is False
+
+    mock_get.assert_called_once_with("https://example.com/v.mp4", stream=True, timeout=60.0)
+    entry = mirror.get("k1")
+    assert entry.content_type == "video/mp4"
+    assert entry.meta == {"url": "https://example.com/v.mp4"}
+    with open(entry.path, "rb") as f:
+        assert f.read() == b"mp4-data"
+
+
+def test_failed_download_is_retried_after_backoff(tmp_path, wait_for, caplog):
+    mirror = MediaMirror(DiskCache(str(tmp_path / "videos"), max_bytes=1024 * 1024), backoff=0.2)
+
+    with patch('media_mirror.requests.get', side_effect=ConnectionError("403 Forbidden")) as mock_get:
+        mirror.enqueue("k2", "https://example.com/v.mp4")
+        assert wait_for(lambda: not mirror.pending)
+        # a failing URL isn't fetched again on every request
+        assert mirror.enqueue("k2", "https://example.com/v.mp4") is False
+        assert mock_get.call_count == 1
+    assert mirror.get("k2") is None
+    assert "403 Forbidden" in caplog.text
+
+    assert wait_for(lambda: mirror.failures["k2"][0] <= time.monotonic())
+    with patch('media_mirror.requests.get', return_value=_response([b"ok"])):
+        assert mirror.enqueue("k2", "https://example.com/v.mp4") is True
+        assert wait_for(lambda: mirror.get("k2") is not None)
+    assert wait_for(lambda: "k2" not in mirror.failures)
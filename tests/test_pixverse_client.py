@@ -0,0 +1,96 @@
+import asyncio
+
+import httpx
+import pytest
+
+from pixverse_client import PixverseClient, PixverseError, PixverseUnavailable, TokenBucket
+
+
+def _client(*responses, **kwargs):
+    """Client whose transport answers with `responses` in order (a callable
+    response is called with the request); returns (client, sent requests)."""
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        response = responses[min(len(sent), len(responses)) - 1]
+        return response(request) if callable(response) else response
+
+    kwargs.setdefault("rate", 1000)
+    kwargs.setdefault("burst", 1000)
+    kwargs.setdefault("backoff", 0.0)
+    return PixverseClient("key", transport=httpx.MockTransport(handler), **kwargs), sent
+
+
+def _ok(resp):
+    return httpx.Response(200, json={"ErrCode": 0, "ErrMsg": "success", "Resp": resp})
+
+
+def test_get_is_retried_on_server_errors_with_one_trace_id():
+    client, sent = _client(httpx.Response(502), httpx.Response(503), _ok({"status": 5}))
+
+    assert client.request_sync("video_status", "GET", "/video/result/1") == {"status": 5}
+    assert len(sent) == 3
+    assert len({r.headers["Ai-trace-id"] for r in sent}) == 1
+    assert sent[0].headers["API-KEY"] == "key"
+    assert client.metrics()["video_status"]["retries"] == 2
+    assert client.metrics()["video_status"]["errors"] == 0
+
+
+def test_post_is_not_retried_after_server_error():
+    client, sent = _client(httpx.Response(500), _ok({"video_id": 1}))
+
+    with pytest.raises(PixverseUnavailable) as excinfo:
+        asyncio.run(client.request("text_to_video", "POST", "/video/text/generate", json={"prompt": "x"}))
+    assert excinfo.value.status_code == 500
+    assert len(sent) == 1
+    assert client.metrics()["text_to_video"]["errors"] == 1
+
+
+def test_post_is_retried_when_rate_limited_or_never_sent():
+    def refuse(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    client, sent = _client(httpx.Response(429, headers={"Retry-After": "0"}), refuse, _ok({"video_id": 7}))
+
+    resp = asyncio.run(client.request("text_to_video", "POST", "/video/text/generate", json={"prompt": "x"}))
+    assert resp == {"video_id": 7}
+    assert len(sent) == 3
+
+
+def test_retries_are_bounded():
+    client, sent = _client(httpx.Response(503), max_retries=2)
+
+    with pytest.raises(PixverseUnavailable):
+        client.request_sync("credits", "GET", "/account/balance")
+    assert len(sent) == 3
+
+
+def test_error_code_raises_without_retry():
+    client, sent = _client(httpx.Response(200, json={"ErrCode": 400017, "ErrMsg": "Invalid parameters", "Resp": {}}))
+
+    with pytest.raises(PixverseError) as excinfo:
+        client.request_sync("credits", "GET", "/account/balance")
+    assert str(excinfo.value) == "Invalid parameters"
+    assert excinfo.value.code == 400017
+    assert len(sent) == 1
+
+
+def test_token_bucket_spaces_out_calls_beyond_burst():
+    bucket = TokenBucket(rate=10, burst=2)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+def test_metrics_report_latency_per_operation():
+    client, _ = _client(_ok({"credit_monthly": 1}))
+    for _ in range(3):
+        client.request_sync("credits", "GET", "/account/balance")
+
+    stats = client.metrics()["credits"]
+    assert stats["calls"] == 3
+    assert stats["errors"] == 0
+    assert stats["p50_ms"] is not None and stats["max_ms"] >= stats["p50_ms"]
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from pixverse_credits import CreditLedger, InsufficientCredits, estimate_cost
+
+
+def test_balance_is_cached_within_ttl():
+    calls = []
+    ledger = CreditLedger(lambda: calls.append(1) or {"credit_monthly": 100, "credit_package": 5}, ttl=60)
+
+    assert ledger.balance()["credit_monthly"] == 100
+    assert ledger.balance()["credit_package"] == 5
+    assert len(calls) == 1
+    ledger.balance(refresh=True)
+    assert len(calls) == 2
+
+
+def test_reserve_settle_and_release():
+    ledger = CreditLedger(lambda: {"credit_monthly": 50, "credit_package": 100}, reconcile_delay=3600)
+
+    ledger.reserve(45)
+    ledger.settle(45, 60)  # PixVerse charged more than estimated; monthly runs out first
+    assert (ledger.resp["credit_monthly"], ledger.resp["credit_package"]) == (0, 90)
+
+    ledger.reserve(90)
+    ledger.release(90)
+    assert ledger.resp["credit_monthly"] + ledger.resp["credit_package"] == 90
+
+    with pytest.raises(InsufficientCredits) as excinfo:
+        ledger.reserve(120)
+    assert (excinfo.value.needed, excinfo.value.available) == (120, 90)
+
+
+def test_refetch_keeps_reservations_in_flight():
+    ledger = CreditLedger(lambda: {"credit_monthly": 100, "credit_package": 0}, ttl=0, reconcile_delay=3600)
+
+    ledger.reserve(45)
+    ledger.reserve(45)
+    # PixVerse hasn't charged either submission yet, so the fresh balance is still 100
+    with pytest.raises(InsufficientCredits) as excinfo:
+        ledger.reserve(45)
+    assert excinfo.value.available == 10
+
+    ledger.release(45)
+    ledger.settle(45, 45)
+    assert ledger.reserved == 0
+    assert ledger.resp["credit_monthly"] == 55
+
+
+def test_concurrent_balance_checks_share_one_fetch():
+    calls = []
+    started = threading.Event()
+    proceed = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        proceed.wait(2)
+        return {"credit_monthly": 100}
+
+    ledger = CreditLedger(fetch)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ledger.balance()["credit_monthly"])) for _ in range(8)]
+    threads[0].start()
+    started.wait(2)
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.05)
+    proceed.set()
+    for t in threads:
+        t.join(2)
+
+    assert results == [100] * 8
+    assert len(calls) == 1
+
+
+def test_unknown_cost_or_balance_is_let_through():
+    def unreachable():
+        raise RuntimeError("down")
+
+    ledger = CreditLedger(unreachable)
+    ledger.reserve(45)
+    ledger.reserve(None)
+
+
+def test_settle_reconciles_once_in_background():
+    balances = iter([{"credit_monthly": 100}, {"credit_monthly": 70}])
+    ledger = CreditLedger(lambda: next(balances), reconcile_delay=0.05)
+    ledger.reserve(45)
+    ledger.settle(45, None)
+    ledger.settle(None, None)
+
+    deadline = time.time() + 2
+    while ledger.resp["credit_monthly"] != 70 and time.time() < deadline:
+        time.sleep(0.01)
+    assert ledger.balance()["credit_monthly"] == 70
+
+
+def test_estimate_cost():
+    assert estimate_cost({"quality": "540p", "duration": 5}) == 45
+    assert estimate_cost({"quality": "720p", "duration": 8}) == 120
+    assert estimate_cost({"source_video_id": 1}) is None
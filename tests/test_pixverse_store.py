@@ -0,0 +1,66 @@
+from pixverse_store import PixverseJobStore, state_for
+
+
+def test_records_jobs_and_status_updates(tmp_path):
+    store = PixverseJobStore(str(tmp_path / "pixverse.sqlite3"))
+    store.add(101, "text", {"prompt": "a cat"})
+    store.add(102, "image", {"prompt": "a dog", "img_id": 7})
+
+    store.update(101, {"id": 101, "status": 5})
+    store.update(101, {"id": 101, "status": 1, "url": "https://example.com/101.mp4"})
+
+    job = store.get("101")
+    assert job["kind"] == "text"
+    assert job["params"] == {"prompt": "a cat"}
+    assert job["state"] == "completed"
+    assert job["url"] == "https://example.com/101.mp4"
+    assert job["result"]["status"] == 1
+    assert store.get(102)["state"] == "pending"
+    assert store.get(999) is None
+
+
+def test_list_filters_and_survives_reopen(tmp_path):
+    path = str(tmp_path / "pixverse.sqlite3")
+    store = PixverseJobStore(path)
+    for video_id, kind in [(1, "text"), (2, "image"), (3, "text"), (4, "lip_sync")]:
+        store.add(video_id, kind, {"n": video_id})
+    store.update(1, {"status": 8})
+    store.update(2, {"status": 5})
+
+    reopened = PixverseJobStore(path)
+    assert [j["video_id"] for j in reopened.list()] == ["4", "3", "2", "1"]
+    assert [j["video_id"] for j in reopened.list(kind="text")] == ["3", "1"]
+    assert [j["video_id"] for j in reopened.list(state="failed")] == ["1"]
+    assert [j["video_id"] for j in reopened.list(limit=2, offset=1)] == ["3", "2"]
+    assert reopened.active_ids() == ["2", "3", "4"]
+
+
+
+def test_unknown_jobs_are_no_longer_active(tmp_path):
+    store = PixverseJobStore(str(tmp_path / "pixverse.sqlite3"))
+    store.add(1, "text", {})
+    store.add(2, "text", {})
+
+    store.mark_unknown(1)
+
+    assert store.get(1)["state"] == "unknown"
+    assert store.active_ids() == ["2"]
+
+def test_state_for_status_codes():
+    assert [state_for(s) for s in (None, 5, 1, 6, 7, 8)] == ["pending", "generating", "completed", "deleted", "failed", "failed"]
+
+
+def test_upload_cache_expires_entries(tmp_path):
+    from pixverse_store import PixverseUploadCache
+
+    uploads = PixverseUploadCache(str(tmp_path / "pixverse.sqlite3"), ttl=3600)
+    uploads.put("image", "abc", {"img_id": 1})
+    assert uploads.get("image", "abc") == {"img_id": 1}
+    assert uploads.get("media", "abc") is None
+
+    uploads.ttl = -1
+    uploads.put("media", "def", {"media_id": 2})
+    assert uploads.get("media", "def") is None
+
+    uploads.delete("image", "abc")
+    assert uploads.get("image", "abc") is None
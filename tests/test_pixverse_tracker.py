@@ -0,0 +1,108 @@
+import threading
+import time
+
+from pixverse_tracker import PixverseTracker
+
+
+def test_polls_once_per_video_and_publishes_transitions(wait_for):
+    calls = []
+    statuses = iter([{"status": 5}, {"status": 5}, {"status": 1, "url": "https://example.com/v.mp4"}])
+    lock = threading.Lock()
+
+    def fetch(video_id):
+        with lock:
+            calls.append(video_id)
+            return next(statuses)
+
+    tracker = PixverseTracker(fetch, min_interval=0.01, max_interval=0.05)
+    # many watchers of the same video share one tracked entry
+    videos = {id(tracker.track(42)) for _ in range(10)}
+    assert len(videos) == 1
+
+    video = tracker.get("42")
+    assert wait_for(lambda: video.finished)
+    assert calls == ["42", "42", "42"]
+    assert [data for _, data in video.events.events] == [{"status": 5}, {"status": 1, "url": "https://example.com/v.mp4"}]
+    assert video.events.closed
+    assert tracker.active() == 0
+
+
+def test_backs_off_while_unchanged_and_on_errors(wait_for):
+    attempts = []
+
+    def fetch(video_id):
+        attempts.append(time.time())
+        if len(attempts) == 2:
+            raise ConnectionError("upstream down")
+        return {"status": 5}
+
+    tracker = PixverseTracker(fetch, min_interval=0.02, max_interval=0.08, backoff=2.0)
+    video = tracker.track("7")
+    assert wait_for(lambda: len(attempts) >= 5)
+
+    gaps = [b - a for a, b in zip(attempts, attempts[1:])]
+    assert gaps[-1] >= 0.07
+    assert video.resp == {"status": 5}
+    assert len(video.events.events) == 1
+
+
+def test_seeded_status_is_published_without_polling():
+    calls = []
+    tracker = PixverseTracker(lambda video_id: calls.append(video_id), min_interval=10)
+
+    video = tracker.track("9", {"status": 8})
+
+    assert video.finished and video.events.closed
+    assert video.events.events == [("status", {"status": 8})]
+    time.sleep(0.05)
+    assert calls == []
+
+
+def test_gives_up_after_consecutive_errors(wait_for):
+    abandoned = []
+
+    def fetch(video_id):
+        raise ConnectionError("no such video")
+
+    tracker = PixverseTracker(fetch, min_interval=0.01, max_interval=0.01, max_errors=3, on_abandon=abandoned.append)
+    video = tracker.track("404")
+
+    assert wait_for(lambda: video.events.closed)
+    assert video.finished and video.abandoned
+    assert video.errors == 3
+    assert video.events.events[-1][0] == 'abandoned'
+    assert abandoned == [video]
+    assert tracker.active() == 0
+
+
+def test_gives_up_on_videos_that_never_finish(wait_for):
+    tracker = PixverseTracker(lambda video_id: {"status": 5}, min_interval=0.01, max_interval=0.01, max_age=0.05)
+    video = tracker.track("slow")
+
+    assert wait_for(lambda: video.abandoned)
+    assert "not finished" in video.error
+
+
+def test_callbacks_run_without_holding_the_tracker_lock(wait_for):
+    unblocked = []
+
+    def lock_is_free(video):
+        # get() from another thread only returns if the callback isn't run under the lock
+        seen = []
+        reader = threading.Thread(target=lambda: seen.append(tracker.get(video.video_id)))
+        reader.start()
+        reader.join(1.0)
+        unblocked.append(seen == [video])
+
+    statuses = iter([{"status": 5}])
+
+    def fetch(video_id):
+        return next(statuses)
+
+    tracker = PixverseTracker(fetch, min_interval=0.01, max_interval=0.01, max_errors=1,
+                              on_status=lock_is_free, on_abandon=lock_is_free)
+    video = tracker.track("1")
+
+    assert wait_for(lambda: video.abandoned)
+    assert wait_for(lambda: len(unblocked) == 2)
+    assert unblocked == [True, True]
@@ -0,0 +1,87 @@
+import asyncio
+
+import httpx
+import pytest
+
+from disk_cache import DiskCache
+from remote_images import RemoteImageError, RemoteImageFetcher, RemoteImageTooLarge, sniff_image_type
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+
+def _fetcher(tmp_path, handler, **kwargs):
+    """Fetcher whose transport calls `handler`; returns (fetcher, sent requests)."""
+    sent = []
+
+    def record(request):
+        sent.append(request)
+        return handler(request)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(record))
+    cache = DiskCache(str(tmp_path / "remote"), max_bytes=1024 * 1024)
+    return RemoteImageFetcher(cache, client=lambda: client, **kwargs), sent
+
+
+def test_sniff_image_type():
+    assert sniff_image_type(PNG[:12]) == 'image/png'
+    assert sniff_image_type(b'\xff\xd8\xff\xe0\x00\x10JFIF\x00') == 'image/jpeg'
+    assert sniff_image_type(b'RIFF\x00\x00\x00\x00WEBP') == 'image/webp'
+    assert sniff_image_type(b'<!DOCTYPE ht') is None
+
+
+def test_cached_image_is_reused_while_fresh(tmp_path):
+    fetcher, sent = _fetcher(tmp_path, lambda request: httpx.Response(200, content=PNG))
+
+    assert asyncio.run(fetcher.fetch("https://example.com/a.png")) == PNG
+    assert asyncio.run(fetcher.fetch("https://example.com/a.png")) == PNG
+    assert len(sent) == 1
+
+
+def test_stale_image_is_revalidated_with_its_validators(tmp_path):
+    def handler(request):
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=PNG, headers={"ETag": '"v1"', "Last-Modified": "Mon, 19 Oct 2026 10:00:00 GMT"})
+
+    fetcher, sent = _fetcher(tmp_path, handler, fresh_for=0)
+
+    assert asyncio.run(fetcher.fetch("https://example.com/a.png")) == PNG
+    assert asyncio.run(fetcher.fetch("https://example.com/a.png")) == PNG
+    assert len(sent) == 2
+    assert sent[1].headers["if-none-match"] == '"v1"'
+    assert sent[1].headers["if-modified-since"] == "Mon, 19 Oct 2026 10:00:00 GMT"
+
+
+def test_oversized_body_is_abandoned_while_streaming(tmp_path):
+    class EndlessStream(httpx.AsyncByteStream):
+        chunks = 0
+
+        async def __aiter__(self):
+            yield PNG
+            while True:
+                EndlessStream.chunks += 1
+                yield b'\x00' * 1024
+
+    fetcher, _ = _fetcher(tmp_path, lambda request: httpx.Response(200, stream=EndlessStream()), max_bytes=4096)
+
+    with pytest.raises(RemoteImageTooLarge):
+        asyncio.run(fetcher.fetch("https://example.com/huge.png"))
+    assert EndlessStream.chunks <= 4
+    assert fetcher.cache.total_bytes == 0
+
+
+def test_declared_length_over_limit_is_rejected(tmp_path):
+    fetcher, _ = _fetcher(tmp_path, lambda request: httpx.Response(200, content=PNG * 100), max_bytes=1024)
+
+    with pytest.raises(RemoteImageTooLarge):
+        asyncio.run(fetcher.fetch("https://example.com/big.png"))
+
+
+def test_non_image_and_non_http_urls_are_rejected(tmp_path):
+    fetcher, sent = _fetcher(tmp_path, lambda request: httpx.Response(200, text="<html></html>"))
+
+    with pytest.raises(RemoteImageError):
+        asyncio.run(fetcher.fetch("https://example.com/page"))
+    with pytest.raises(RemoteImageError):
+        asyncio.run(fetcher.fetch("file:///etc/passwd"))
+    assert len(sent) == 1
@@ -0,0 +1,163 @@
+import json
+import os
+
+from thread_store import ThreadStore
+
+
+def test_messages_are_appended_to_the_log_not_the_snapshot(tmp_path):
+    path = str(tmp_path / "threads.json")
+    store = ThreadStore(path)
+    tid = store.create_thread("t")["id"]
+    snapshot_mtime = os.stat(path).st_mtime_ns
+
+    store.add_message(tid, "user", "hello")
+    store.add_message(tid, "ai", "hi")
+
+    assert os.stat(path).st_mtime_ns == snapshot_mtime
+    with open(path + ".log", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["op"] for r in records] == ["create_thread", "add_message", "add_message"]
+    assert [m["text"] for m in store.get_thread(tid)["messages"]] == ["hello", "hi"]
+
+
+def test_state_survives_reopening(tmp_path):
+    path = str(tmp_path / "threads.json")
+    store = ThreadStore(path)
+    keep = store.create_thread("keep")["id"]
+    gone = store.create_thread("gone")["id"]
+    store.add_message(keep, "user", "hello")
+    store.delete_thread(gone)
+
+    reopened = ThreadStore(path)
+
+    assert [t["id"] for t in reopened.list_threads()] == [keep]
+    assert reopened.get_thread(keep)["messages"][0]["text"] == "hello"
+    # replaying folds the log into the snapshot
+    assert os.path.getsize(path + ".log") == 0
+
+
+def test_log_is_compacted_periodically(tmp_path):
+    path = str(tmp_path / "threads.json")
+    store = ThreadStore(path, compact_every=3)
+    tid = store.create_thread("t")["id"]
+    store.add_message(tid, "user", "1")
+    store.add_message(tid, "user", "2")
+
+    assert os.path.getsize(path + ".log") == 0
+    with open(path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert snapshot["seq"] == 3
+    assert len(snapshot["threads"][tid]["messages"]) == 2
+
+
+def test_records_already_in_the_snapshot_are_not_replayed(tmp_path):
+    path = str(tmp_path / "threads.json")
+    store = ThreadStore(path)
+    tid = store.create_thread("t")["id"]
+    store.add_message(tid, "user", "once")
+    with open(path + ".log", encoding="utf-8") as f:
+        log = f.read()
+    store.compact()
+    # as if compaction was interrupted after the rename, before the log was truncated
+    with open(path + ".log", "w", encoding="utf-8") as f:
+        f.write(log + '{"op": "add_message", "thread_id"')
+
+    reopened = ThreadStore(path)
+
+    assert [m["text"] for m in reopened.get_thread(tid)["messages"]] == ["once"]
+
+
+def test_legacy_snapshot_is_loaded(tmp_path):
+    path = str(tmp_path / "threads.json")
+    thread = {"id": "t1", "name": "old", "created_at": "2024-01-01T00:00:00", "modified_at": "2024-01-01T00:00:00", "messages": []}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"threads": {"t1": thread}}, f, indent=2)
+
+    store = ThreadStore(path)
+    store.add_message("t1", "user", "still works")
+
+    assert ThreadStore(path).get_thread("t1")["messages"][0]["text"] == "still works"
+
+
+def test_returned_threads_are_copies(tmp_path):
+    store = ThreadStore(str(tmp_path / "threads.json"))
+    tid = store.create_thread("t")["id"]
+
+    store.get_thread(tid)["messages"].append({"id": "x"})
+
+    assert store.get_thread(tid)["messages"] == []
+
+
+def test_sqlite_store_round_trip(tmp_path):
+    from thread_store import SqliteThreadStore
+    path = str(tmp_path / "threads.sqlite3")
+    store = SqliteThreadStore(path)
+    tid = store.create_thread("t")["id"]
+    first = store.add_message(tid, "user", "hello")
+    store.add_message(tid, "ai", "hi", type_="image", extra={"file_path": "/tmp/x.png"})
+
+    thread = SqliteThreadStore(path).get_thread(tid)
+
+    assert thread["name"] == "t"
+    assert thread["modified_at"] > thread["created_at"]
+    assert [(m["role"], m["text"]) for m in thread["messages"]] == [("user", "hello"), ("ai", "hi")]
+    assert thread["messages"][1]["extra"] == {"file_path": "/tmp/x.png"}
+    assert [m["text"] for m in store.messages_after(tid, after=first["created_at"])] == ["hi"]
+    assert store.delete_thread(tid) is True
+    assert store.get_thread(tid) is None and store.delete_thread(tid) is False
+
+
+def test_sqlite_store_lists_recently_modified_threads_first(tmp_path):
+    from thread_store import SqliteThreadStore
+    store = SqliteThreadStore(str(tmp_path / "threads.sqlite3"))
+    older = store.create_thread("older")["id"]
+    newer = store.create_thread("newer")["id"]
+    store.add_message(older, "user", "bump")
+
+    recent = store.recent_threads(limit=1)
+
+    assert recent == [{**recent[0], "id": older, "name": "older", "message_count": 1}]
+    assert "messages" not in recent[0]
+    assert [t["id"] for t in store.recent_threads(limit=1, offset=1)] == [newer]
+
+
+def test_sqlite_store_imports_json_store_once(tmp_path):
+    from thread_store import SqliteThreadStore
+    json_path = str(tmp_path / "threads.json")
+    legacy = ThreadStore(json_path)
+    tid = legacy.create_thread("old")["id"]
+    legacy.add_message(tid, "user", "hello")
+
+    store = SqliteThreadStore(str(tmp_path / "threads.sqlite3"))
+
+    assert store.migrate_from_json(json_path) == 1
+    assert store.get_thread(tid) == legacy.get_thread(tid)
+    legacy.add_message(tid, "user", "after migration")
+    assert store.migrate_from_json(json_path) == 0
+    assert len(store.get_thread(tid)["messages"]) == 1
+
+
+def test_sqlite_migration_leaves_json_files_untouched(tmp_path):
+    from thread_store import SqliteThreadStore
+    json_path = str(tmp_path / "legacy" / "threads.json")
+    legacy = ThreadStore(json_path)
+    tid = legacy.create_thread("old")["id"]
+    legacy.add_message(tid, "user", "logged, not yet compacted")
+    legacy.log.close()
+    before = {p.name: p.read_bytes() for p in (tmp_path / "legacy").iterdir()}
+
+    store = SqliteThreadStore(str(tmp_path / "threads.sqlite3"))
+    assert store.migrate_from_json(json_path) == 1
+
+    assert [m["text"] for m in store.get_thread(tid)["messages"]] == ["logged, not yet compacted"]
+    assert {p.name: p.read_bytes() for p in (tmp_path / "legacy").iterdir()} == before
+
+
+def test_json_store_answers_the_same_queries(tmp_path):
+    store = ThreadStore(str(tmp_path / "threads.json"))
+    tid = store.create_thread("t")["id"]
+    first = store.add_message(tid, "user", "1")
+    store.add_message(tid, "user", "2")
+
+    assert store.recent_threads()[0]["message_count"] == 2
+    assert [m["text"] for m in store.messages_after(tid, after=first["created_at"])] == ["2"]
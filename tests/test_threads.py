@@ -1,8 +1,12 @@
 import pytest
 import time
 import os
+import uuid
+import base64
+from unittest.mock import patch
 from fastapi.testclient import TestClient
-from main import app
+from main import app, image_cache
+from disk_cache import DiskCache
 
 client = TestClient(app)
 
@@ -151,3 +155,81 @@ def test_delete_thread():
     assert not os.path.exists(assets_dir)
     exports_dir = os.path.join('db', 'exports', tid)
     assert not os.path.exists(exports_dir)
+
+
+def test_thread_asset_served_with_thumbnail_size():
+    resp = client.post('/api/chat/threads', json={'name': 'asset-thread'})
+    tid = resp.json()['id']
+    fake_b64 = 'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVQYV2NgYAAAAAMAAWgmWQ0AAAAASUVORK5CYII='
+    resp = client.post(f'/api/chat/threads/{tid}/messages', json={'role': 'ai', 'type': 'image', 'text': 'An image', 'extra': {'image_base64': fake_b64}})
+    asset_url = resp.json()['extra']['asset_url']
+
+    # original
+    r = client.get(asset_url)
+    assert r.status_code == 200
+    assert r.headers['content-type'] == 'image/png'
+
+    # a thumbnail request always succeeds (original until the derivative exists)
+    r = client.get(asset_url + '?size=256')
+    assert r.status_code == 200
+
+    assert client.get(asset_url + '?size=13').status_code == 400
+    assert client.get(f'/api/chat/threads/{tid}/assets/..%2Fchat_threads.json').status_code == 404
+
+
+def test_image_assets_are_referenced_by_id():
+    png = base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVQYV2NgYAAAAAMAAWgmWQ0AAAAASUVORK5CYII=')
+    image_key = DiskCache.key_for('test-generated-image', uuid.uuid4().hex)
+    image_cache.put(image_key, png, 'image/png')
+
+    tid = client.post('/api/chat/threads', json={'name': 'asset-ids'}).json()['id']
+    resp = client.post(f'/api/chat/threads/{tid}/messages', json={'role': 'ai', 'type': 'image', 'text': 'An image', 'extra': {'image_asset_id': f'image:{image_key}'}})
+    assert resp.status_code == 200
+    extra = resp.json()['extra']
+    assert extra['file_path'].endswith('.png')
+    asset = client.get(extra['asset_url'])
+    assert asset.content == png
+    assert asset.headers['content-type'] == 'image/png'
+    assert extra['asset_id'] == f"thread:{tid}/{os.path.basename(extra['file_path'])}"
+
+    # a follow-up question sends the short id; the server reads the file
+    with patch('requests.post') as mock_post:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {"response": "A pixel"}
+        r = client.post('/api/chat-with-image', json={'image_asset_id': extra['asset_id'], 'message': 'What is it?'})
+    assert r.status_code == 200
+    assert base64.b64decode(mock_post.call_args.kwargs['json']['images'][0]) == png
+
+    # referencing the thread's own image again reuses its file instead of copying it
+    again = client.post(f'/api/chat/threads/{tid}/messages', json={'role': 'user', 'type': 'image', 'extra': {'image_asset_id': extra['asset_id']}})
+    assert again.json()['extra']['asset_id'] == extra['asset_id']
+    assert [n for n in os.listdir(os.path.dirname(extra['file_path'])) if '.thumb-' not in n] == [os.path.basename(extra['file_path'])]
+
+    assert client.post('/api/chat-with-image', json={'image_asset_id': f'thread:{tid}/../../chat_threads.json', 'message': 'x'}).status_code == 404
+    assert client.post(f'/api/chat/threads/{tid}/messages', json={'role': 'ai', 'type': 'image', 'extra': {'image_asset_id': 'image:missing'}}).status_code == 404
+
+
+def test_thread_assets_cannot_escape_the_thread_directory():
+    tid = client.post('/api/chat/threads', json={'name': 'traversal'}).json()['id']
+
+    for asset_id in ('thread:../chat_threads.sqlite3', 'thread:../chat_threads.json', 'thread:./chat_threads.sqlite3'):
+        r = client.post(f'/api/chat/threads/{tid}/messages', json={'role': 'ai', 'type': 'image', 'extra': {'image_asset_id': asset_id}})
+        assert r.status_code == 404
+        r = client.post('/api/chat-with-image', json={'image_asset_id': asset_id, 'message': 'x'})
+        assert r.status_code == 404
+    assert client.get('/api/chat/threads/%2E%2E/assets/chat_threads.sqlite3').status_code == 404
+    assert client.get('/api/chat/threads/unknown-thread/assets/chat_threads.sqlite3').status_code == 404
+
+def test_thread_summaries_and_messages_after():
+    tid = client.post('/api/chat/threads', json={'name': 'paged-thread'}).json()['id']
+    first = client.post(f'/api/chat/threads/{tid}/messages', json={'role': 'user', 'text': 'one'}).json()
+    client.post(f'/api/chat/threads/{tid}/messages', json={'role': 'ai', 'text': 'two'})
+
+    summaries = client.get('/api/chat/threads', params={'summary': 'true', 'limit': 1}).json()['threads']
+    assert [t['id'] for t in summaries] == [tid]
+    assert summaries[0]['message_count'] == 2
+
+    r = client.get(f'/api/chat/threads/{tid}/messages', params={'after': first['created_at']})
+    assert r.status_code == 200
+    assert [m['text'] for m in r.json()['messages']] == ['two']
+    assert client.get('/api/chat/threads/missing/messages').status_code == 404
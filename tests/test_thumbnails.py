@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image
+
+from thumbnails import DerivativePipeline
+
+
+def test_derivatives_are_written_next_to_original(tmp_path, wait_for):
+    original = tmp_path / "image-abc.png"
+    Image.new("RGB", (2000, 1000), "red").save(original)
+    pipeline = DerivativePipeline(sizes=(256, 768))
+
+    assert pipeline.get(str(original), 256) is None  # scheduled, not ready yet
+    small = pipeline.derivative_path(str(original), 256)
+    large = pipeline.derivative_path(str(original), 768)
+    assert wait_for(lambda: os.path.exists(small) and os.path.exists(large))
+
+    with Image.open(small) as img:
+        assert max(img.size) == 256
+        assert img.size == (256, 128)
+    assert os.path.getsize(small) < os.path.getsize(original)
+    assert pipeline.get(str(original), 256) == small
+
+
+def test_unreadable_original_is_logged_and_skipped(tmp_path, wait_for, caplog):
+    bogus = tmp_path / "not-an-image.png"
+    bogus.write_bytes(b"nope")
+    pipeline = DerivativePipeline(sizes=(256,))
+
+    pipeline.enqueue(str(bogus))
+    assert wait_for(lambda: not pipeline.pending)
+    assert not os.path.exists(pipeline.derivative_path(str(bogus), 256))
+    assert str(bogus) in caplog.text
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from tts_pipeline import split_sentences, synthesize_in_order
+
+
+def test_split_sentences_merges_short_fragments():
+    text = "Hi. This is the first real sentence of the passage. And here comes another full sentence!\n\nNew paragraph without a stop"
+    segments = split_sentences(text, min_chars=20)
+    assert segments == [
+        "Hi. This is the first real sentence of the passage.",
+        "And here comes another full sentence!",
+        "New paragraph without a stop",
+    ]
+
+
+def test_split_sentences_single_short_text():
+    assert split_sentences("Hello.") == ["Hello."]
+    assert split_sentences("   ") == []
+
+
+def _collect(segments, synthesize, max_parallel):
+    async def run():
+        return [item async for item in synthesize_in_order(segments, synthesize, max_parallel)]
+    return asyncio.run(run())
+
+
+def test_results_are_in_order_with_bounded_parallelism():
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def synthesize(segment):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        # later segments finish first
+        time.sleep(0.05 if segment == "s0" else 0.01)
+        with lock:
+            active -= 1
+        return segment.encode()
+
+    segments = [f"s{i}" for i in range(6)]
+    results = _collect(segments, synthesize, max_parallel=3)
+
+    assert [seg for seg, _ in results] == segments
+    assert [audio for _, audio in results] == [s.encode() for s in segments]
+    assert peak <= 3
+
+
+def test_async_source_and_errors_propagate():
+    async def source():
+        yield "ok"
+        yield "boom"
+
+    def synthesize(segment):
+        if segment == "boom":
+            raise RuntimeError("upstream failed")
+        return b"audio"
+
+    async def run():
+        seen = []
+        with pytest.raises(RuntimeError):
+            async for item in synthesize_in_order(source(), synthesize, 2):
+                seen.append(item)
+        return seen
+
+    assert asyncio.run(run()) == [("ok", b"audio")]
+
+
+def test_sentence_splitter_handles_token_stream():
+    from tts_pipeline import SentenceSplitter
+
+    splitter = SentenceSplitter(min_chars=10)
+    tokens = ["The answer", " is \"forty", "-two.\"", " It", " is 3.14", " times", " nothing! Done"]
+    sentences = []
+    for token in tokens:
+        sentences.extend(splitter.feed(token))
+
+    assert sentences == ['The answer is "forty-two."', "It is 3.14 times nothing!"]
+    assert splitter.flush() == "Done"
+    assert splitter.flush() is None
@@ -0,0 +1,57 @@
+import base64
+import io
+from unittest.mock import patch
+
+import pytest
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image
+
+from disk_cache import DiskCache
+from vision_images import VisionImageNormalizer, decode_base64_image
+
+
+def _image_bytes(size, fmt='PNG', mode='RGB'):
+    buf = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def _normalizer(tmp_path, **kwargs):
+    return VisionImageNormalizer(DiskCache(str(tmp_path / "vision"), max_bytes=10 * 1024 * 1024), **kwargs)
+
+
+def test_large_image_is_downscaled_to_jpeg_and_cached(tmp_path):
+    normalizer = _normalizer(tmp_path, max_side=672)
+    source = _image_bytes((4032, 3024), mode='RGBA')
+
+    first = normalizer.normalize(source)
+    with Image.open(io.BytesIO(first)) as img:
+        assert img.format == 'JPEG'
+        assert img.size == (672, 504)
+    assert len(first) < len(source)
+
+    with patch('vision_images.Image.open') as mock_open:
+        assert normalizer.normalize(source) == first
+    mock_open.assert_not_called()
+
+
+def test_small_compact_image_is_kept(tmp_path):
+    normalizer = _normalizer(tmp_path)
+    buf = io.BytesIO()
+    Image.effect_noise((64, 64), 100).convert('RGB').save(buf, format='JPEG', quality=40)
+    source = buf.getvalue()
+
+    assert normalizer.normalize(source) == source
+
+
+def test_undecodable_data_is_passed_through(tmp_path):
+    normalizer = _normalizer(tmp_path)
+
+    assert normalizer.normalize(b'\x89PNG\r\n\x1a\n') == b'\x89PNG\r\n\x1a\n'
+
+
+def test_decode_base64_image_accepts_data_uris():
+    assert decode_base64_image("data:image/png;base64," + base64.b64encode(b"abc").decode()) == b"abc"
+    with pytest.raises(ValueError):
+        decode_base64_image("not base64!")
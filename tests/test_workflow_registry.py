@@ -0,0 +1,78 @@
+import json
+import os
+
+import pytest
+
+from workflow_registry import WorkflowRegistry, DEFAULT_WORKFLOW_PARAMS
+
+
+def _write_workflow(path, seed=1):
+    workflow = {
+        "3": {"inputs": {"seed": seed, "steps": 20, "model": ["4", 0]}, "class_type": "KSampler"},
+        "4": {"inputs": {"ckpt_name": "base.safetensors"}, "class_type": "CheckpointLoaderSimple"},
+        "5": {"inputs": {"width": 512, "height": 512, "batch_size": 1}, "class_type": "EmptyLatentImage"},
+        "6": {"inputs": {"text": "default", "clip": ["4", 1]}, "class_type": "CLIPTextEncode"},
+        "7": {"inputs": {"text": "blurry", "clip": ["4", 1]}, "class_type": "CLIPTextEncode"},
+    }
+    with open(path, "w") as f:
+        json.dump(workflow, f)
+
+
+def test_render_applies_named_params(tmp_path):
+    path = tmp_path / "wf.json"
+    _write_workflow(path)
+    registry = WorkflowRegistry()
+    registry.register("default", str(path), DEFAULT_WORKFLOW_PARAMS)
+
+    wf = registry.render("default", prompt="a cat", checkpoint="xl.safetensors", seed=42, width=768, steps=None)
+
+    assert wf["6"]["inputs"]["text"] == "a cat"
+    assert wf["4"]["inputs"]["ckpt_name"] == "xl.safetensors"
+    assert wf["3"]["inputs"]["seed"] == 42
+    assert wf["5"]["inputs"]["width"] == 768
+    # None keeps the template default
+    assert wf["3"]["inputs"]["steps"] == 20
+
+
+def test_render_returns_independent_copies(tmp_path):
+    path = tmp_path / "wf.json"
+    _write_workflow(path)
+    registry = WorkflowRegistry()
+    registry.register("default", str(path), DEFAULT_WORKFLOW_PARAMS)
+
+    first = registry.render("default", prompt="first")
+    second = registry.render("default")
+
+    assert first["6"]["inputs"]["text"] == "first"
+    assert second["6"]["inputs"]["text"] == "default"
+
+
+def test_workflow_loaded_once_and_reloaded_on_mtime_change(tmp_path, mocker):
+    path = tmp_path / "wf.json"
+    _write_workflow(path, seed=1)
+    registry = WorkflowRegistry()
+    registry.register("default", str(path), DEFAULT_WORKFLOW_PARAMS, check_interval=0)
+
+    load_spy = mocker.spy(json, "load")
+    registry.render("default")
+    registry.render("default")
+    assert load_spy.call_count == 1
+
+    _write_workflow(path, seed=2)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    assert registry.render("default")["3"]["inputs"]["seed"] == 2
+    assert load_spy.call_count == 2
+
+
+def test_unknown_workflow_or_param_raises(tmp_path):
+    path = tmp_path / "wf.json"
+    _write_workflow(path)
+    registry = WorkflowRegistry()
+    registry.register("default", str(path), DEFAULT_WORKFLOW_PARAMS)
+
+    with pytest.raises(KeyError):
+        registry.render("missing")
+    with pytest.raises(KeyError):
+        registry.render("default", sampler="euler")
@@ -1,40 +1,121 @@
+import copy
 import json
 import os
+import sqlite3
 import threading
 import uuid
 from datetime import datetime
 
 
 class ThreadStore:
-    """Simple file-backed thread storage for chat + image messages.
+    """File-backed thread storage for chat + image messages.
 
-    Stores a JSON file in a specified path under the repo. Thread data structure:
+    The threads live in memory. Every mutation is appended as one JSON line to
+    a write-ahead log (`<filepath>.log`) before it is applied, so adding a
+    message costs one small append however much history exists. Every
+    `compact_every` log records the state is written to the snapshot at
+    `filepath` (via a temporary file and an atomic rename) and the log is
+    truncated. Log records carry a sequence number and the snapshot the last
+    one it includes, so records left over from an interrupted compaction are
+    skipped on replay. Snapshot structure:
     {
+      seq: <last applied log record>,
       threads: { id: {id, name, created_at, modified_at, messages: [ {id,role,type,text,extra,created_at} ] } }
     }
     """
 
-    def __init__(self, filepath: str):
+    def __init__(self, filepath: str, compact_every: int = 1000):
         self.filepath = filepath
+        self.log_path = filepath + ".log"
+        self.compact_every = compact_every
         self.lock = threading.Lock()
         # ensure directory exists
         os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
-        if not os.path.exists(self.filepath):
-            self._write({"threads": {}})
+        self.threads = {}
+        self.seq = 0
+        self.log_records = 0
+        self._load()
+        self.log = open(self.log_path, "a", encoding="utf-8")
+        if self.log.tell() or not os.path.exists(self.filepath):
+            # fold the replayed log (and any torn last line) into a fresh snapshot
+            with self.lock:
+                self._compact()
 
-    def _read(self):
-        with self.lock:
-            with open(self.filepath, "r", encoding="utf-8") as f:
-                return json.load(f)
+    def _load(self):
+        self.threads, self.seq, self.log_records = self.read_state(self.filepath)
+
+    @staticmethod
+    def read_state(filepath: str) -> tuple:
+        """(threads, seq, replayed log records) of the store at `filepath`.
+
+        Reads the snapshot and replays its log without creating, compacting or
+        keeping open any file, so a store can be inspected without taking it over.
+        """
+        threads, seq, replayed = {}, 0, 0
+        if os.path.exists(filepath):
+            with open(filepath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            threads = data.get("threads", {})
+            seq = data.get("seq", 0)
+        log_path = filepath + ".log"
+        if not os.path.exists(log_path):
+            return threads, seq, replayed
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # a torn last line from a crash mid-append; nothing after it was acknowledged
+                    break
+                if record["seq"] > seq:
+                    ThreadStore._apply(threads, record)
+                    seq = record["seq"]
+                    replayed += 1
+        return threads, seq, replayed
+
+    @staticmethod
+    def _apply(threads: dict, record: dict):
+        op = record["op"]
+        if op == "create_thread":
+            threads[record["thread"]["id"]] = record["thread"]
+        elif op == "delete_thread":
+            threads.pop(record["thread_id"], None)
+        elif op == "add_message":
+            thread = threads.get(record["thread_id"])
+            if thread is not None:
+                thread["messages"].append(record["message"])
+                thread["modified_at"] = record["message"]["created_at"]
+
+    def _commit(self, record: dict):
+        """Log `record` and apply it; the caller holds the lock."""
+        self.seq += 1
+        record["seq"] = self.seq
+        self.log.write(json.dumps(record) + "\n")
+        self.log.flush()
+        self._apply(self.threads, record)
+        self.log_records += 1
+        if self.log_records >= self.compact_every:
+            self._compact()
 
-    def _write(self, data):
+    def _compact(self):
+        """Write the current state as the snapshot and start an empty log; the caller holds the lock."""
+        tmp_path = f"{self.filepath}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"seq": self.seq, "threads": self.threads}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.filepath)
+        self.log.close()
+        self.log = open(self.log_path, "w", encoding="utf-8")
+        self.log_records = 0
+
+    def compact(self):
         with self.lock:
-            with open(self.filepath, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
+            self._compact()
 
     def list_threads(self):
-        data = self._read()
-        return list(data.get("threads", {}).values())
+        with self.lock:
+            return copy.deepcopy(list(self.threads.values()))
 
     def create_thread(self, name: str | None = None):
         tid = str(uuid.uuid4())
@@ -46,27 +127,209 @@ class ThreadStore:
             "modified_at": now,
             "messages": []
         }
-        data = self._read()
-        data.setdefault("threads", {})[tid] = t
-        self._write(data)
-        return t
+        with self.lock:
+            self._commit({"op": "create_thread", "thread": t})
+            return copy.deepcopy(t)
+
+    def has_thread(self, thread_id: str) -> bool:
+        with self.lock:
+            return thread_id in self.threads
 
     def get_thread(self, thread_id: str):
-        data = self._read()
-        return data.get("threads", {}).get(thread_id)
+        with self.lock:
+            return copy.deepcopy(self.threads.get(thread_id))
 
     def delete_thread(self, thread_id: str):
-        data = self._read()
-        if thread_id in data.get("threads", {}):
-            del data["threads"][thread_id]
-            self._write(data)
+        with self.lock:
+            if thread_id not in self.threads:
+                return False
+            self._commit({"op": "delete_thread", "thread_id": thread_id})
             return True
-        return False
 
     def add_message(self, thread_id: str, role: str, text: str | None = None, type_: str = "text", extra: dict | None = None):
+        now = datetime.utcnow().isoformat()
+        msg = {
+            "id": str(uuid.uuid4()),
+            "role": role,
+            "type": type_,
+            "text": text or "",
+            "extra": extra or {},
+            "created_at": now
+        }
+        with self.lock:
+            if thread_id not in self.threads:
+                raise KeyError("thread not found")
+            self._commit({"op": "add_message", "thread_id": thread_id, "message": msg})
+            return copy.deepcopy(msg)
+
+    def recent_threads(self, limit: int = 50, offset: int = 0) -> list:
+        """Threads without their messages, most recently modified first."""
+        with self.lock:
+            threads = sorted(self.threads.values(), key=lambda t: t["modified_at"], reverse=True)[offset:offset + limit]
+            return [thread_summary(t, len(t["messages"])) for t in threads]
+
+    def messages_after(self, thread_id: str, after: str | None = None, limit: int | None = None) -> list:
+        """Messages of a thread created after the `after` timestamp, oldest first."""
+        with self.lock:
+            thread = self.threads.get(thread_id)
+            if thread is None:
+                raise KeyError("thread not found")
+            messages = [m for m in thread["messages"] if after is None or m["created_at"] > after]
+            return copy.deepcopy(messages[:limit] if limit is not None else messages)
+
+    def export_markdown(self, thread_id: str):
         thread = self.get_thread(thread_id)
         if not thread:
             raise KeyError("thread not found")
+        return thread_markdown(thread)
+
+
+def thread_summary(thread: dict, message_count: int) -> dict:
+    return {
+        "id": thread["id"],
+        "name": thread["name"],
+        "created_at": thread["created_at"],
+        "modified_at": thread["modified_at"],
+        "message_count": message_count,
+    }
+
+
+def thread_markdown(thread: dict) -> str:
+    lines = [f"# {thread.get('name')}\n", f"Created: {thread.get('created_at')}\n"]
+    for m in thread.get("messages", []):
+        role = m.get("role")
+        t = m.get("text", "")
+        if m.get("type") == "image":
+            # embed image (if base64 present in extra)
+            img_b64 = m.get("extra", {}).get("image_base64")
+            if img_b64:
+                # default to png
+                lines.append(f"### {role} (image)\n\n![image]({img_b64})\n\n")
+            else:
+                lines.append(f"### {role} (image placeholder)\n\n{t}\n\n")
+        else:
+            lines.append(f"### {role}\n\n{t}\n\n")
+
+    return "\n".join(lines)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    modified_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_threads_modified ON threads (modified_at);
+CREATE TABLE IF NOT EXISTS messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    thread_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    type TEXT NOT NULL,
+    text TEXT NOT NULL,
+    extra TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_thread ON messages (thread_id, created_at, seq);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SqliteThreadStore:
+    """ThreadStore with the same interface, kept in a SQLite database (WAL journal).
+
+    Threads and messages are separate tables, messages indexed by
+    (thread_id, created_at), so appending a message, listing recent threads
+    and paging through a thread's messages don't depend on the size of the
+    rest of the history. `migrate_from_json` imports an existing JSON store
+    once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(_SCHEMA)
+
+    def migrate_from_json(self, filepath: str) -> int:
+        """Import the threads of a JSON ThreadStore at `filepath` unless that was done before.
+
+        Returns the number of threads imported. The JSON files are left as they are.
+        """
+        with self.lock:
+            done = self.conn.execute("SELECT value FROM store_meta WHERE key = 'migrated_from_json'").fetchone()
+        if done or not os.path.exists(filepath):
+            return 0
+        threads = list(ThreadStore.read_state(filepath)[0].values())
+        with self.lock, self.conn:
+            for t in threads:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO threads (id, name, created_at, modified_at) VALUES (?, ?, ?, ?)",
+                    (t["id"], t.get("name") or "", t.get("created_at") or "", t.get("modified_at") or t.get("created_at") or ""),
+                )
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO messages (id, thread_id, role, type, text, extra, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(m["id"], t["id"], m.get("role") or "", m.get("type") or "text", m.get("text") or "",
+                      json.dumps(m.get("extra") or {}), m.get("created_at") or "") for m in t.get("messages", [])],
+                )
+            self.conn.execute("INSERT INTO store_meta (key, value) VALUES ('migrated_from_json', ?)", (filepath,))
+        return len(threads)
+
+    def list_threads(self):
+        with self.lock:
+            threads = [self._thread(row) for row in self.conn.execute("SELECT * FROM threads ORDER BY created_at").fetchall()]
+            by_id = {t["id"]: t for t in threads}
+            for row in self.conn.execute("SELECT * FROM messages ORDER BY thread_id, created_at, seq"):
+                if row["thread_id"] in by_id:
+                    by_id[row["thread_id"]]["messages"].append(self._message(row))
+        return threads
+
+    def create_thread(self, name: str | None = None):
+        tid = str(uuid.uuid4())
+        now = datetime.utcnow().isoformat()
+        t = {
+            "id": tid,
+            "name": name or f"Thread {now}",
+            "created_at": now,
+            "modified_at": now,
+            "messages": []
+        }
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO threads (id, name, created_at, modified_at) VALUES (?, ?, ?, ?)",
+                (tid, t["name"], now, now),
+            )
+        return t
+
+    def has_thread(self, thread_id: str) -> bool:
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM threads WHERE id = ?", (thread_id,)).fetchone() is not None
+
+    def get_thread(self, thread_id: str):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM threads WHERE id = ?", (thread_id,)).fetchone()
+            if row is None:
+                return None
+            thread = self._thread(row)
+            thread["messages"] = [self._message(m) for m in self.conn.execute(
+                "SELECT * FROM messages WHERE thread_id = ? ORDER BY created_at, seq", (thread_id,))]
+        return thread
+
+    def delete_thread(self, thread_id: str):
+        with self.lock, self.conn:
+            deleted = self.conn.execute("DELETE FROM threads WHERE id = ?", (thread_id,)).rowcount
+            self.conn.execute("DELETE FROM messages WHERE thread_id = ?", (thread_id,))
+        return deleted > 0
+
+    def add_message(self, thread_id: str, role: str, text: str | None = None, type_: str = "text", extra: dict | None = None):
         now = datetime.utcnow().isoformat()
         msg = {
             "id": str(uuid.uuid4()),
@@ -76,30 +339,59 @@ class ThreadStore:
             "extra": extra or {},
             "created_at": now
         }
-        data = self._read()
-        data.setdefault("threads", {})[thread_id]["messages"].append(msg)
-        data["threads"][thread_id]["modified_at"] = now
-        self._write(data)
+        with self.lock, self.conn:
+            if not self.conn.execute("UPDATE threads SET modified_at = ? WHERE id = ?", (now, thread_id)).rowcount:
+                raise KeyError("thread not found")
+            self.conn.execute(
+                "INSERT INTO messages (id, thread_id, role, type, text, extra, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (msg["id"], thread_id, role, type_, msg["text"], json.dumps(msg["extra"]), now),
+            )
         return msg
 
+    def recent_threads(self, limit: int = 50, offset: int = 0) -> list:
+        """Threads without their messages, most recently modified first."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT t.*, (SELECT COUNT(*) FROM messages m WHERE m.thread_id = t.id) AS message_count "
+                "FROM threads t ORDER BY t.modified_at DESC LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        return [thread_summary(row, row["message_count"]) for row in rows]
+
+    def messages_after(self, thread_id: str, after: str | None = None, limit: int | None = None) -> list:
+        """Messages of a thread created after the `after` timestamp, oldest first."""
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM threads WHERE id = ?", (thread_id,)).fetchone() is None:
+                raise KeyError("thread not found")
+            rows = self.conn.execute(
+                "SELECT * FROM messages WHERE thread_id = ? AND created_at > ? ORDER BY created_at, seq LIMIT ?",
+                (thread_id, after or "", -1 if limit is None else limit),
+            ).fetchall()
+        return [self._message(row) for row in rows]
+
     def export_markdown(self, thread_id: str):
         thread = self.get_thread(thread_id)
         if not thread:
             raise KeyError("thread not found")
+        return thread_markdown(thread)
 
-        lines = [f"# {thread.get('name')}\n", f"Created: {thread.get('created_at')}\n"]
-        for m in thread.get("messages", []):
-            role = m.get("role")
-            t = m.get("text", "")
-            if m.get("type") == "image":
-                # embed image (if base64 present in extra)
-                img_b64 = m.get("extra", {}).get("image_base64")
-                if img_b64:
-                    # default to png
-                    lines.append(f"### {role} (image)\n\n![image]({img_b64})\n\n")
-                else:
-                    lines.append(f"### {role} (image placeholder)\n\n{t}\n\n")
-            else:
-                lines.append(f"### {role}\n\n{t}\n\n")
+    @staticmethod
+    def _thread(row: sqlite3.Row) -> dict:
+        return {
+            "id": row["id"],
+            "name": row["name"],
+            "created_at": row["created_at"],
+            "modified_at": row["modified_at"],
+            "messages": [],
+        }
 
-        return "\n".join(lines)
+    @staticmethod
+    def _message(row: sqlite3.Row) -> dict:
+        return {
+            "id": row["id"],
+            "role": row["role"],
+            "type": row["type"],
+            "text": row["text"],
+            "extra": json.loads(row["extra"]),
+            "created_at": row["created_at"],
+        }
@@ -0,0 +1,91 @@
+import logging
+import os
+import queue
+import threading
+import uuid
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow is optional; without it originals are served as-is
+    Image = None
+    features = None
+
+logger = logging.getLogger(__name__)
+
+
+# Longest-edge sizes (px) that derivatives are produced for.
+THUMBNAIL_SIZES = (256, 768)
+
+
+class DerivativePipeline:
+    """Background worker that writes downscaled copies of stored images.
+
+    Derivatives live next to the original as `<name>.thumb-<size>.<ext>`
+    (WebP when Pillow supports it, JPEG otherwise), so deleting an original's
+    directory or cache entry also removes its derivatives.
+    """
+
+    def __init__(self, sizes=THUMBNAIL_SIZES, quality: int = 80):
+        self.sizes = tuple(sizes)
+        self.quality = quality
+        self.enabled = Image is not None
+        self.format = 'WEBP' if self.enabled and features.check('webp') else 'JPEG'
+        self.ext = 'webp' if self.format == 'WEBP' else 'jpg'
+        self.media_type = f"image/{'webp' if self.format == 'WEBP' else 'jpeg'}"
+        self.queue: "queue.Queue[str]" = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        if self.enabled:
+            self.worker = threading.Thread(target=self._worker_loop, daemon=True)
+            self.worker.start()
+
+    def derivative_path(self, original_path: str, size: int) -> str:
+        return f"{os.path.splitext(original_path)[0]}.thumb-{size}.{self.ext}"
+
+    def enqueue(self, original_path: str):
+        if not self.enabled or not original_path:
+            return
+        with self.lock:
+            if original_path in self.pending:
+                return
+            self.pending.add(original_path)
+        self.queue.put(original_path)
+
+    def get(self, original_path: str, size: int) -> str | None:
+        """Path of the derivative if it is ready; otherwise schedule it and return None."""
+        if not self.enabled:
+            return None
+        path = self.derivative_path(original_path, size)
+        if os.path.exists(path):
+            return path
+        self.enqueue(original_path)
+        return None
+
+    def _worker_loop(self):
+        while True:
+            original_path = self.queue.get()
+            try:
+                self._process(original_path)
+            except Exception as e:
+                # unreadable or vanished originals just don't get derivatives
+                logger.warning(f"Could not create derivatives of {original_path}: {e}")
+            finally:
+                with self.lock:
+                    self.pending.discard(original_path)
+
+    def _process(self, original_path: str):
+        with Image.open(original_path) as img:
+            img.load()
+            if self.format == 'JPEG' and img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            elif img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+                img = img.convert('RGBA')
+            for size in self.sizes:
+                path = self.derivative_path(original_path, size)
+                if os.path.exists(path):
+                    continue
+                thumb = img.copy()
+                thumb.thumbnail((size, size), Image.LANCZOS)
+                tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                thumb.save(tmp_path, format=self.format, quality=self.quality)
+                os.replace(tmp_path, path)
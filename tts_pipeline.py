@@ -0,0 +1,112 @@
+import asyncio
+import re
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable
+
+# A sentence ends at ., ! or ? (plus any closing quotes/brackets) followed by
+# whitespace, or at a blank line. Requiring the whitespace means a boundary is
+# only recognised once the text after it has started to arrive.
+_SENTENCE_BOUNDARY = re.compile(r'[.!?…]["\'”’)\]]*(?=\s)|\n\s*\n')
+
+
+class SentenceSplitter:
+    """Incrementally cuts streamed text (e.g. LLM tokens) into sentences.
+
+    Sentences shorter than `min_chars` are held back and merged with the next
+    one so that short interjections don't each cost an upstream request.
+    """
+
+    def __init__(self, min_chars: int = 40):
+        self.min_chars = min_chars
+        self.buffer = ""
+        self.pending = ""
+
+    def feed(self, text: str) -> list:
+        """Add text; return the sentences completed by it."""
+        self.buffer += text
+        sentences = []
+        while True:
+            match = _SENTENCE_BOUNDARY.search(self.buffer)
+            if not match:
+                break
+            part = self.buffer[:match.end()].strip()
+            self.buffer = self.buffer[match.end():]
+            if not part:
+                continue
+            self.pending = f"{self.pending} {part}" if self.pending else part
+            if len(self.pending) >= self.min_chars:
+                sentences.append(self.pending)
+                self.pending = ""
+        return sentences
+
+    def flush(self) -> str | None:
+        """Return whatever is left once the text has ended."""
+        tail = " ".join(p for p in (self.pending, self.buffer.strip()) if p)
+        self.buffer = ""
+        self.pending = ""
+        return tail or None
+
+
+def split_sentences(text: str, min_chars: int = 40) -> list:
+    """Split text into sentence-sized segments for synthesis; a short final
+    fragment is merged into the previous segment."""
+    splitter = SentenceSplitter(min_chars)
+    segments = splitter.feed(text)
+    tail = splitter.flush()
+    if tail:
+        if segments and len(tail) < min_chars:
+            segments[-1] = f"{segments[-1]} {tail}"
+        else:
+            segments.append(tail)
+    return segments
+
+
+async def _aiter(items):
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def synthesize_in_order(segments: Iterable[str] | AsyncIterable[str], synthesize: Callable[[str], bytes],
+                              max_parallel: int = 3) -> AsyncIterator[tuple]:
+    """Run `synthesize` on up to `max_parallel` segments at once, yielding
+    (segment, audio) strictly in input order as soon as the head is ready.
+
+    `synthesize` is a blocking call and runs in worker threads. `segments` may
+    be an async iterable that is still being produced (e.g. LLM output).
+    """
+    slots = asyncio.Semaphore(max_parallel)
+    inflight: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for segment in _aiter(segments):
+                await slots.acquire()
+                await inflight.put((segment, asyncio.ensure_future(asyncio.to_thread(synthesize, segment))))
+        except Exception as e:
+            await inflight.put(e)
+        finally:
+            await inflight.put(None)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item = await inflight.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            segment, task = item
+            try:
+                audio = await task
+            finally:
+                slots.release()
+            yield segment, audio
+    finally:
+        producer.cancel()
+        while not inflight.empty():
+            item = inflight.get_nowait()
+            if isinstance(item, tuple):
+                item[1].cancel()
@@ -0,0 +1,80 @@
+import base64
+import binascii
+import hashlib
+import io
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it images are passed on unchanged
+    Image = None
+    ImageOps = None
+
+from disk_cache import DiskCache
+
+# llava 1.6 encodes images in tiles of up to 672px per side; anything larger is
+# downscaled by the model anyway, after being shipped and decoded at full size.
+VISION_MAX_SIDE = 672
+
+
+def decode_base64_image(value: str) -> bytes:
+    """Bytes of a raw base64 string or data URI; raises ValueError if it isn't base64."""
+    if value.startswith('data:'):
+        value = value.split(',', 1)[-1]
+    try:
+        return base64.b64decode(value, validate=True)
+    except binascii.Error as e:
+        raise ValueError(f"invalid base64 image: {e}")
+
+
+class VisionImageNormalizer:
+    """Shrinks images to a vision model's input resolution before they are sent.
+
+    Images are decoded, rotated upright, flattened to RGB, downscaled to
+    `max_side` on the longest edge and re-encoded as JPEG, unless the original
+    already fits and is the smaller file. Results are cached by the hash of
+    the source bytes, so asking about the same image again costs one hash.
+    Data Pillow can't decode is passed through unchanged.
+    """
+
+    def __init__(self, cache: DiskCache, max_side: int = VISION_MAX_SIDE, quality: int = 85):
+        self.cache = cache
+        self.max_side = max_side
+        self.quality = quality
+        self.enabled = Image is not None
+
+    def normalize(self, data: bytes) -> bytes:
+        key = DiskCache.key_for("vision", self.max_side, self.quality, hashlib.sha256(data).hexdigest())
+        cached = self.cache.get(key)
+        if cached:
+            with open(cached.path, 'rb') as f:
+                return f.read()
+        result = self._shrink(data)
+        if result is None:
+            return data
+        normalized, content_type = result
+        self.cache.put(key, normalized, content_type)
+        return normalized
+
+    def _shrink(self, data: bytes) -> tuple | None:
+        if not self.enabled:
+            return None
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img.load()
+                source_format = img.format
+                fits = max(img.size) <= self.max_side
+                img = ImageOps.exif_transpose(img)
+        except Exception:
+            return None
+        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+            rgba = img.convert('RGBA')
+            img = Image.new('RGB', rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel('A'))
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        img.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format='JPEG', quality=self.quality, optimize=True)
+        if fits and out.tell() >= len(data):
+            return data, Image.MIME.get(source_format, 'application/octet-stream')
+        return out.getvalue(), 'image/jpeg'
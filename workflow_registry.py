@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+
+# Named parameters of the stock text-to-image workflow (comfy_workflow.json),
+# mapped to the (node_id, input_name) pairs they control.
+DEFAULT_WORKFLOW_PARAMS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "prompt": (("6", "text"),),
+    "negative_prompt": (("7", "text"),),
+    "checkpoint": (("4", "ckpt_name"),),
+    "seed": (("3", "seed"),),
+    "steps": (("3", "steps"),),
+    "width": (("5", "width"),),
+    "height": (("5", "height"),),
+}
+
+
+class WorkflowTemplate:
+    """A ComfyUI workflow loaded from disk with named, patchable parameters.
+
+    The parsed workflow is kept in memory and only re-read when the file's mtime
+    changes (checked at most every `check_interval` seconds), so rendering a
+    request does not touch the disk.
+    """
+
+    def __init__(self, name: str, path: str, params: Dict[str, Tuple[Tuple[str, str], ...]], check_interval: float = 2.0):
+        self.name = name
+        self.path = path
+        self.params = dict(params)
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self._workflow = None
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def _load(self):
+        with self.lock:
+            now = time.monotonic()
+            if self._workflow is not None and now - self._checked_at < self.check_interval:
+                return self._workflow
+            self._checked_at = now
+            mtime = os.stat(self.path).st_mtime_ns
+            if self._workflow is None or mtime != self._mtime:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    workflow = json.load(f)
+                # validate the parameter mapping against the loaded nodes
+                for pname, targets in self.params.items():
+                    for node_id, input_name in targets:
+                        if node_id not in workflow:
+                            raise ValueError(f"workflow '{self.name}': parameter '{pname}' targets missing node {node_id}")
+                self._workflow = workflow
+                self._mtime = mtime
+            return self._workflow
+
+    def render(self, **values):
+        """Return a copy of the workflow with the given named parameters applied.
+
+        Only node dicts and their `inputs` are copied; input values (scalars and
+        [node_id, slot] links) are shared with the template and never mutated.
+        Parameters passed as None keep the template's default.
+        """
+        unknown = set(values) - set(self.params)
+        if unknown:
+            raise KeyError(f"workflow '{self.name}' has no parameter(s): {', '.join(sorted(unknown))}")
+
+        base = self._load()
+        workflow = {node_id: {**node, "inputs": dict(node.get("inputs", {}))} for node_id, node in base.items()}
+        for pname, value in values.items():
+            if value is None:
+                continue
+            for node_id, input_name in self.params[pname]:
+                workflow[node_id]["inputs"][input_name] = value
+        return workflow
+
+
+class WorkflowRegistry:
+    """Holds the ComfyUI workflow templates available to the API by name."""
+
+    def __init__(self):
+        self.templates: Dict[str, WorkflowTemplate] = {}
+        self.lock = threading.Lock()
+
+    def register(self, name: str, path: str, params: Dict[str, Tuple[Tuple[str, str], ...]], check_interval: float = 2.0) -> WorkflowTemplate:
+        template = WorkflowTemplate(name, path, params, check_interval=check_interval)
+        with self.lock:
+            self.templates[name] = template
+        return template
+
+    def get(self, name: str) -> WorkflowTemplate | None:
+        with self.lock:
+            return self.templates.get(name)
+
+    def names(self):
+        with self.lock:
+            return list(self.templates.keys())
+
+    def render(self, name: str, **values):
+        template = self.get(name)
+        if template is None:
+            raise KeyError(f"unknown workflow '{name}'")
+        return template.render(**values)